@@ -6,10 +6,15 @@ from django.utils.html import format_html
 from marketplace.models import (
     AnalyticsEvent,
     Category,
+    FraudFeatures,
+    IdempotencyKey,
+    Notification,
     Order,
     OrderItem,
+    OutboxEvent,
     Product,
     Promotion,
+    Reservation,
     Review,
     Seller,
     Transaction,
@@ -119,7 +124,7 @@ class ProductAdmin(admin.ModelAdmin):
     display_price.short_description = "Price"
 
     def display_inventory(self, obj):
-        available = obj.inventory_count - obj.reserved_count
+        available = obj.available_count
         color = "green" if available > 5 else "orange" if available > 0 else "red"
         return format_html(
             '<span style="color: {};">{} / {}</span>',
@@ -397,3 +402,44 @@ class AnalyticsEventAdmin(admin.ModelAdmin):
         return metadata_str[:50] + "..." if len(metadata_str) > 50 else metadata_str
 
     display_metadata_preview.short_description = "Metadata"
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ["handler", "status", "attempts", "available_at", "created_at"]
+    list_filter = ["status", "handler"]
+    ordering = ["-created_at"]
+    readonly_fields = ["payload", "last_error", "created_at", "processed_at"]
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ["kind", "recipient", "status", "attempts", "created_at", "sent_at"]
+    list_filter = ["status", "kind"]
+    ordering = ["-created_at"]
+    search_fields = ["recipient"]
+    readonly_fields = ["payload", "last_error", "created_at", "sent_at"]
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ["product", "order", "quantity", "status", "expires_at"]
+    list_filter = ["status"]
+    ordering = ["-created_at"]
+    raw_id_fields = ["product", "order"]
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ["key", "status", "response_status", "created_at"]
+    list_filter = ["status"]
+    search_fields = ["key"]
+    ordering = ["-created_at"]
+    readonly_fields = ["request_hash", "response_body", "created_at"]
+
+
+@admin.register(FraudFeatures)
+class FraudFeaturesAdmin(admin.ModelAdmin):
+    list_display = ["user", "paid_orders", "account_created_at", "updated_at"]
+    ordering = ["-updated_at"]
+    raw_id_fields = ["user"]
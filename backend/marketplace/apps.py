@@ -5,3 +5,7 @@ from django.apps import AppConfig
 class MarketplaceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "marketplace"
+
+    def ready(self):
+        # Local application imports
+        from services import fraud_service  # noqa: F401 (connects receivers)
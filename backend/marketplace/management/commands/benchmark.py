@@ -0,0 +1,457 @@
+# Standard library imports
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+# Django imports
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import (
+    AnalyticsEvent,
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    Review,
+    Seller,
+    User,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a performance benchmark against throwaway data. Everything the "
+        "benchmark writes is rolled back when it finishes."
+    )
+
+    suites = {
+        "autocomplete": "bench_autocomplete",
+        "bulk-checkout": "bench_bulk_checkout",
+        "fraud-rescore": "bench_fraud_rescore",
+        "price-cart": "bench_price_cart",
+        "reprice": "bench_reprice",
+        "search": "bench_search",
+        "seller-digest": "bench_seller_digest",
+        "stock-import": "bench_stock_import",
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("suite", choices=sorted(self.suites))
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=100,
+            help=(
+                "Workload size (orders for bulk-checkout and fraud-rescore, cart "
+                "lines for price-cart, SKUs for stock-import, reprice, search and "
+                "autocomplete, "
+                "sellers for seller-digest)"
+            ),
+        )
+        parser.add_argument("--items", type=int, default=3, help="Cart lines per order")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            getattr(self, self.suites[options["suite"]])(options)
+            transaction.set_rollback(True)
+
+    def create_catalog(self, products=50, users=10):
+        seller = Seller.objects.create(
+            name="Benchmark Seller", email="bench@example.com"
+        )
+        category = Category.objects.create(name="Benchmark")
+        catalog = Product.objects.bulk_create(
+            [
+                Product(
+                    seller=seller,
+                    name=f"Benchmark Product {i}",
+                    description="Benchmark product",
+                    category=category,
+                    price=Decimal(random.randint(5, 200)),
+                    cost=Decimal("2.00"),
+                    inventory_count=1_000_000,
+                )
+                for i in range(products)
+            ]
+        )
+        customers = [
+            User.objects.create_user(
+                username=f"bench{i}",
+                email=f"bench{i}@example.com",
+                subscription_tier="business",
+            )
+            for i in range(users)
+        ]
+        return catalog, customers
+
+    def bench_bulk_checkout(self, options):
+        # Local application imports
+        from services import checkout_service
+
+        catalog, customers = self.create_catalog()
+        carts = [
+            {
+                "user_id": str(random.choice(customers).user_id),
+                "items": [
+                    {"product_id": str(product.product_id), "quantity": 1}
+                    for product in random.sample(catalog, options["items"])
+                ],
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+            }
+            for _ in range(options["size"])
+        ]
+
+        started = time.perf_counter()
+        results = checkout_service.bulk_checkout(carts)
+        elapsed = time.perf_counter() - started
+
+        succeeded = sum(1 for result in results if result["status"] == "success")
+        self.stdout.write(
+            f"bulk-checkout: {len(carts)} orders x {options['items']} lines "
+            f"in {elapsed:.2f}s ({succeeded} paid)"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Throughput: {len(carts) / elapsed:.1f} orders/second")
+        )
+
+    def bench_stock_import(self, options):
+        # Local application imports
+        from services import inventory_service
+
+        catalog, _ = self.create_catalog(products=options["size"], users=0)
+        levels = {product.product_id: random.randint(0, 500) for product in catalog}
+
+        started = time.perf_counter()
+        updated = inventory_service.import_stock(levels)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"stock-import: {updated} SKUs in {elapsed:.2f}s")
+        self.stdout.write(
+            self.style.SUCCESS(f"Throughput: {updated / elapsed:.0f} SKUs/second")
+        )
+
+    def bench_price_cart(self, options):
+        # Local application imports
+        from services import pricing_service
+
+        catalog, _ = self.create_catalog(products=options["size"], users=0)
+        items = [
+            {"product_id": str(product.product_id), "quantity": random.randint(1, 5)}
+            for product in catalog
+        ]
+
+        # Price carts of growing size: time per line should stay flat and the
+        # query count shouldn't move at all.
+        for lines in sorted(
+            {max(1, len(items) // 4), max(1, len(items) // 2), len(items)}
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                quote = pricing_service.price_cart(items[:lines], "business")
+                elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"price-cart: {lines} lines in {elapsed * 1000:.1f}ms "
+                f"({elapsed / lines * 1e6:.0f}us/line, {len(queries)} queries, "
+                f"subtotal {quote.subtotal})"
+            )
+
+    def bench_reprice(self, options):
+        # Local application imports
+        from services import repricing_service
+
+        catalog, _ = self.create_catalog(products=options["size"], users=0)
+        rules = repricing_service.parse_rules(
+            [
+                {"percent": -15, "category": catalog[0].category_id},
+                {"min_margin": 25},
+            ]
+        )
+
+        summary = repricing_service.reprice(rules)
+
+        self.stdout.write(
+            f"reprice: {summary['updated']} of {summary['matched']} products "
+            f"in {summary['seconds']:.2f}s"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Throughput: {summary['rows_per_second']} rows/second")
+        )
+
+    def bench_fraud_rescore(self, options):
+        # Local application imports
+        from services import fraud_service
+
+        _, customers = self.create_catalog(products=1, users=100)
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    user=random.choice(customers),
+                    status=random.choice(["paid", "pending", "cancelled"]),
+                    subtotal=Decimal(random.randint(10, 8000)),
+                    tax=0,
+                    total=0,
+                    shipping_address={},
+                )
+                for _ in range(options["size"])
+            ]
+        )
+        # Spread the orders over the last 30 days
+        now = timezone.now()
+        for order in orders:
+            order.created_at = now - timedelta(minutes=random.randint(0, 30 * 24 * 60))
+        Order.objects.bulk_update(orders, ["created_at"], batch_size=1000)
+
+        summary = fraud_service.rescore_orders(now - timedelta(days=30))
+
+        self.stdout.write(
+            f"fraud-rescore: {summary['scored']} orders in {summary['seconds']:.2f}s "
+            f"({summary['flagged_count']} flagged)"
+        )
+        throughput = summary["scored"] / max(summary["seconds"], 0.001)
+        self.stdout.write(
+            self.style.SUCCESS(f"Throughput: {throughput:.0f} orders/second")
+        )
+
+    def make_text(self):
+        """
+        Return ``text(length)``, which strings together made-up words with a
+        Zipf-like spread, so a few are in most products and most are rare, as
+        in a real catalogue.
+        """
+        syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa"]
+        words = list(
+            {
+                "".join(random.choices(syllables, k=random.randint(2, 4)))
+                for _ in range(5000)
+            }
+        )
+        weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+        def text(length):
+            return " ".join(random.choices(words, weights, k=length))
+
+        return text
+
+    def bench_autocomplete(self, options):
+        # Local application imports
+        from services import autocomplete
+
+        text = self.make_text()
+        seller = Seller.objects.create(
+            name="Benchmark Seller", email="bench@example.com"
+        )
+        names = [text(3) for _ in range(options["size"])]
+        Product.objects.bulk_create(
+            [
+                Product(
+                    seller=seller,
+                    name=name,
+                    description=name,
+                    price=Decimal("10.00"),
+                    cost=Decimal("2.00"),
+                )
+                for name in names
+            ],
+            batch_size=1000,
+        )
+        # Five searches per product, most of them for a few popular queries
+        queries = [text(random.randint(1, 2)) for _ in range(options["size"] // 5)]
+        AnalyticsEvent.objects.bulk_create(
+            [
+                AnalyticsEvent(event_type="search", metadata={"query": query})
+                for query in random.choices(
+                    queries,
+                    [1 / rank for rank in range(1, len(queries) + 1)],
+                    k=options["size"] * 5,
+                )
+            ],
+            batch_size=1000,
+        )
+
+        started = time.perf_counter()
+        autocomplete.reset_autocomplete()
+        suggestions = autocomplete.get_autocomplete()
+        self.stdout.write(
+            f"autocomplete: {len(suggestions)} suggestions built in "
+            f"{time.perf_counter() - started:.2f}s"
+        )
+
+        # Every keystroke of a few thousand product names and queries
+        typed = [
+            phrase[:length]
+            for phrase in random.choices(names + queries, k=2000)
+            for length in range(1, len(phrase) + 1)
+        ]
+        timings = []
+        for prefix in typed:
+            prefix_started = time.perf_counter()
+            suggestions.suggest(prefix)
+            timings.append(time.perf_counter() - prefix_started)
+        timings.sort()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"suggest ({len(typed)} keystrokes): "
+                f"p50 {timings[len(timings) // 2] * 1000:.3f}ms, "
+                f"p99 {timings[int(len(timings) * 0.99)] * 1000:.3f}ms, "
+                f"max {timings[-1] * 1000:.3f}ms"
+            )
+        )
+
+        product = Product.objects.filter(seller=seller).first()
+        started = time.perf_counter()
+        for i in range(100):
+            product.name = text(3)
+            product.save(update_fields=["name", "updated_at"])
+        self.stdout.write(f"renames: {(time.perf_counter() - started) * 10:.2f}ms each")
+
+    def bench_search(self, options):
+        # Local application imports
+        from services import search_fts, search_index, search_service
+
+        text = self.make_text()
+        seller = Seller.objects.create(
+            name="Benchmark Seller", email="bench@example.com"
+        )
+        category = Category.objects.create(name="Benchmark")
+        Product.objects.bulk_create(
+            [
+                Product(
+                    seller=seller,
+                    name=text(3),
+                    description=text(30),
+                    category=category,
+                    price=Decimal(random.randint(5, 200)),
+                    cost=Decimal("2.00"),
+                )
+                for _ in range(options["size"])
+            ],
+            batch_size=1000,
+        )
+
+        started = time.perf_counter()
+        search_index.reset_index()
+        index = search_index.get_index()
+        self.stdout.write(
+            f"search: indexed {len(index)} products ({len(index.postings)} terms) "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+        queries = [text(random.randint(1, 2)) for _ in range(500)] + [
+            text(1)[:3] for _ in range(500)
+        ]
+        backends = [("index", lambda query: index.search(query, limit=100))]
+        if search_fts.is_available():
+            backends.append(("fts5", lambda query: search_fts.search(query, limit=100)))
+        backends.append(
+            (
+                f"search_products ({settings.SEARCH_BACKEND})",
+                search_service.search_products,
+            )
+        )
+        backends.append(
+            (
+                f"search_facets ({settings.SEARCH_BACKEND})",
+                search_service.search_facets,
+            )
+        )
+        for label, search in backends:
+            timings = []
+            for query in queries:
+                query_started = time.perf_counter()
+                search(query)
+                timings.append(time.perf_counter() - query_started)
+            timings.sort()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{label}: p50 {timings[len(timings) // 2] * 1000:.2f}ms, "
+                    f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f}ms"
+                )
+            )
+
+    def bench_seller_digest(self, options):
+        # Local application imports
+        from services import digest_service
+
+        sellers = Seller.objects.bulk_create(
+            [
+                Seller(name=f"Benchmark Seller {i}", email=f"seller{i}@example.com")
+                for i in range(options["size"])
+            ],
+            batch_size=1000,
+        )
+        category = Category.objects.create(name="Benchmark")
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    seller=seller,
+                    name=f"{seller.name} product {i}",
+                    description="Benchmark product",
+                    category=category,
+                    price=Decimal(random.randint(5, 200)),
+                    cost=Decimal("2.00"),
+                    inventory_count=random.randint(0, 50),
+                )
+                for seller in sellers
+                for i in range(2)
+            ],
+            batch_size=1000,
+        )
+        buyer = User.objects.create_user(username="bench", email="bench@example.com")
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    user=buyer,
+                    status="paid",
+                    subtotal=0,
+                    total=0,
+                    shipping_address={},
+                )
+                for _ in range(max(1, options["size"] // 2))
+            ],
+            batch_size=1000,
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=random.choice(orders),
+                    product=product,
+                    quantity=random.randint(1, 3),
+                    price_at_purchase=product.price,
+                )
+                for product in random.sample(products, len(products) // 2)
+            ],
+            batch_size=1000,
+        )
+        Review.objects.bulk_create(
+            [
+                Review(
+                    user=buyer,
+                    product=product,
+                    order=orders[0],
+                    rating=random.randint(1, 5),
+                    comment="Benchmark review",
+                )
+                for product in random.sample(products, len(products) // 4)
+            ],
+            batch_size=1000,
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            summary = digest_service.send_seller_digests(timezone.localdate())
+
+        self.stdout.write(
+            f"seller-digest: {summary['queued']} digests for {len(sellers)} sellers "
+            f"in {summary['seconds']:.2f}s ({len(queries)} queries)"
+        )
+        throughput = len(sellers) / max(summary["seconds"], 0.001)
+        self.stdout.write(
+            self.style.SUCCESS(f"Throughput: {throughput:.0f} sellers/second")
+        )
@@ -0,0 +1,40 @@
+# Standard library imports
+import time
+
+# Django imports
+from django.core.management.base import BaseCommand
+
+# Local application imports
+from services import outbox_service
+
+
+class Command(BaseCommand):
+    help = "Runs deferred checkout side effects (emails, analytics) from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new events instead of exiting when empty",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep between polls when the outbox is empty",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = outbox_service.drain(batch_size=options["batch_size"])
+            total += processed
+
+            if processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} outbox events"))
@@ -0,0 +1,13 @@
+# Django imports
+from django.core.management.base import BaseCommand
+
+# Local application imports
+from services import idempotency_service
+
+
+class Command(BaseCommand):
+    help = "Deletes idempotency keys older than IDEMPOTENCY_KEY_TTL"
+
+    def handle(self, *args, **options):
+        deleted = idempotency_service.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idempotency keys"))
@@ -0,0 +1,35 @@
+# Django imports
+from django.core.management.base import BaseCommand
+
+# Local application imports
+from marketplace.models import User
+from services import fraud_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every user's fraud features from their order history, "
+        "repairing counters that have drifted"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = 0
+        last_pk = 0
+        while True:
+            users = list(
+                User.objects.filter(pk__gt=last_pk).order_by("pk")[
+                    : options["batch_size"]
+                ]
+            )
+            if not users:
+                break
+            fraud_service.rebuild_features(users)
+            total += len(users)
+            last_pk = users[-1].pk
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt fraud features for {total} users")
+        )
@@ -0,0 +1,46 @@
+# Standard library imports
+import time
+
+# Django imports
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Local application imports
+from services import search_fts
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks the FTS5 product search index against the products table, "
+        "rebuilds it and reports whether it is consistent. The in-memory index "
+        "belongs to each server process, which builds its own on its first "
+        "search and syncs it from then on, so this command can't rebuild it."
+    )
+
+    def handle(self, *args, **options):
+        if not search_fts.is_available():
+            self.stdout.write(
+                "This database has no FTS5 index. Search uses the in-memory "
+                "index, which each server process builds on its first search "
+                f"and syncs every {settings.SEARCH_INDEX_SYNC_INTERVAL}s."
+            )
+            return
+
+        for problem in search_fts.check():
+            self.stdout.write(self.style.WARNING(f"Before rebuilding: {problem}"))
+
+        started = time.perf_counter()
+        search_fts.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the FTS5 index in {elapsed:.2f}s")
+        )
+
+        problems = search_fts.check()
+        if problems:
+            raise CommandError(
+                "The FTS5 index is still inconsistent: " + "; ".join(problems)
+            )
+        self.stdout.write(
+            self.style.SUCCESS("The FTS5 index matches the products table")
+        )
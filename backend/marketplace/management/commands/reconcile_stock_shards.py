@@ -0,0 +1,29 @@
+# Standard library imports
+import time
+
+# Django imports
+from django.core.management.base import BaseCommand
+
+# Local application imports
+from services import inventory_service
+
+
+class Command(BaseCommand):
+    help = "Copies the summed stock of sharded products back onto their product rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep reconciling every --interval seconds instead of exiting",
+        )
+        parser.add_argument("--interval", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        while True:
+            updated = inventory_service.reconcile_shards()
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} products"))
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
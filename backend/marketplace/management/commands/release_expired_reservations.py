@@ -0,0 +1,42 @@
+# Standard library imports
+import time
+
+# Django imports
+from django.core.management.base import BaseCommand
+
+# Local application imports
+from services import inventory_service
+
+
+class Command(BaseCommand):
+    help = "Gives back stock held by checkouts whose reservations have expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep sweeping instead of exiting when nothing has expired",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30.0,
+            help="Seconds to sleep between sweeps when nothing has expired",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            expired = inventory_service.release_expired(
+                batch_size=options["batch_size"]
+            )
+            total += expired
+
+            if expired:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Released {total} expired reservations"))
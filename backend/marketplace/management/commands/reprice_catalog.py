@@ -0,0 +1,47 @@
+# Standard library imports
+import json
+
+# Django imports
+from django.core.management.base import BaseCommand, CommandError
+
+# Local application imports
+from services import repricing_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Reprices products by rules, e.g. "
+        '\'[{"percent": -10, "category": 3}, {"min_margin": 20}]\''
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "rules", help="JSON list of rules, or @path to a file containing one"
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without writing anything",
+        )
+
+    def handle(self, *args, **options):
+        rules = options["rules"]
+        try:
+            if rules.startswith("@"):
+                with open(rules[1:]) as f:
+                    rules = f.read()
+            rules = repricing_service.parse_rules(json.loads(rules))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Invalid rules: {e}")
+
+        summary = repricing_service.reprice(
+            rules, batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+        verb = "Would update" if summary["dry_run"] else "Updated"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {summary['updated']} of {summary['matched']} products in "
+                f"{summary['seconds']:.2f}s ({summary['rows_per_second']} rows/second)"
+            )
+        )
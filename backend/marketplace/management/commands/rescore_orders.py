@@ -0,0 +1,34 @@
+# Standard library imports
+from datetime import timedelta
+
+# Django imports
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+# Local application imports
+from services import fraud_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-scores recent orders with the fraud features their users had "
+        "when each order was placed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        summary = fraud_service.rescore_orders(
+            timezone.now() - timedelta(days=options["days"]),
+            batch_size=options["batch_size"],
+        )
+        for order_id in summary["flagged"]:
+            self.stdout.write(f"Flagged order {order_id}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scored {summary['scored']} orders in {summary['seconds']:.2f}s, "
+                f"{summary['flagged_count']} flagged"
+            )
+        )
@@ -0,0 +1,48 @@
+# Django imports
+from django.core.management.base import BaseCommand
+
+# Local application imports
+from services.stub_gateway import StubGatewayServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local payment gateway for load testing. Point PAYMENT_GATEWAY "
+        "at services.payment_gateways.HttpGateway with this server's URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--latency", type=float, default=2.0, help="Seconds per charge"
+        )
+        parser.add_argument(
+            "--decline-rate",
+            type=float,
+            default=0.05,
+            help="Fraction of charges to decline (0-1)",
+        )
+        parser.add_argument("--verbose", action="store_true")
+
+    def handle(self, *args, **options):
+        server = StubGatewayServer(
+            (options["host"], options["port"]),
+            latency=options["latency"],
+            decline_rate=options["decline_rate"],
+            verbose=options["verbose"],
+        )
+        host, port = server.server_address
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stub gateway listening on http://{host}:{port} "
+                f"(latency {options['latency']}s, "
+                f"decline rate {options['decline_rate']:.0%})"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,66 @@
+# Standard library imports
+import time
+from concurrent import futures
+
+# Django imports
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Local application imports
+from services import notification_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends queued notifications, batched into one message per recipient, "
+        "over a pool of worker threads"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.NOTIFICATION_WORKERS,
+            help="Messages sent concurrently",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new notifications instead of exiting when empty",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep between polls when nothing is due",
+        )
+
+    def handle(self, *args, **options):
+        totals = {"notifications": 0, "messages": 0, "failed": 0}
+        started = time.perf_counter()
+
+        with futures.ThreadPoolExecutor(
+            max_workers=options["workers"], thread_name_prefix="notification-sender"
+        ) as executor:
+            while True:
+                summary = notification_service.drain(
+                    batch_size=options["batch_size"], executor=executor
+                )
+                for key in totals:
+                    totals[key] += summary[key]
+
+                if summary["notifications"]:
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+
+        elapsed = max(time.perf_counter() - started, 0.001)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sent {totals['notifications'] - totals['failed']} notifications "
+                f"in {totals['messages']} messages ({totals['failed']} failed, "
+                f"{totals['notifications'] / elapsed:.0f}/second)"
+            )
+        )
@@ -0,0 +1,48 @@
+# Standard library imports
+from datetime import date, timedelta
+
+# Django imports
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+# Local application imports
+from services import digest_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Queues a daily digest (sales, low stock, new reviews) for every seller "
+        "with something to report"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Day to report on, as YYYY-MM-DD (default: yesterday)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Notifications written per INSERT",
+        )
+
+    def handle(self, *args, **options):
+        if options["date"]:
+            try:
+                day = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD")
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+
+        summary = digest_service.send_seller_digests(
+            day, batch_size=options["batch_size"]
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Queued {summary['queued']} seller digests for {day} in "
+                f"{summary['seconds']:.2f}s ({summary['skipped']} already queued)"
+            )
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-16 23:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0006_stock_shards"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FraudFeatures",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="fraud_features",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("paid_orders", models.IntegerField(default=0)),
+                ("order_buckets", models.JSONField(default=dict)),
+                ("account_created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
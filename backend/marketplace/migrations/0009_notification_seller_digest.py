@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0008_notification"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("order_confirmation", "Order confirmation"),
+                    ("seller", "Seller notification"),
+                    ("inventory_alert", "Inventory alert"),
+                    ("seller_digest", "Seller digest"),
+                ],
+                max_length=30,
+            ),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2 on 2026-10-17 09:40
+
+from django.db import OperationalError, migrations
+
+# External-content FTS5 index over product names and descriptions, kept in
+# step with marketplace_product by triggers so queryset updates, bulk writes
+# and other processes are all covered. Stock and price updates don't touch
+# the indexed columns and so don't fire the update trigger.
+#
+# SQLite drops a table's triggers when Django rebuilds it, so a later
+# migration that alters marketplace_product must run CREATE_TRIGGERS again.
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE marketplace_product_fts USING fts5(
+    name, description,
+    content='marketplace_product', content_rowid='id',
+    tokenize='unicode61'
+)
+"""
+
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS marketplace_product_fts_insert
+    AFTER INSERT ON marketplace_product BEGIN
+        INSERT INTO marketplace_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS marketplace_product_fts_delete
+    AFTER DELETE ON marketplace_product BEGIN
+        INSERT INTO marketplace_product_fts(
+            marketplace_product_fts, rowid, name, description
+        )
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS marketplace_product_fts_update
+    AFTER UPDATE OF name, description ON marketplace_product BEGIN
+        INSERT INTO marketplace_product_fts(
+            marketplace_product_fts, rowid, name, description
+        )
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO marketplace_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+REBUILD = (
+    "INSERT INTO marketplace_product_fts(marketplace_product_fts) VALUES ('rebuild')"
+)
+
+DROP = [
+    "DROP TRIGGER IF EXISTS marketplace_product_fts_insert",
+    "DROP TRIGGER IF EXISTS marketplace_product_fts_delete",
+    "DROP TRIGGER IF EXISTS marketplace_product_fts_update",
+    "DROP TABLE IF EXISTS marketplace_product_fts",
+]
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    try:
+        schema_editor.execute(CREATE_TABLE)
+    except OperationalError:
+        # SQLite built without FTS5; search uses the in-memory index instead
+        return
+    for statement in CREATE_TRIGGERS:
+        schema_editor.execute(statement)
+    schema_editor.execute(REBUILD)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in DROP:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0009_notification_seller_digest"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -3,7 +3,9 @@ import uuid
 
 # Django imports
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -67,6 +69,9 @@ class Product(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=2)
     inventory_count = models.IntegerField(default=0)
     reserved_count = models.IntegerField(default=0)
+    # Above 1, stock lives in this many StockShard rows and the two counters
+    # above are a periodically reconciled total (see reconcile_shards).
+    stock_shards = models.PositiveSmallIntegerField(default=1)
     is_active = models.BooleanField(default=True)
     weight_kg = models.DecimalField(max_digits=6, decimal_places=3, default=1.0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -75,6 +80,12 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.name} - ${self.price}"
 
+    @property
+    def available_count(self):
+        # reserved_count is kept in step with held Reservations, so this
+        # never has to scan the reservation ledger.
+        return self.inventory_count - self.reserved_count
+
     class Meta:
         app_label = "marketplace"
 
@@ -100,9 +111,19 @@ class Order(models.Model):
     shipping = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     shipping_address = models.JSONField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # The status as last read from or saved to the database, so a save can
+    # tell which status it moves the order from (see fraud_service)
+    _saved_status = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        order._saved_status = order.__dict__.get("status")
+        return order
+
     def __str__(self):
         return f"Order #{str(self.order_id)[:8]} - {self.user.username} (${self.total})"
 
@@ -215,3 +236,173 @@ class AnalyticsEvent(models.Model):
 
     class Meta:
         app_label = "marketplace"
+
+
+class OutboxEvent(models.Model):
+    handler = models.CharField(max_length=100)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(
+        max_length=20,
+        default="pending",
+        choices=[
+            ("pending", "Pending"),
+            ("processed", "Processed"),
+            ("failed", "Failed"),
+        ],
+    )
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.handler} #{self.pk} ({self.status})"
+
+    class Meta:
+        app_label = "marketplace"
+        indexes = [models.Index(fields=["status", "available_at"])]
+
+
+class Notification(models.Model):
+    kind = models.CharField(
+        max_length=30,
+        choices=[
+            ("order_confirmation", "Order confirmation"),
+            ("seller", "Seller notification"),
+            ("inventory_alert", "Inventory alert"),
+            ("seller_digest", "Seller digest"),
+        ],
+    )
+    recipient = models.EmailField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    # Pending notifications with the same key are merged into one
+    coalesce_key = models.CharField(max_length=100, blank=True)
+    status = models.CharField(
+        max_length=20,
+        default="pending",
+        choices=[
+            ("pending", "Pending"),
+            ("sent", "Sent"),
+            ("coalesced", "Coalesced"),
+            ("failed", "Failed"),
+        ],
+    )
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} to {self.recipient} ({self.status})"
+
+    class Meta:
+        app_label = "marketplace"
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+            models.Index(fields=["coalesce_key", "status"]),
+            models.Index(fields=["status", "sent_at"]),
+        ]
+
+
+class StockShard(models.Model):
+    product = models.ForeignKey(
+        Product,
+        to_field="product_id",
+        related_name="shards",
+        on_delete=models.CASCADE,
+    )
+    slot = models.PositiveSmallIntegerField()
+    inventory_count = models.IntegerField(default=0)
+    reserved_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id} slot {self.slot}"
+
+    class Meta:
+        app_label = "marketplace"
+        unique_together = [("product", "slot")]
+
+
+class Reservation(models.Model):
+    product = models.ForeignKey(
+        Product,
+        to_field="product_id",
+        related_name="reservations",
+        on_delete=models.CASCADE,
+    )
+    order = models.ForeignKey(
+        Order,
+        related_name="reservations",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    quantity = models.IntegerField()
+    # Stock shard the hold was taken from; None when the product isn't sharded
+    slot = models.PositiveSmallIntegerField(null=True, blank=True)
+    status = models.CharField(
+        max_length=20,
+        default="held",
+        choices=[
+            ("held", "Held"),
+            ("confirmed", "Confirmed"),
+            ("released", "Released"),
+            ("expired", "Expired"),
+        ],
+    )
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product_id} x{self.quantity} ({self.status})"
+
+    class Meta:
+        app_label = "marketplace"
+        indexes = [models.Index(fields=["status", "expires_at"])]
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=20,
+        default="in_progress",
+        choices=[("in_progress", "In Progress"), ("completed", "Completed")],
+    )
+    response_status = models.IntegerField(null=True, blank=True)
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+    class Meta:
+        app_label = "marketplace"
+
+
+class FraudFeatures(models.Model):
+    """
+    Per-user fraud signals, kept up to date as orders are placed and paid so
+    scoring doesn't have to count the user's order history.
+    """
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name="fraud_features",
+        on_delete=models.CASCADE,
+    )
+    paid_orders = models.IntegerField(default=0)
+    # Orders placed per time bucket over the last day, as
+    # {bucket start (epoch seconds): count}
+    order_buckets = models.JSONField(default=dict)
+    account_created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Fraud features for user {self.user_id}"
+
+    class Meta:
+        app_label = "marketplace"
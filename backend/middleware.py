@@ -0,0 +1,32 @@
+# Standard library imports
+import time
+
+# Django imports
+from django.conf import settings
+
+# Local application imports
+from services import instrumentation
+
+
+class ServerTimingMiddleware:
+    """
+    Records request latency and reports the spans collected while handling
+    the request in a ``Server-Timing`` response header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with instrumentation.collect() as spans:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        instrumentation.REQUEST_SECONDS.observe(
+            match.view_name if match else "unmatched", elapsed
+        )
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = instrumentation.server_timing(spans, elapsed)
+        return response
@@ -0,0 +1,382 @@
+# Standard library imports
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import AnalyticsEvent, Product
+from services import instrumentation, outbox_service
+from services.search_index import tokenize
+
+# A prefix matching more entries than this is too slow to rank on every
+# keystroke, so its best suggestions are kept ready; the rest are ranked on
+# demand.
+RANKED_RANGE = 200
+# Sorts after any suffix starting with the prefix it's appended to
+HIGHEST = "\U0010ffff"
+# Longer queries aren't suggested
+MAX_QUERY_LENGTH = 100
+
+_autocomplete = None
+_autocomplete_lock = threading.Lock()
+
+
+def normalize(text):
+    return " ".join(tokenize(text)) if isinstance(text, str) else ""
+
+
+class Autocomplete:
+    """
+    Typeahead suggestions from product names and popular search queries.
+
+    Each suggestion is stored under its normalised text (``key``) and every
+    word-start suffix of it goes into ``_entries``, a sorted list of
+    ``(suffix, key)``, so "mo" finds "wireless mouse" by bisecting; ``_top``
+    holds the ranked suggestions of prefixes with too many entries to rank on
+    each request. A suggestion's weight is the number of active products with
+    that name plus the number of searches for it, once that reaches
+    AUTOCOMPLETE_MIN_SEARCHES.
+
+    Searches are counted over a sliding window of AUTOCOMPLETE_QUERY_DAYS:
+    search events from ``window_start`` (a primary key) to ``event_watermark``
+    are counted, and every sync subtracts the ones that have aged out.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.labels = {}
+        self.weights = {}
+        self.product_counts = Counter()
+        self.search_counts = Counter()
+        self.product_keys = {}
+        self.product_watermark = None
+        self.event_watermark = 0
+        self.window_start = 1
+        self.synced_at = time.monotonic()
+        self._entries = []
+        self._top = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.weights)
+
+    def suggest(self, text):
+        """
+        Return the labels of the best suggestions starting with ``text``, or
+        with ``text`` at the start of one of their words.
+        """
+        prefix = normalize(text)
+        if not prefix:
+            return []
+
+        with self._lock:
+            keys = self._top.get(prefix)
+            if keys is None:
+                keys = self._rank(prefix, *self._range(prefix))
+            return [self.labels[key] for key in keys]
+
+    def _range(self, prefix):
+        lo = bisect.bisect_left(self._entries, (prefix,))
+        return lo, bisect.bisect_left(self._entries, (prefix + HIGHEST,), lo)
+
+    def _rank(self, prefix, lo, hi):
+        candidates = {key for _, key in self._entries[lo:hi]}
+        return heapq.nsmallest(self.size, candidates, key=self._order)
+
+    def _order(self, key):
+        return -self.weights[key], key
+
+    # Building and updating
+
+    def build(self, product_rows, search_rows):
+        """
+        Load ``(pk, name, updated_at)`` for every active product and
+        ``(query, count)`` search totals, then index them in one pass.
+        """
+        for pk, name, updated_at in product_rows:
+            key = normalize(name)
+            if key:
+                self.product_keys[pk] = key
+                self.product_counts[key] += 1
+                self.labels.setdefault(key, name.strip())
+            if self.product_watermark is None or updated_at > self.product_watermark:
+                self.product_watermark = updated_at
+        for query, count in search_rows:
+            key = normalize(query)
+            if key and len(key) <= MAX_QUERY_LENGTH:
+                self.search_counts[key] += count
+
+        for key in set(self.product_counts) | set(self.search_counts):
+            weight = self._weight(key)
+            if weight:
+                self.weights[key] = weight
+                self.labels.setdefault(key, key)
+        self._entries = sorted(
+            (suffix, key) for key in self.weights for suffix in _suffixes(key)
+        )
+
+        # Walk down from the empty prefix one character at a time, ranking
+        # every prefix whose range is too big to rank on demand
+        self._top = {}
+        stack = [("", 0, len(self._entries))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if prefix:
+                self._top[prefix] = self._rank(prefix, lo, hi)
+            depth = len(prefix)
+            while lo < hi and len(self._entries[lo][0]) == depth:
+                lo += 1
+            while lo < hi:
+                child = self._entries[lo][0][: depth + 1]
+                end = bisect.bisect_left(self._entries, (child + HIGHEST,), lo, hi)
+                if end - lo > RANKED_RANGE:
+                    stack.append((child, lo, end))
+                lo = end
+
+    def _weight(self, key):
+        searches = self.search_counts[key]
+        if searches < settings.AUTOCOMPLETE_MIN_SEARCHES:
+            searches = 0
+        return self.product_counts[key] + searches
+
+    def set_product(self, pk, name, is_active):
+        """
+        Record that product ``pk`` is now called ``name``, or is gone when
+        ``is_active`` is false.
+        """
+        key = normalize(name) if is_active else ""
+        with self._lock:
+            old = self.product_keys.pop(pk, "")
+            if key:
+                self.product_keys[pk] = key
+            if key == old:
+                return
+            if old:
+                self.product_counts[old] -= 1
+                self._reweigh(old)
+            if key:
+                self.product_counts[key] += 1
+                # Product names are shown as written, rather than as searched
+                self.labels[key] = name.strip()
+                self._reweigh(key)
+
+    def add_searches(self, counts):
+        """
+        Add ``{query: count}`` to the search totals.
+        """
+        with self._lock:
+            for query, count in counts.items():
+                key = normalize(query)
+                if key and len(key) <= MAX_QUERY_LENGTH:
+                    self.search_counts[key] += count
+                    if self.search_counts[key] <= 0:
+                        del self.search_counts[key]
+                    self._reweigh(key)
+
+    def _reweigh(self, key):
+        # Called with the lock held
+        old = self.weights.get(key, 0)
+        new = self._weight(key)
+        if new == old:
+            return
+
+        if not old:
+            self.weights[key] = new
+            self.labels.setdefault(key, key)
+            for suffix in _suffixes(key):
+                bisect.insort(self._entries, (suffix, key))
+        elif not new:
+            del self.weights[key]
+            del self.labels[key]
+            for suffix in _suffixes(key):
+                index = bisect.bisect_left(self._entries, (suffix, key))
+                del self._entries[index]
+        else:
+            self.weights[key] = new
+
+        for prefix in _prefixes(key):
+            top = self._top.get(prefix)
+            if top is None:
+                if not old:
+                    # New entries can push a prefix over RANKED_RANGE
+                    lo, hi = self._range(prefix)
+                    if hi - lo > RANKED_RANGE:
+                        self._top[prefix] = self._rank(prefix, lo, hi)
+            elif new > old:
+                if key in top or len(top) < self.size:
+                    if key not in top:
+                        top.append(key)
+                    top.sort(key=self._order)
+                elif self._order(key) < self._order(top[-1]):
+                    top[-1] = key
+                    top.sort(key=self._order)
+            elif key in top:
+                # Moving down or out: something outside the list may now beat it
+                self._top[prefix] = self._rank(prefix, *self._range(prefix))
+
+    def sync(self):
+        """
+        Pick up products changed and searches recorded since the last build
+        or sync, e.g. by other processes, and drop searches that have left
+        the AUTOCOMPLETE_QUERY_DAYS window.
+        """
+        products = Product.objects.values_list("pk", "name", "is_active", "updated_at")
+        if self.product_watermark is not None:
+            products = products.filter(updated_at__gte=self.product_watermark)
+        for pk, name, is_active, updated_at in products.iterator(chunk_size=2000):
+            self.set_product(pk, name, is_active)
+            if self.product_watermark is None or updated_at > self.product_watermark:
+                self.product_watermark = updated_at
+
+        events = AnalyticsEvent.objects.filter(
+            event_type="search", pk__gt=self.event_watermark
+        )
+        latest = events.aggregate(latest=Max("pk"))["latest"]
+        if latest is not None:
+            self.add_searches(_search_counts(events.filter(pk__lte=latest)))
+            self.event_watermark = latest
+
+        start = _window_start(self.window_start, self.event_watermark)
+        if start > self.window_start:
+            expired = _search_counts(
+                AnalyticsEvent.objects.filter(
+                    event_type="search", pk__gte=self.window_start, pk__lt=start
+                )
+            )
+            self.add_searches({query: -count for query, count in expired.items()})
+            self.window_start = start
+        self.synced_at = time.monotonic()
+
+
+def _suffixes(key):
+    words = key.split(" ")
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+def _prefixes(key):
+    return {
+        suffix[:length]
+        for suffix in _suffixes(key)
+        for length in range(1, len(suffix) + 1)
+    }
+
+
+def _search_counts(events):
+    """
+    Return ``{query: count}`` for search events that recorded their query as
+    ``metadata["query"]``.
+    """
+    rows = (
+        events.values("metadata__query")
+        .annotate(count=Count("pk"))
+        .order_by()
+        .values_list("metadata__query", "count")
+    )
+    return {query: count for query, count in rows if isinstance(query, str)}
+
+
+def _window_start(after, latest):
+    """
+    Return the pk of the first search event, from pk ``after`` on, recorded
+    in the last AUTOCOMPLETE_QUERY_DAYS days, or ``latest + 1`` if there's
+    none up to ``latest``. Scans forward from ``after`` in pk order, so it
+    only reads the events that have aged out since.
+    """
+    since = timezone.now() - timedelta(days=settings.AUTOCOMPLETE_QUERY_DAYS)
+    first = (
+        AnalyticsEvent.objects.filter(
+            event_type="search", pk__gte=after, pk__lte=latest, created_at__gte=since
+        )
+        .order_by("pk")
+        .values_list("pk", flat=True)
+        .first()
+    )
+    return latest + 1 if first is None else first
+
+
+def build_autocomplete():
+    autocomplete = Autocomplete(settings.AUTOCOMPLETE_SUGGESTIONS)
+    latest = AnalyticsEvent.objects.aggregate(latest=Max("pk"))["latest"] or 0
+    start = _window_start(1, latest)
+    events = AnalyticsEvent.objects.filter(
+        event_type="search", pk__gte=start, pk__lte=latest
+    )
+
+    autocomplete.build(
+        Product.objects.filter(is_active=True)
+        .values_list("pk", "name", "updated_at")
+        .iterator(chunk_size=2000),
+        _search_counts(events).items(),
+    )
+    autocomplete.event_watermark = latest
+    autocomplete.window_start = start
+    return autocomplete
+
+
+def get_autocomplete():
+    """
+    Return the process-wide suggestions, building them on first use and
+    picking up changes every AUTOCOMPLETE_SYNC_INTERVAL seconds.
+    """
+    global _autocomplete
+    with _autocomplete_lock:
+        if _autocomplete is None:
+            _autocomplete = build_autocomplete()
+        elif (
+            time.monotonic() - _autocomplete.synced_at
+            >= settings.AUTOCOMPLETE_SYNC_INTERVAL
+        ):
+            _autocomplete.sync()
+        return _autocomplete
+
+
+def reset_autocomplete():
+    global _autocomplete
+    with _autocomplete_lock:
+        _autocomplete = None
+
+
+@instrumentation.timed
+def suggest(text):
+    return get_autocomplete().suggest(text)
+
+
+def record_search(text, user_id=None):
+    """
+    Count a search for ``text`` towards its popularity as a suggestion. The
+    "search" analytics event is written from the outbox, so the search
+    doesn't wait on it; sync() picks it up from there.
+    """
+    query = normalize(text)
+    if query and len(query) <= MAX_QUERY_LENGTH:
+        outbox_service.enqueue("track_event", "search", user_id=user_id, query=query)
+
+
+@receiver(setting_changed)
+def reset_autocomplete_on_setting_change(setting=None, **kwargs):
+    if setting is None or setting.startswith("AUTOCOMPLETE_"):
+        reset_autocomplete()
+
+
+@receiver(post_save, sender=Product)
+def update_product(instance, **kwargs):
+    # Only keep suggestions up to date once something has built them
+    if _autocomplete is not None:
+        _autocomplete.set_product(instance.pk, instance.name, instance.is_active)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product(instance, **kwargs):
+    if _autocomplete is not None:
+        _autocomplete.set_product(instance.pk, instance.name, False)
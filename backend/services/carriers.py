@@ -0,0 +1,110 @@
+# Standard library imports
+import threading
+import time
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Local application imports
+from services import pipeline
+
+_carrier = None
+_carrier_lock = threading.Lock()
+
+
+class CarrierClient:
+    """
+    Interface for shipping carrier clients.
+
+    ``track`` returns a dict with ``tracking_number``, ``carrier``, ``status``
+    and ``estimated_delivery`` (an ISO timestamp) for one tracking number.
+    """
+
+    def track(self, tracking_number):
+        raise NotImplementedError
+
+    def track_many(self, tracking_numbers):
+        """
+        Look up many tracking numbers concurrently. Returns ``(result, error)``
+        pairs in order; a lookup that raised yields its exception as
+        ``error`` instead of failing the batch.
+        """
+        return pipeline.run_many(self.track, tracking_numbers)
+
+    def close(self):
+        pass
+
+
+class SimulatedCarrier(CarrierClient):
+    """
+    In-process stand-in for a carrier API that sleeps for ``latency`` seconds
+    per request. Like most carrier APIs it accepts up to ``batch_size``
+    tracking numbers per request, so ``track_many`` costs one round trip per
+    batch and the batches run concurrently.
+    """
+
+    name = "StandardShipping"
+
+    def __init__(self, latency=0.5, batch_size=30):
+        self.latency = latency
+        self.batch_size = batch_size
+
+    def track(self, tracking_number):
+        return self._lookup([tracking_number])[0]
+
+    def track_many(self, tracking_numbers):
+        batches = [
+            tracking_numbers[start : start + self.batch_size]
+            for start in range(0, len(tracking_numbers), self.batch_size)
+        ]
+        outcomes = []
+        for batch, (results, error) in zip(
+            batches, pipeline.run_many(self._lookup, batches)
+        ):
+            if error is None:
+                outcomes.extend((result, None) for result in results)
+            else:
+                outcomes.extend((None, error) for _ in batch)
+        return outcomes
+
+    def _lookup(self, tracking_numbers):
+        time.sleep(self.latency)
+
+        estimated_delivery = (timezone.now() + timedelta(days=5)).isoformat()
+        return [
+            {
+                "tracking_number": tracking_number,
+                "carrier": self.name,
+                "status": "in_transit",
+                "estimated_delivery": estimated_delivery,
+            }
+            for tracking_number in tracking_numbers
+        ]
+
+
+def get_carrier():
+    """
+    Return the process-wide carrier client configured by ``SHIPPING_CARRIER``.
+    """
+    global _carrier
+    with _carrier_lock:
+        if _carrier is None:
+            config = settings.SHIPPING_CARRIER
+            _carrier = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+        return _carrier
+
+
+@receiver(setting_changed)
+def reset_carrier(setting=None, **kwargs):
+    global _carrier
+    if setting not in (None, "SHIPPING_CARRIER"):
+        return
+    with _carrier_lock:
+        carrier, _carrier = _carrier, None
+    if carrier is not None:
+        carrier.close()
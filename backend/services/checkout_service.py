@@ -0,0 +1,375 @@
+# Standard library imports
+import uuid
+from collections import Counter
+
+# Django imports
+from django.db import transaction
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Order, OrderItem, Product, Transaction, User
+from services import (
+    fraud_service,
+    instrumentation,
+    inventory_service,
+    outbox_service,
+    payment_service,
+    pipeline,
+    pricing_service,
+    shipping_service,
+)
+
+
+class FinalizeFailed(Exception):
+    """
+    Orders were charged but couldn't be finalized. They're left "processing"
+    with their Transaction rows saved, to be reconciled rather than retried.
+    """
+
+    def __init__(self, order_ids):
+        super().__init__(
+            f"{len(order_ids)} charged orders could not be finalized "
+            "and are awaiting reconciliation"
+        )
+        self.order_ids = order_ids
+
+
+class PreparedOrder:
+    """
+    A cart that passed validation and holds reserved stock, waiting on
+    shipping, fraud and payment.
+    """
+
+    def __init__(self, index, cart, user, order):
+        self.index = index
+        self.cart = cart
+        self.user = user
+        self.order = order
+        self.items = []
+        self.quantities = Counter()
+        self.weight = 0
+        self.promotion = None
+        self.features = None
+        self.outcome = None
+
+
+def parse_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def bulk_checkout(carts):
+    """
+    Check out many carts at once and return one result per cart, in order.
+
+    Work happens in three phases so that no lock is held while waiting on
+    remote services:
+
+    1. One transaction locks every product involved, prices each cart,
+       allocates stock and inserts orders/items/reservations in bulk.
+    2. Shipping and fraud scoring run concurrently for all orders on the
+       checkout thread pool, then all payments go to the gateway as one
+       concurrent batch, outside any transaction.
+    3. The gateway's answers are saved as Transaction rows straight away,
+       with approved orders marked "processing", so a charge is never lost;
+       the write is retried if the database is briefly unavailable.
+       Charges the gateway never answered stay "processing", with a pending
+       Transaction, until they are reconciled.
+    4. A last transaction records order statuses in bulk, confirms stock for
+       paid orders and releases it for the rest.
+
+    A cart that fails (bad input, out of stock, fraud, declined payment)
+    only fails itself; the others go through. If the process dies before
+    anyone is charged, the reservations expire and the sweeper gives the
+    stock back. If it dies or phase 4 fails after that, the charged orders
+    stay "processing" with their stock held and a completed Transaction to
+    reconcile against; a failed phase 3 or 4 raises FinalizeFailed.
+    """
+    results = [None] * len(carts)
+    # A broken rate table should fail the batch before any stock is held,
+    # not fail every order one at a time
+    shipping_service.get_rate_table()
+
+    with instrumentation.span("bulk_checkout.reserve"):
+        prepared = _reserve(carts, results)
+
+    with instrumentation.span("bulk_checkout.assess"):
+        outcomes = pipeline.run_many(_assess, prepared)
+    for entry, (outcome, error) in zip(prepared, outcomes):
+        if error is not None:
+            entry.outcome = {"status": "failed", "error": str(error)}
+        elif outcome is not None:
+            entry.outcome = outcome
+
+    # Every charge goes to the gateway in one batch; with HttpGateway they
+    # share a pool of keep-alive connections instead of a thread each.
+    to_charge = [entry for entry in prepared if entry.outcome is None]
+    with instrumentation.span("bulk_checkout.payment"):
+        charges = payment_service.authorize_many(
+            [
+                (entry.order.total, entry.cart.get("payment_method", "card"))
+                for entry in to_charge
+            ]
+        )
+    for entry, result in zip(to_charge, charges):
+        if result["status"] == "unknown":
+            result["error"] = "Payment outcome unknown; the order is on hold"
+        elif result["status"] != "success":
+            result["error"] = "Payment declined"
+        entry.outcome = result
+
+    # From here on customers may have been charged, so a failure must end in
+    # FinalizeFailed, never an error the client would retry.
+    try:
+        with instrumentation.span("bulk_checkout.record_payments"):
+            _record_payments(to_charge)
+        with instrumentation.span("bulk_checkout.finalize"):
+            _finalize(prepared, results)
+    except Exception as e:
+        charged = [
+            str(entry.order.order_id)
+            for entry in to_charge
+            if entry.outcome["status"] in payment_service.CHARGED
+        ]
+        if not charged:
+            raise
+        raise FinalizeFailed(charged) from e
+    return results
+
+
+def _reserve(carts, results):
+    user_ids = {parse_uuid(cart.get("user_id")) for cart in carts} - {None}
+    product_ids = {
+        parse_uuid(item.get("product_id"))
+        for cart in carts
+        for item in cart.get("items") or []
+    } - {None}
+
+    with transaction.atomic():
+        users = {
+            user.user_id: user for user in User.objects.filter(user_id__in=user_ids)
+        }
+        products = {
+            product.product_id: product
+            for product in Product.objects.select_for_update()
+            .filter(product_id__in=product_ids)
+            .order_by("id")
+        }
+        # Sharded products keep their stock in shards; allocate against the
+        # live shard totals rather than the reconciled product counters.
+        sharded = [pid for pid, product in products.items() if product.stock_shards > 1]
+        totals = inventory_service.shard_totals(sharded) if sharded else {}
+        for product_id, (inventory, reserved) in totals.items():
+            products[product_id].inventory_count = inventory
+            products[product_id].reserved_count = reserved
+
+        # Fraud velocity is measured before this batch is inserted, so a large
+        # import isn't flagged for its own size.
+        features = fraud_service.get_features_many(list(users.values()))
+
+        prepared = []
+        for index, cart in enumerate(carts):
+            try:
+                entry = _prepare(index, cart, users, products)
+            except (KeyError, TypeError, ValueError) as e:
+                results[index] = {"status": "failed", "error": str(e)}
+                continue
+            entry.features = features[entry.user.pk]
+            prepared.append(entry)
+
+        Order.objects.bulk_create([entry.order for entry in prepared])
+        fraud_service.record_orders_placed([entry.order for entry in prepared])
+        OrderItem.objects.bulk_create(
+            [item for entry in prepared for item in entry.items]
+        )
+
+        inventory_service.hold_many(
+            [(entry.order, entry.quantities) for entry in prepared],
+            products=products,
+        )
+
+    return prepared
+
+
+def _prepare(index, cart, users, products):
+    user = users.get(parse_uuid(cart.get("user_id")))
+    if user is None:
+        raise ValueError(f"User {cart.get('user_id')} not found")
+
+    items = cart.get("items") or []
+    if not items:
+        raise ValueError("Cart is empty")
+
+    quantities = Counter()
+    for item in items:
+        product = products.get(parse_uuid(item.get("product_id")))
+        if product is None:
+            raise ValueError(f"Product {item.get('product_id')} not found")
+        quantity = int(item["quantity"])
+        if quantity <= 0:
+            raise ValueError(f"Invalid quantity for product {product.name}")
+        quantities[product.product_id] += quantity
+
+    # Stock is checked against the in-memory counters, which already include
+    # what earlier carts in this batch took.
+    for product_id, quantity in quantities.items():
+        product = products[product_id]
+        if product.available_count < quantity:
+            raise ValueError(f"Product {product.name} out of stock")
+
+    order = Order(
+        user=user,
+        status="pending",
+        subtotal=0,
+        total=0,
+        shipping_address=cart.get("shipping_address") or {},
+    )
+    entry = PreparedOrder(index, cart, user, order)
+    promotion = pricing_service.get_promotion(cart.get("promo_code"))
+
+    quote = pricing_service.price_cart(
+        items,
+        user.subscription_tier,
+        cart.get("promo_code"),
+        products=products,
+        promotion=promotion,
+    )
+    for line in quote.lines:
+        entry.items.append(
+            OrderItem(
+                order=order,
+                product=line.product,
+                quantity=line.quantity,
+                price_at_purchase=line.unit_price,
+                discount_amount=line.discount,
+            )
+        )
+        entry.weight += float(line.product.weight_kg) * line.quantity
+
+    if promotion:
+        if not pricing_service.redeem_promotion(promotion):
+            raise ValueError(f"Promo code {cart['promo_code']} is no longer available")
+        entry.promotion = promotion
+
+    for product_id, quantity in quantities.items():
+        products[product_id].reserved_count += quantity
+
+    entry.quantities = quantities
+    order.subtotal = float(quote.subtotal)
+    return entry
+
+
+def _assess(entry):
+    """
+    Quote shipping and score fraud for one prepared order. Runs on a worker
+    thread, so it only uses data loaded in _reserve(). Returns a failure
+    outcome, or None if the order can go on to payment.
+    """
+    order = entry.order
+    order.shipping = shipping_service.quote_shipping(
+        entry.weight, order.shipping_address
+    )
+    order.tax = order.subtotal * 0.08
+    order.total = order.subtotal + order.shipping + order.tax
+
+    score = fraud_service.score_transaction(entry.features, order.subtotal + order.tax)
+    if score > fraud_service.FRAUD_THRESHOLD:
+        return {"status": "failed", "error": "Transaction flagged as fraudulent"}
+    return None
+
+
+def _record_payments(charged):
+    now = timezone.now()
+    transactions = [
+        payment_service.build_transaction(
+            entry.order,
+            entry.order.total,
+            entry.cart.get("payment_method", "card"),
+            entry.outcome,
+        )
+        for entry in charged
+        if "transaction_id" in entry.outcome
+    ]
+    held = [
+        entry.order.pk
+        for entry in charged
+        if entry.outcome["status"] in payment_service.CHARGED
+    ]
+
+    def record():
+        Transaction.objects.bulk_create(transactions)
+        Order.objects.filter(pk__in=held).update(status="processing", updated_at=now)
+
+    payment_service.save_with_retry(record)
+
+
+def _finalize(prepared, results):
+    now = timezone.now()
+    confirmed = []
+    released = []
+    outbox_calls = []
+    # Promo uses counted in _prepare() for orders that didn't go through
+    returned = Counter()
+
+    for entry in prepared:
+        order = entry.order
+        outcome = entry.outcome
+        order.updated_at = now
+
+        if outcome["status"] == "unknown":
+            # Stock stays held until the payment is reconciled
+            order.status = "processing"
+            results[entry.index] = {
+                "order_id": str(order.order_id),
+                "status": "processing",
+                "error": outcome["error"],
+            }
+            continue
+
+        if outcome["status"] != "success":
+            order.status = "cancelled"
+            released.append(order)
+            if entry.promotion:
+                returned[entry.promotion.pk] += 1
+            results[entry.index] = {
+                "order_id": str(order.order_id),
+                "status": "failed",
+                "error": outcome.get("error"),
+            }
+            continue
+
+        order.status = "paid"
+        confirmed.append(order)
+        outbox_calls.append(("send_order_confirmation", [str(order.order_id)], {}))
+        outbox_calls.append(
+            (
+                "track_event",
+                ["order_completed"],
+                {
+                    "user_id": entry.user.id,
+                    "order_id": str(order.order_id),
+                    "total": order.total,
+                },
+            )
+        )
+        results[entry.index] = {
+            "order_id": str(order.order_id),
+            "status": "success",
+            "subtotal": float(order.subtotal),
+            "tax": float(order.tax),
+            "shipping": float(order.shipping),
+            "total": float(order.total),
+        }
+
+    with transaction.atomic():
+        Order.objects.bulk_update(
+            [entry.order for entry in prepared],
+            ["subtotal", "shipping", "tax", "total", "status", "updated_at"],
+        )
+        inventory_service.confirm_orders(confirmed)
+        fraud_service.record_orders_paid(confirmed)
+        inventory_service.release_orders(released)
+        pricing_service.return_redemptions(returned)
+        outbox_service.enqueue_many(outbox_calls)
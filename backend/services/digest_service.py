@@ -0,0 +1,178 @@
+# Standard library imports
+import time
+from datetime import datetime, timedelta
+
+# Django imports
+from django.conf import settings
+from django.db.models import (
+    Avg,
+    Count,
+    DecimalField,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Notification, OrderItem, Product, Review, Seller
+from services import instrumentation, notification_service
+
+SALE_STATUSES = ["paid", "shipped", "delivered"]
+
+
+def day_bounds(day):
+    """
+    Return the ``[start, end)`` datetimes of ``day`` in the current time zone.
+    """
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, start + timedelta(days=1)
+
+
+def _empty_digest():
+    return {
+        "orders": 0,
+        "units": 0,
+        "revenue": "0.00",
+        "low_stock": [],
+        "low_stock_count": 0,
+        "reviews": 0,
+        "average_rating": None,
+    }
+
+
+@instrumentation.timed
+def build_seller_digests(start, end):
+    """
+    Return ``{seller pk: digest}`` for every seller with sales, low-stock
+    products or new reviews between ``start`` and ``end``.
+
+    Each table is read once with a grouped query, so the number of queries
+    doesn't depend on the number of sellers.
+    """
+    digests = {}
+
+    def digest_for(seller_pk):
+        if seller_pk not in digests:
+            digests[seller_pk] = _empty_digest()
+        return digests[seller_pk]
+
+    # price_at_purchase already has the tier discount off and discount_amount
+    # counts it again, so neither gives what was charged. The order subtotal
+    # does; each line gets a share of it in proportion to its value. Lines of
+    # a zero-value order (free items) count as nothing instead of dividing by
+    # zero.
+    order_value = (
+        OrderItem.objects.filter(order_id=OuterRef("order_id"))
+        .values("order_id")
+        .annotate(value=Sum(F("price_at_purchase") * F("quantity")))
+        .values("value")
+    )
+    sales = (
+        OrderItem.objects.filter(
+            order__created_at__gte=start,
+            order__created_at__lt=end,
+            order__status__in=SALE_STATUSES,
+        )
+        .values("product__seller_id")
+        .annotate(
+            orders=Count("order_id", distinct=True),
+            units=Sum("quantity"),
+            revenue=Coalesce(
+                Sum(
+                    F("price_at_purchase")
+                    * F("quantity")
+                    * F("order__subtotal")
+                    / NullIf(Subquery(order_value), 0),
+                    output_field=DecimalField(),
+                ),
+                Value(0),
+                output_field=DecimalField(),
+            ),
+        )
+    )
+    for row in sales.iterator():
+        digest = digest_for(row["product__seller_id"])
+        digest["orders"] = row["orders"]
+        digest["units"] = row["units"]
+        digest["revenue"] = f"{row['revenue']:.2f}"
+
+    low_stock = (
+        Product.objects.filter(is_active=True)
+        .annotate(available=F("inventory_count") - F("reserved_count"))
+        .filter(available__lte=settings.SELLER_DIGEST_LOW_STOCK)
+        .order_by("seller_id", "available", "pk")
+        .values_list("seller_id", "product_id", "name", "available")
+    )
+    for seller_pk, product_id, name, available in low_stock.iterator(chunk_size=5000):
+        digest = digest_for(seller_pk)
+        digest["low_stock_count"] += 1
+        if len(digest["low_stock"]) < settings.SELLER_DIGEST_LOW_STOCK_ITEMS:
+            digest["low_stock"].append(
+                {"product_id": str(product_id), "name": name, "available": available}
+            )
+
+    # A review is about either a seller or one of their products
+    reviews = (
+        Review.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(reviewed_seller=Coalesce("seller_id", "product__seller_id"))
+        .values("reviewed_seller")
+        .annotate(count=Count("id"), average=Avg("rating"))
+    )
+    for row in reviews.iterator():
+        if row["reviewed_seller"] is None:
+            continue
+        digest = digest_for(row["reviewed_seller"])
+        digest["reviews"] = row["count"]
+        digest["average_rating"] = round(row["average"], 2)
+
+    return digests
+
+
+@instrumentation.timed
+def send_seller_digests(day, batch_size=1000):
+    """
+    Queue one ``seller_digest`` notification for every active seller with
+    something to report for ``day``. Sellers already queued a digest for
+    that day are skipped, so the job can be re-run safely.
+
+    Returns ``{"queued": ..., "skipped": ..., "seconds": ...}``.
+    """
+    started = time.perf_counter()
+    start, end = day_bounds(day)
+    digests = build_seller_digests(start, end)
+
+    prefix = f"seller_digest:{day.isoformat()}:"
+    already_queued = set(
+        Notification.objects.filter(coalesce_key__startswith=prefix).values_list(
+            "coalesce_key", flat=True
+        )
+    )
+
+    queued = skipped = 0
+    pending = []
+    sellers = Seller.objects.filter(is_active=True).values_list("pk", "email")
+    for seller_pk, email in sellers.iterator(chunk_size=5000):
+        digest = digests.get(seller_pk)
+        if digest is None:
+            continue
+        key = f"{prefix}{seller_pk}"
+        if key in already_queued:
+            skipped += 1
+            continue
+
+        pending.append((email, {"date": day.isoformat(), **digest}, key))
+        if len(pending) >= batch_size:
+            queued += len(notification_service.enqueue_many("seller_digest", pending))
+            pending = []
+    if pending:
+        queued += len(notification_service.enqueue_many("seller_digest", pending))
+
+    return {
+        "queued": queued,
+        "skipped": skipped,
+        "seconds": time.perf_counter() - started,
+    }
@@ -1,44 +1,417 @@
 # Standard library imports
-import random
+import bisect
 import time
+from collections import Counter, namedtuple
 from datetime import timedelta
 
 # Django imports
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
 from django.utils import timezone
 
+# Third-party imports
+import numpy as np
+
 # Local application imports
-from marketplace.models import Order, User
+from marketplace.models import FraudFeatures, Order, Seller, User
+from services import instrumentation
 
+# Orders placed are counted in buckets this many seconds wide; a rolling
+# window counts every bucket it overlaps, so it can include up to one bucket
+# of older orders but never misses a recent one.
+BUCKET_SECONDS = 300
+RECENT_WINDOW = timedelta(hours=1)
+DAILY_WINDOW = timedelta(days=1)
 
-def check_transaction(order_id, user_id, amount):
+# Statuses an order can only reach after being paid
+PAID_STATUSES = ["paid", "shipped", "delivered", "refunded"]
+
+# A rule adds ``weight`` to the risk score when all of its conditions, given
+# as (feature, operator, value), hold. Rules are evaluated over whole feature
+# arrays, so scoring a batch costs about the same as scoring one.
+Rule = namedtuple("Rule", ["name", "weight", "conditions"])
+
+BASE_RISK = 0.1
+# Transactions scoring above this are rejected
+FRAUD_THRESHOLD = 0.8
+
+TRANSACTION_RULES = [
+    Rule("large_amount", 0.3, [("amount", ">", 5000)]),
+    Rule(
+        "large_first_order", 0.4, [("previous_orders", "==", 0), ("amount", ">", 1000)]
+    ),
+    Rule("new_account", 0.3, [("new_account", "==", True)]),
+    Rule("order_velocity", 0.5, [("recent_orders", ">", 3)]),
+]
+
+SELLER_RULES = [
+    Rule("inactive", 0.5, [("is_active", "==", False)]),
+    Rule("new_seller", 0.2, [("account_age_days", "<", 30)]),
+    Rule("low_rating", 0.3, [("rating", "<", 2), ("total_sales", ">=", 10)]),
+]
+
+_OPERATORS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+
+
+@instrumentation.timed
+def get_features(user):
+    """
+    Load the per-user signals check_transaction scores on.
+
+    Split out so checkout can read them on the request thread and run the
+    (slow) scoring call concurrently with other stages.
+    """
+    return get_features_many([user])[user.pk]
+
+
+@instrumentation.timed
+def get_features_many(users, now=None):
+    """
+    Return ``{user.pk: features}`` from each user's FraudFeatures row, read
+    by primary key in one query. Users without a row get one built from
+    their order history.
+    """
+    now = now or timezone.now()
+    rows = FraudFeatures.objects.in_bulk([user.pk for user in users])
+    missing = [user for user in users if user.pk not in rows]
+    if missing:
+        rows.update(rebuild_features(missing, now=now))
+    return {pk: _features(row, now) for pk, row in rows.items()}
+
+
+@instrumentation.timed
+def record_orders(placed=(), paid=(), unpaid=()):
+    """
+    Count newly created ``placed`` orders in their users' rolling order
+    windows, and add ``paid`` orders to (and take ``unpaid`` ones off) their
+    lifetime paid counts, in one update. Call it in the transaction that
+    wrote the orders.
+
+    Orders saved one at a time are recorded by order_saved(); code that
+    writes orders in bulk (bulk_create, bulk_update, update()) skips it and
+    must call this itself.
+    """
+    buckets = {}
+    for order in placed:
+        buckets.setdefault(order.user_id, Counter())[_bucket(order.created_at)] += 1
+    paid_orders = Counter(order.user_id for order in paid)
+    paid_orders.subtract(order.user_id for order in unpaid)
+
+    def apply(row):
+        if row.pk in buckets:
+            counts = Counter(row.order_buckets)
+            counts.update(buckets[row.pk])
+            row.order_buckets = _prune(counts, timezone.now())
+        row.paid_orders += paid_orders[row.pk]
+
+    _update(
+        set(buckets) | set(paid_orders),
+        apply,
+        ["order_buckets", "paid_orders", "updated_at"],
+    )
+
+
+def record_orders_placed(orders):
+    """
+    Count newly created ``orders`` in their users' rolling order windows.
+    """
+    return record_orders(placed=orders)
+
+
+def record_orders_paid(orders):
+    """
+    Add ``orders``, which have just been marked paid, to their users'
+    lifetime paid counts.
+    """
+    return record_orders(paid=orders)
+
+
+@receiver(pre_save, sender=Order)
+def load_saved_status(instance, raw=False, **kwargs):
+    # Orders loaded from the database know their saved status already
+    if raw or instance.pk is None or instance._saved_status is not None:
+        return
+    instance._saved_status = (
+        Order.objects.filter(pk=instance.pk).values_list("status", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Order)
+def order_saved(instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    Keep FraudFeatures in step with orders saved one at a time, wherever
+    they're saved from: checkout, the order API or the admin.
+    """
+    if raw or (update_fields is not None and "status" not in update_fields):
+        return
+    was_paid = instance._saved_status in PAID_STATUSES
+    is_paid = instance.status in PAID_STATUSES
+    instance._saved_status = instance.status
+    if created or was_paid != is_paid:
+        record_orders(
+            placed=[instance] if created else [],
+            paid=[instance] if is_paid and not was_paid else [],
+            unpaid=[instance] if was_paid and not is_paid else [],
+        )
+
+
+@instrumentation.timed
+def rebuild_features(users, now=None):
+    """
+    Recompute the FraudFeatures rows of ``users`` from their orders, save
+    them and return ``{user.pk: FraudFeatures}``. Used for users that don't
+    have a row yet and to repair counters that have drifted.
+    """
+    now = now or timezone.now()
+    users = list(users)
+    user_ids = [user.pk for user in users]
+
+    paid = dict(
+        Order.objects.filter(user_id__in=user_ids, status__in=PAID_STATUSES)
+        .values("user_id")
+        .annotate(count=Count("id"))
+        .values_list("user_id", "count")
+    )
+    buckets = {}
+    for user_id, created_at in Order.objects.filter(
+        user_id__in=user_ids, created_at__gte=now - DAILY_WINDOW
+    ).values_list("user_id", "created_at"):
+        buckets.setdefault(user_id, Counter())[_bucket(created_at)] += 1
+
+    rows = [
+        FraudFeatures(
+            user_id=user.pk,
+            paid_orders=paid.get(user.pk, 0),
+            order_buckets=_prune(buckets.get(user.pk, Counter()), now),
+            account_created_at=user.created_at,
+            updated_at=now,
+        )
+        for user in users
+    ]
+    FraudFeatures.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["paid_orders", "order_buckets", "updated_at"],
+    )
+    return {row.pk: row for row in rows}
+
+
+def _update(counts, apply, fields):
+    """
+    Lock the FraudFeatures rows of the users in ``counts``, ``apply`` the
+    change to each and save them. Users without a row are rebuilt from their
+    orders instead, which already include the change.
+    """
+    with transaction.atomic():
+        rows = list(
+            FraudFeatures.objects.select_for_update()
+            .filter(pk__in=counts)
+            .order_by("pk")
+        )
+        now = timezone.now()
+        for row in rows:
+            apply(row)
+            # bulk_update() doesn't touch auto_now fields
+            row.updated_at = now
+        FraudFeatures.objects.bulk_update(rows, fields)
+
+        missing = set(counts) - {row.pk for row in rows}
+        if missing:
+            rebuild_features(User.objects.filter(pk__in=missing))
+
+
+def _features(row, now):
+    recent_from = (now - RECENT_WINDOW).timestamp()
+    daily_from = (now - DAILY_WINDOW).timestamp()
+    recent_orders = 0
+    daily_orders = 0
+    for bucket, count in row.order_buckets.items():
+        bucket_end = int(bucket) + BUCKET_SECONDS
+        if bucket_end > recent_from:
+            recent_orders += count
+        if bucket_end > daily_from:
+            daily_orders += count
+
+    return {
+        "previous_orders": row.paid_orders,
+        "recent_orders": recent_orders,
+        "daily_orders": daily_orders,
+        "new_account": row.account_created_at > (now - timedelta(days=1)),
+    }
+
+
+def _bucket(moment):
+    return str(int(moment.timestamp()) // BUCKET_SECONDS * BUCKET_SECONDS)
+
+
+def _prune(buckets, now):
+    oldest = (now - DAILY_WINDOW).timestamp() - BUCKET_SECONDS
+    return {bucket: count for bucket, count in buckets.items() if int(bucket) > oldest}
+
+
+@instrumentation.timed
+def score_transaction(features, amount):
     time.sleep(0.3)
 
-    user = User.objects.get(user_id=user_id)
-    previous_orders = Order.objects.filter(user=user, status="paid").count()
+    return score_batch([features], [amount])[0]
 
-    risk_score = 0.1
 
-    if amount > 5000:
-        risk_score += 0.3
+@instrumentation.timed
+def score_batch(features, amounts):
+    """
+    Score many transactions at once: ``features[i]`` (from get_features())
+    paying ``amounts[i]``. Returns a list of risk scores in the same order.
+    """
+    columns = {
+        name: np.array([row[name] for row in features])
+        for name in ("previous_orders", "recent_orders", "daily_orders", "new_account")
+    }
+    columns["amount"] = np.array([float(amount) for amount in amounts])
+    return evaluate(TRANSACTION_RULES, columns, len(amounts)).tolist()
 
-    if previous_orders == 0 and amount > 1000:
-        risk_score += 0.4
 
-    if user.created_at > (timezone.now() - timedelta(days=1)):
-        risk_score += 0.3
+@instrumentation.timed
+def rescore_orders(since, batch_size=5000):
+    """
+    Score every order placed since ``since`` against its buyer's features as
+    they stood when it was placed, and return a summary with the flagged
+    orders.
 
-    recent_orders = Order.objects.filter(
-        user=user, created_at__gte=timezone.now() - timedelta(hours=1)
-    ).count()
+    Orders are read oldest first in chunks of plain values, and each buyer's
+    history is carried along as the chunks go by: a running count of paid
+    orders and the times of their orders in the last DAILY_WINDOW. The
+    buyers a chunk introduces are loaded in one grouped query, with their
+    paid orders from before ``since`` counted. Each chunk is scored in one
+    pass.
+    """
+    scored = 0
+    flagged = []
+    started = time.perf_counter()
+    recent = RECENT_WINDOW.total_seconds()
+    daily = DAILY_WINDOW.total_seconds()
 
-    if recent_orders > 3:
-        risk_score += 0.5
+    # Orders in the day before ``since`` fall in the first orders' windows
+    placed = {}
+    for user_id, created_at in (
+        Order.objects.filter(created_at__gte=since - DAILY_WINDOW, created_at__lt=since)
+        .order_by("created_at", "pk")
+        .values_list("user_id", "created_at")
+    ):
+        placed.setdefault(user_id, []).append(created_at.timestamp())
+    # Each buyer's signup time and running count of paid orders
+    joined = {}
+    paid = {}
 
-    return min(risk_score, 1.0)
+    cursor = Q(created_at__gte=since)
+    while True:
+        rows = list(
+            Order.objects.filter(cursor)
+            .order_by("created_at", "pk")
+            .values_list(
+                "pk",
+                "order_id",
+                "user_id",
+                "created_at",
+                "status",
+                "subtotal",
+                "tax",
+            )[:batch_size]
+        )
+        if not rows:
+            break
+        last = rows[-1]
+        cursor = Q(created_at__gt=last[3]) | Q(created_at=last[3], pk__gt=last[0])
 
+        for user_id, created_at, count in (
+            User.objects.filter(pk__in={row[2] for row in rows} - paid.keys())
+            .annotate(
+                count=Count(
+                    "order",
+                    filter=Q(
+                        order__created_at__lt=since,
+                        order__status__in=PAID_STATUSES,
+                    ),
+                )
+            )
+            .values_list("pk", "created_at", "count")
+        ):
+            joined[user_id] = created_at
+            paid[user_id] = count
+
+        features = []
+        for _, _, user_id, created_at, status, _, _ in rows:
+            moment = created_at.timestamp()
+            times = placed.setdefault(user_id, [])
+            del times[: bisect.bisect_right(times, moment - daily)]
+            times.append(moment)
+            features.append(
+                {
+                    "previous_orders": paid[user_id],
+                    "recent_orders": len(times)
+                    - bisect.bisect_right(times, moment - recent),
+                    "daily_orders": len(times),
+                    "new_account": joined[user_id] > created_at - timedelta(days=1),
+                }
+            )
+            if status in PAID_STATUSES:
+                paid[user_id] += 1
+
+        scores = score_batch(features, [row[5] + row[6] for row in rows])
+        flagged.extend(
+            str(row[1]) for row, score in zip(rows, scores) if score > FRAUD_THRESHOLD
+        )
+        scored += len(rows)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "scored": scored,
+        "flagged_count": len(flagged),
+        "flagged": flagged,
+        "seconds": round(elapsed, 3),
+    }
 
-def check_seller(seller_id):
-    time.sleep(0.2)
 
-    risk_indicators = random.random()
-    return risk_indicators
+def evaluate(rules, columns, size):
+    """
+    Return the risk scores of ``size`` rows whose features are given as
+    ``columns`` ({feature: array}), capped at 1.
+    """
+    scores = np.full(size, BASE_RISK)
+    for rule in rules:
+        hit = np.ones(size, dtype=bool)
+        for feature, operator, value in rule.conditions:
+            hit &= _OPERATORS[operator](columns[feature], value)
+        scores += rule.weight * hit
+    return np.minimum(scores, 1.0)
+
+
+@instrumentation.timed
+def check_transaction(order_id, user_id, amount):
+    now = timezone.now()
+    row = FraudFeatures.objects.filter(user__user_id=user_id).first()
+    if row is None:
+        user = User.objects.get(user_id=user_id)
+        row = rebuild_features([user], now=now)[user.pk]
+    return score_transaction(_features(row, now), amount)
+
+
+@instrumentation.timed
+def check_seller(seller_id):
+    seller = Seller.objects.get(seller_id=seller_id)
+    columns = {
+        "is_active": np.array([seller.is_active]),
+        "account_age_days": np.array([(timezone.now() - seller.created_at).days]),
+        "rating": np.array([float(seller.rating)]),
+        "total_sales": np.array([seller.total_sales]),
+    }
+    return float(evaluate(SELLER_RULES, columns, 1)[0])
@@ -0,0 +1,135 @@
+# Standard library imports
+import hashlib
+import json
+from collections import namedtuple
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import IdempotencyKey
+from services.cache import LRUCache
+
+StoredResponse = namedtuple("StoredResponse", ["status", "body", "request_hash"])
+
+# Completed responses are immutable, so replays can be served from memory
+# without a database round trip. The table remains the source of truth.
+_responses = LRUCache(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_KEY_TTL
+)
+
+
+class IdempotencyError(Exception):
+    status_code = 400
+
+
+class KeyReused(IdempotencyError):
+    status_code = 422
+
+    def __init__(self, key):
+        super().__init__(
+            f"Idempotency-Key {key} was already used for a different request"
+        )
+
+
+class RequestInProgress(IdempotencyError):
+    status_code = 409
+
+    def __init__(self, key):
+        super().__init__(
+            f"A request with Idempotency-Key {key} is still being processed"
+        )
+
+
+def request_hash(method, path, data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{method} {path}\n{body}".encode()).hexdigest()
+
+
+def begin(key, req_hash):
+    """
+    Claim ``key`` for a new request, or return the StoredResponse of the
+    request that already used it.
+
+    Returns None when the caller should go ahead and process the request
+    (then call complete() or abandon()). Raises KeyReused if the key was used
+    with a different payload and RequestInProgress if the original request
+    hasn't finished yet. A request that has held the key for longer than
+    IDEMPOTENCY_LEASE is assumed to have died, and the key is taken over.
+    """
+    stored = _responses.get(key)
+    if stored is not None:
+        if stored.request_hash != req_hash:
+            raise KeyReused(key)
+        return stored
+
+    record = IdempotencyKey.objects.filter(key=key).first()
+    if record is not None:
+        now = timezone.now()
+        expires_at = record.created_at + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        lease_ends = record.created_at + timedelta(seconds=settings.IDEMPOTENCY_LEASE)
+        if expires_at <= now:
+            record.delete()
+        elif (
+            record.status == "in_progress"
+            and record.request_hash == req_hash
+            and lease_ends <= now
+        ):
+            return _take_over(key, record, now)
+        else:
+            return _replay(key, record, req_hash)
+
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(key=key, request_hash=req_hash)
+    except IntegrityError:
+        # Another request claimed the key between our read and insert
+        record = IdempotencyKey.objects.filter(key=key).first()
+        if record is None:
+            raise RequestInProgress(key)
+        return _replay(key, record, req_hash)
+    return None
+
+
+def _take_over(key, record, now):
+    # Conditional on the old lease so only one retry gets to take it over
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status="in_progress", created_at=record.created_at
+    ).update(created_at=now)
+    if not taken:
+        raise RequestInProgress(key)
+    return None
+
+
+def _replay(key, record, req_hash):
+    if record.request_hash != req_hash:
+        raise KeyReused(key)
+    if record.status != "completed":
+        raise RequestInProgress(key)
+
+    stored = StoredResponse(record.response_status, record.response_body, req_hash)
+    _responses.set(key, stored)
+    return stored
+
+
+def complete(key, req_hash, status, body):
+    IdempotencyKey.objects.filter(key=key).update(
+        status="completed", response_status=status, response_body=body
+    )
+    _responses.set(key, StoredResponse(status, body, req_hash))
+
+
+def abandon(key):
+    """
+    Release a key whose request crashed so the client can retry with it.
+    """
+    IdempotencyKey.objects.filter(key=key, status="in_progress").delete()
+
+
+def purge_expired():
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
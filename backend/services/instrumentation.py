@@ -0,0 +1,241 @@
+# Standard library imports
+import contextvars
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Django imports
+from django.db import connection
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+# Spans finished during the current request, or None outside of one. The list
+# is shared with worker threads through pipeline's copied contexts.
+_spans = contextvars.ContextVar("instrumentation_spans", default=None)
+
+
+class Histogram:
+    """
+    Process-local Prometheus-style histogram with a single label.
+    """
+
+    def __init__(self, name, documentation, label, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            if label_value not in self._series:
+                self._series[label_value] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series = self._series[label_value]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        with self._lock:
+            snapshot = {
+                label_value: (list(counts), total, count)
+                for label_value, (counts, total, count) in self._series.items()
+            }
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for label_value, (counts, total, count) in sorted(snapshot.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:g}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    """
+    Process-local Prometheus-style gauge with a single label.
+    """
+
+    def __init__(self, name, documentation, label):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def set(self, label_value, value):
+        with self._lock:
+            self._series[label_value] = value
+
+    def set_all(self, values):
+        """
+        Replace every series, dropping label values not in ``values``.
+        """
+        with self._lock:
+            self._series = dict(values)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        with self._lock:
+            snapshot = dict(self._series)
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        for label_value, value in sorted(snapshot.items()):
+            lines.append(
+                f'{self.name}{{{self.label}="{_escape(label_value)}"}} {value:g}'
+            )
+        return "\n".join(lines)
+
+
+SPAN_SECONDS = Histogram(
+    "marketplace_span_duration_seconds",
+    "Time spent in instrumented code.",
+    "span",
+    DURATION_BUCKETS,
+)
+SPAN_QUERIES = Histogram(
+    "marketplace_span_db_queries",
+    "Database queries issued by instrumented code.",
+    "span",
+    QUERY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "marketplace_http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    "view",
+    DURATION_BUCKETS,
+)
+HISTOGRAMS = [SPAN_SECONDS, SPAN_QUERIES, REQUEST_SECONDS]
+
+# Set from the database when metrics are scraped; see
+# notification_service.update_metrics()
+NOTIFICATION_QUEUE_DEPTH = Gauge(
+    "marketplace_notification_queue_depth",
+    "Notifications waiting to be sent.",
+    "kind",
+)
+NOTIFICATION_QUEUE_LAG = Gauge(
+    "marketplace_notification_queue_lag_seconds",
+    "How long the most overdue notification has been waiting.",
+    "kind",
+)
+NOTIFICATION_SEND_RATE = Gauge(
+    "marketplace_notification_send_rate",
+    "Notifications sent per second over the last minute.",
+    "kind",
+)
+GAUGES = [NOTIFICATION_QUEUE_DEPTH, NOTIFICATION_QUEUE_LAG, NOTIFICATION_SEND_RATE]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@contextmanager
+def span(name):
+    """
+    Time the enclosed block and count the queries it runs on this thread.
+
+    Spans nest, and an outer span includes the time and queries of the spans
+    inside it.
+    """
+    queries = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_query):
+            yield
+    finally:
+        record(name, time.perf_counter() - started, queries)
+
+
+def timed(func):
+    """
+    Run every call of ``func`` in a span named ``<module>.<function>``.
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def record(name, duration, queries=0):
+    SPAN_SECONDS.observe(name, duration)
+    SPAN_QUERIES.observe(name, queries)
+
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, duration, queries))
+
+
+@contextmanager
+def collect():
+    """
+    Gather the ``(name, seconds, queries)`` of every span finished inside the
+    block, including those on pipeline worker threads.
+    """
+    spans = []
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+def server_timing(spans, total=None):
+    """
+    Format collected spans as a Server-Timing header value. Repeated spans
+    are merged into one entry per name.
+    """
+    merged = {}
+    for name, duration, queries in spans:
+        entry = merged.setdefault(name, [0, 0, 0])
+        entry[0] += duration
+        entry[1] += 1
+        entry[2] += queries
+
+    metrics = [
+        f'{name};dur={duration * 1000:.1f};desc="calls={calls} queries={queries}"'
+        for name, (duration, calls, queries) in merged.items()
+    ]
+    if total is not None:
+        metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+def render_metrics():
+    """
+    Return every histogram and gauge in the Prometheus text exposition format.
+    """
+    return "\n".join(metric.render() for metric in HISTOGRAMS + GAUGES) + "\n"
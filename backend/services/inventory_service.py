@@ -1,38 +1,550 @@
 # Standard library imports
+import random
 import time
+from collections import Counter, defaultdict
+from datetime import timedelta
 
 # Django imports
-from django.db.models import F
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
 
 # Local application imports
-from marketplace.models import Product
+from marketplace.models import Order, Product, Reservation, StockShard
+from services import instrumentation
 
+# import_stock() sets products sharing a count with a plain IN-list UPDATE once
+# at least this many share it; building a CASE branch per SKU costs far more.
+IMPORT_MIN_GROUP = 8
 
-def check_availability(product_id, quantity):
+
+class InsufficientStock(ValueError):
+    def __init__(self, product_id):
+        super().__init__(f"Product {product_id} out of stock")
+        self.product_id = product_id
+
+
+@instrumentation.timed
+def check_availability(product_id, quantity, product=None):
     time.sleep(0.05)
-    product = Product.objects.get(product_id=product_id)
-    available = product.inventory_count - product.reserved_count
-    return available >= quantity
+    if product is None:
+        product = Product.objects.get(product_id=product_id)
+    if product.stock_shards > 1:
+        inventory, reserved = shard_totals([product.product_id]).get(
+            product.product_id, (0, 0)
+        )
+        return inventory - reserved >= quantity
+    return product.available_count >= quantity
 
 
-def reserve_inventory(product_id, quantity):
+@instrumentation.timed
+def reserve_inventory(product_id, quantity, order=None, product=None):
     time.sleep(0.1)
-    Product.objects.filter(product_id=product_id).update(
-        reserved_count=F("reserved_count") + quantity
+    reserve_many(
+        {product_id: quantity},
+        order=order,
+        products={product_id: product} if product else None,
     )
     return True
 
 
-def confirm_reservation(product_id, quantity):
-    Product.objects.filter(product_id=product_id).update(
-        inventory_count=F("inventory_count") - quantity,
-        reserved_count=F("reserved_count") - quantity,
-    )
+@instrumentation.timed
+def confirm_reservation(product_id, quantity, order=None):
+    confirm_many({product_id: quantity}, order=order)
     return True
 
 
-def release_reservation(product_id, quantity):
-    Product.objects.filter(product_id=product_id).update(
-        reserved_count=F("reserved_count") - quantity
-    )
+@instrumentation.timed
+def release_reservation(product_id, quantity, order=None):
+    release_many({product_id: quantity}, order=order)
     return True
+
+
+@instrumentation.timed
+def reserve_many(quantities, order=None, ttl=None, products=None):
+    """
+    Reserve ``{product_id: quantity}`` for one order in a single conditional
+    UPDATE. If any product is short, nothing is reserved and
+    InsufficientStock names the product.
+    """
+    return hold_many([(order, quantities)], ttl=ttl, products=products)
+
+
+@instrumentation.timed
+def confirm_many(quantities, order=None):
+    """
+    Sell the oldest open holds on each product, up to ``{product_id:
+    quantity}``. Returns how many holds were confirmed.
+    """
+    return _settle(
+        Reservation.objects.filter(product_id__in=quantities, order=order),
+        "confirmed",
+        quantities,
+    )
+
+
+@instrumentation.timed
+def release_many(quantities, order=None):
+    """
+    Give back the oldest open holds on each product, up to ``{product_id:
+    quantity}``. Returns how many holds were released.
+    """
+    return _settle(
+        Reservation.objects.filter(product_id__in=quantities, order=order),
+        "released",
+        quantities,
+    )
+
+
+@instrumentation.timed
+def hold_many(holds, ttl=None, products=None):
+    """
+    Reserve stock for many ``(order, {product_id: quantity})`` pairs: one
+    INSERT for the reservation rows and one UPDATE for the counters.
+
+    Holds expire after ``ttl`` seconds (INVENTORY_RESERVATION_TTL by default)
+    unless they are confirmed or released first; release_expired() gives the
+    stock back.
+
+    The counter UPDATE only succeeds for products with enough stock left,
+    and sharded products take their stock from a random slot the same way;
+    if anything is short the whole call is rolled back with
+    InsufficientStock. Pass the already loaded ``products`` (keyed by
+    product_id) to save a query.
+    """
+    ttl = settings.INVENTORY_RESERVATION_TTL if ttl is None else ttl
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    shards = _shard_counts(
+        {product_id for _, quantities in holds for product_id in quantities},
+        products or {},
+    )
+
+    reservations = []
+    totals = Counter()
+    with transaction.atomic():
+        for order, quantities in holds:
+            for product_id, quantity in quantities.items():
+                if shards.get(product_id, 1) > 1:
+                    taken = _take_from_shards(product_id, quantity, shards[product_id])
+                else:
+                    taken = {None: quantity}
+                    totals[product_id] += quantity
+
+                reservations.extend(
+                    Reservation(
+                        product_id=product_id,
+                        order=order,
+                        slot=slot,
+                        quantity=slot_quantity,
+                        expires_at=expires_at,
+                    )
+                    for slot, slot_quantity in taken.items()
+                )
+
+        _reserve_counts(totals)
+        Reservation.objects.bulk_create(reservations)
+    return reservations
+
+
+@instrumentation.timed
+def confirm_orders(orders):
+    """
+    Turn every open hold of ``orders`` into a sale. A hold that already
+    expired is still sold; it only comes off the inventory count, since its
+    reserved stock was given back when it expired.
+    """
+    return _settle(Reservation.objects.filter(order__in=orders), "confirmed")
+
+
+@instrumentation.timed
+def release_orders(orders):
+    """
+    Give back the stock held for ``orders``.
+    """
+    return _settle(Reservation.objects.filter(order__in=orders), "released")
+
+
+@instrumentation.timed
+def release_expired(batch_size=1000, now=None):
+    """
+    Expire up to ``batch_size`` holds whose time ran out and give their stock
+    back, in one UPDATE per table. Returns how many holds were expired.
+
+    Holds for "processing" orders are left alone: the customer has been
+    charged, so the stock is theirs until the order is reconciled.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Reservation.objects.select_for_update(skip_locked=True)
+            .filter(status="held", expires_at__lte=now)
+            .exclude(order__in=Order.objects.filter(status="processing"))
+            .order_by("expires_at")
+            .values_list("id", "product_id", "slot", "quantity")[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        Reservation.objects.filter(id__in=[row[0] for row in rows]).update(
+            status="expired"
+        )
+        _adjust_holds([row[1:] for row in rows], reserved_sign=-1)
+    return len(rows)
+
+
+@instrumentation.timed
+def adjust_counts(quantities, inventory_sign=0, reserved_sign=0):
+    """
+    Apply ``{product_id: quantity}`` to many products in a single UPDATE,
+    adding (sign 1) or subtracting (sign -1) each quantity from the counters.
+    """
+    if not quantities:
+        return 0
+
+    updates = _counter_updates(
+        [({"product_id": product_id}, qty) for product_id, qty in quantities.items()],
+        inventory_sign,
+        reserved_sign,
+    )
+    return Product.objects.filter(product_id__in=quantities).update(**updates)
+
+
+@instrumentation.timed
+def import_stock(levels, batch_size=None):
+    """
+    Set inventory counts from a warehouse feed of ``{product_id: count}``.
+
+    Feeds repeat the same few counts across many SKUs, so products sharing a
+    count are set together with ``UPDATE ... WHERE product_id IN (...)``;
+    the rest go through one CASE UPDATE per batch. Either way a statement
+    covers at most ``batch_size`` products (INVENTORY_IMPORT_BATCH_SIZE by
+    default). Sharded products are re-split over their shards.
+
+    The import is all-or-nothing. Returns how many products were updated;
+    ids with no matching product are skipped.
+    """
+    batch_size = batch_size or settings.INVENTORY_IMPORT_BATCH_SIZE
+    sharded = dict(
+        Product.objects.filter(stock_shards__gt=1).values_list(
+            "product_id", "stock_shards"
+        )
+    )
+    by_count = defaultdict(list)
+    for product_id, count in levels.items():
+        if product_id not in sharded:
+            by_count[count].append(product_id)
+
+    updated = 0
+    scattered = []
+    with transaction.atomic():
+        for count, product_ids in by_count.items():
+            if len(product_ids) < IMPORT_MIN_GROUP:
+                scattered.extend((product_id, count) for product_id in product_ids)
+                continue
+            for batch in _batches(product_ids, batch_size):
+                updated += Product.objects.filter(product_id__in=batch).update(
+                    inventory_count=count
+                )
+
+        for batch in _batches(scattered, batch_size):
+            updated += Product.objects.filter(
+                product_id__in=[product_id for product_id, _ in batch]
+            ).update(
+                inventory_count=Case(
+                    *[
+                        When(product_id=product_id, then=Value(count))
+                        for product_id, count in batch
+                    ],
+                    output_field=IntegerField(),
+                )
+            )
+
+        for product_id, shards in sharded.items():
+            if product_id in levels:
+                shard_stock(product_id, shards, inventory_count=levels[product_id])
+                updated += 1
+    return updated
+
+
+@instrumentation.timed
+def shard_stock(product_id, shards, inventory_count=None):
+    """
+    Spread a product's stock over ``shards`` StockShard rows so concurrent
+    checkouts update different rows instead of queueing on one. With
+    ``shards=1`` the stock goes back onto the product row.
+
+    Inventory (replaced by ``inventory_count`` if given) is split evenly;
+    stock that is currently held moves to slot 0 along with its reservations.
+    """
+    shards = max(int(shards), 1)
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(product_id=product_id)
+        if product.stock_shards > 1:
+            inventory, reserved = shard_totals([product_id]).get(product_id, (0, 0))
+        else:
+            inventory, reserved = product.inventory_count, product.reserved_count
+        if inventory_count is not None:
+            inventory = inventory_count
+
+        StockShard.objects.filter(product=product).delete()
+        if shards > 1:
+            per_slot, extra = divmod(inventory, shards)
+            StockShard.objects.bulk_create(
+                StockShard(
+                    product=product,
+                    slot=slot,
+                    inventory_count=per_slot + (slot < extra),
+                    reserved_count=reserved if slot == 0 else 0,
+                )
+                for slot in range(shards)
+            )
+        Reservation.objects.filter(
+            product=product, status__in=["held", "expired"]
+        ).update(slot=0 if shards > 1 else None)
+
+        product.inventory_count = inventory
+        product.reserved_count = reserved
+        product.stock_shards = shards
+        product.save(
+            update_fields=["inventory_count", "reserved_count", "stock_shards"]
+        )
+    return product
+
+
+def shard_totals(product_ids=None):
+    """
+    Sum the stock shards of ``product_ids`` (all sharded products by
+    default) into ``{product_id: (inventory_count, reserved_count)}``.
+    """
+    shards = StockShard.objects.all()
+    if product_ids is not None:
+        shards = shards.filter(product_id__in=product_ids)
+    return {
+        row["product_id"]: (row["inventory"], row["reserved"])
+        for row in shards.values("product_id").annotate(
+            inventory=Sum("inventory_count"), reserved=Sum("reserved_count")
+        )
+    }
+
+
+def stock_levels(product):
+    """
+    Live stock of one product, with the per-slot breakdown when it's sharded.
+    """
+    shards = []
+    inventory, reserved = product.inventory_count, product.reserved_count
+    if product.stock_shards > 1:
+        shards = list(
+            StockShard.objects.filter(product=product)
+            .order_by("slot")
+            .values("slot", "inventory_count", "reserved_count")
+        )
+        inventory = sum(shard["inventory_count"] for shard in shards)
+        reserved = sum(shard["reserved_count"] for shard in shards)
+
+    return {
+        "product_id": str(product.product_id),
+        "stock_shards": product.stock_shards,
+        "inventory_count": inventory,
+        "reserved_count": reserved,
+        "available": inventory - reserved,
+        "shards": shards,
+    }
+
+
+@instrumentation.timed
+def reconcile_shards():
+    """
+    Copy each sharded product's summed shard counters onto its product row,
+    so listings and the admin show current stock. Returns how many products
+    were updated.
+    """
+    totals = shard_totals()
+    products = list(Product.objects.filter(product_id__in=totals, stock_shards__gt=1))
+    for product in products:
+        product.inventory_count, product.reserved_count = totals[product.product_id]
+    Product.objects.bulk_update(products, ["inventory_count", "reserved_count"])
+    return len(products)
+
+
+def _shard_counts(product_ids, products):
+    counts = {
+        product_id: product.stock_shards
+        for product_id, product in products.items()
+        if product is not None
+    }
+    missing = [product_id for product_id in product_ids if product_id not in counts]
+    if missing:
+        counts.update(
+            Product.objects.filter(product_id__in=missing).values_list(
+                "product_id", "stock_shards"
+            )
+        )
+    return counts
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _reserve_counts(quantities):
+    """
+    Add ``{product_id: quantity}`` to reserved_count in one UPDATE that only
+    matches products with enough stock left. Raises InsufficientStock, with
+    nothing reserved, unless every product matched.
+    """
+    if not quantities:
+        return
+
+    changes = [({"product_id": pid}, qty) for pid, qty in quantities.items()]
+    with transaction.atomic():
+        updated = Product.objects.filter(
+            product_id__in=quantities,
+            inventory_count__gte=F("reserved_count") + _delta(changes, 1),
+        ).update(reserved_count=F("reserved_count") + _delta(changes, 1))
+        if updated == len(quantities):
+            return
+        transaction.set_rollback(True)
+
+    # Rolled back; look up which product was short to report it
+    available = dict(
+        Product.objects.filter(product_id__in=quantities).values_list(
+            "product_id", F("inventory_count") - F("reserved_count")
+        )
+    )
+    short = [pid for pid, qty in quantities.items() if available.get(pid, 0) < qty]
+    raise InsufficientStock(short[0] if short else next(iter(quantities)))
+
+
+def _take_from_shards(product_id, quantity, shards):
+    """
+    Reserve ``quantity`` from a product's stock shards and return
+    ``{slot: quantity}``. Must run inside a transaction so a partial take is
+    rolled back when the shards can't cover the whole quantity.
+    """
+    # Usually a single random slot can cover the hold. Picking at random
+    # spreads concurrent checkouts over the slots.
+    slots = list(range(shards))
+    random.shuffle(slots)
+    for slot in slots:
+        if _take_from_slot(Q(product_id=product_id, slot=slot), quantity):
+            return {slot: quantity}
+
+    # Near sell-out the remaining stock is scattered; gather it slot by slot.
+    taken = {}
+    remaining = quantity
+    for shard in StockShard.objects.filter(product_id=product_id).order_by("slot"):
+        amount = min(shard.inventory_count - shard.reserved_count, remaining)
+        if amount > 0 and _take_from_slot(Q(pk=shard.pk), amount):
+            taken[shard.slot] = amount
+            remaining -= amount
+            if not remaining:
+                return taken
+    raise InsufficientStock(product_id)
+
+
+def _take_from_slot(lookup, quantity):
+    return StockShard.objects.filter(
+        lookup, inventory_count__gte=F("reserved_count") + quantity
+    ).update(reserved_count=F("reserved_count") + quantity)
+
+
+def _settle(reservations, status, quantities=None):
+    """
+    Move reservations to ``status`` ("confirmed" or "released") and apply the
+    matching counter changes. With ``quantities`` (``{product_id:
+    quantity}``), only the oldest holds of each product that fit within its
+    quantity are settled.
+    """
+    sources = ["held", "expired"] if status == "confirmed" else ["held"]
+    with transaction.atomic():
+        rows = list(
+            reservations.select_for_update()
+            .filter(status__in=sources)
+            .order_by("id")
+            .values_list("id", "product_id", "slot", "quantity", "status")
+        )
+        if quantities is not None:
+            rows = _oldest_within(rows, quantities)
+        if not rows:
+            return 0
+
+        Reservation.objects.filter(id__in=[row[0] for row in rows]).update(
+            status=status
+        )
+        held = [row[1:4] for row in rows if row[4] == "held"]
+        expired = [row[1:4] for row in rows if row[4] == "expired"]
+        if status == "confirmed":
+            _adjust_holds(held, inventory_sign=-1, reserved_sign=-1)
+            _adjust_holds(expired, inventory_sign=-1)
+        else:
+            _adjust_holds(held, reserved_sign=-1)
+    return len(rows)
+
+
+def _oldest_within(rows, quantities):
+    remaining = dict(quantities)
+    taken = []
+    for row in rows:
+        product_id, row_quantity = row[1], row[3]
+        if row_quantity <= remaining.get(product_id, 0):
+            taken.append(row)
+            remaining[product_id] -= row_quantity
+    return taken
+
+
+def _adjust_holds(holds, inventory_sign=0, reserved_sign=0):
+    """
+    Apply counter changes for ``(product_id, slot, quantity)`` holds, on the
+    product row or on the stock shard the hold came from.
+    """
+    on_products = Counter()
+    on_shards = Counter()
+    for product_id, slot, quantity in holds:
+        if slot is None:
+            on_products[product_id] += quantity
+        else:
+            on_shards[(product_id, slot)] += quantity
+
+    adjust_counts(on_products, inventory_sign, reserved_sign)
+    if on_shards:
+        updates = _counter_updates(
+            [
+                ({"product_id": product_id, "slot": slot}, quantity)
+                for (product_id, slot), quantity in on_shards.items()
+            ],
+            inventory_sign,
+            reserved_sign,
+        )
+        # Only the touched shards, so the UPDATE doesn't rewrite (and lock)
+        # every shard of the product
+        touched = Q()
+        for product_id, slot in on_shards:
+            touched |= Q(product_id=product_id, slot=slot)
+        StockShard.objects.filter(touched).update(**updates)
+
+
+def _counter_updates(changes, inventory_sign, reserved_sign):
+    """
+    Build ``update()`` kwargs that add each ``(lookup, quantity)`` change to
+    the rows matching its lookup, as one CASE expression per counter.
+    """
+
+    updates = {}
+    if inventory_sign:
+        updates["inventory_count"] = F("inventory_count") + _delta(
+            changes, inventory_sign
+        )
+    if reserved_sign:
+        updates["reserved_count"] = F("reserved_count") + _delta(changes, reserved_sign)
+    return updates
+
+
+def _delta(changes, sign):
+    return Case(
+        *[When(**lookup, then=Value(sign * quantity)) for lookup, quantity in changes],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
@@ -0,0 +1,80 @@
+# Standard library imports
+import logging
+import threading
+import time
+
+# Django imports
+from django.conf import settings
+from django.core.mail import send_mail
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+class NotificationSender:
+    """
+    Interface for notification delivery clients.
+
+    ``send`` delivers one message to one recipient and raises if it could
+    not. It is called from worker threads, so it must not touch the database.
+    """
+
+    def send(self, recipient, subject, body):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SimulatedSender(NotificationSender):
+    """
+    In-process stand-in that logs each message after sleeping for
+    ``latency`` seconds.
+    """
+
+    def __init__(self, latency=0.3):
+        self.latency = latency
+
+    def send(self, recipient, subject, body):
+        time.sleep(self.latency)
+        logger.info(f"Sending {subject!r} to {recipient}")
+
+
+class EmailSender(NotificationSender):
+    """
+    Sends notifications as email through Django's ``EMAIL_BACKEND``.
+    """
+
+    def __init__(self, from_email=None):
+        self.from_email = from_email
+
+    def send(self, recipient, subject, body):
+        send_mail(subject, body, self.from_email, [recipient])
+
+
+def get_sender():
+    """
+    Return the process-wide sender configured by ``NOTIFICATION_SENDER``.
+    """
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            config = settings.NOTIFICATION_SENDER
+            _sender = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+        return _sender
+
+
+@receiver(setting_changed)
+def reset_sender(setting=None, **kwargs):
+    global _sender
+    if setting not in (None, "NOTIFICATION_SENDER"):
+        return
+    with _sender_lock:
+        sender, _sender = _sender, None
+    if sender is not None:
+        sender.close()
@@ -1,39 +1,321 @@
 # Standard library imports
 import logging
-import time
+import threading
+from collections import defaultdict
+from concurrent import futures
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
 
 # Local application imports
-from marketplace.models import Order, Seller
+from marketplace.models import Notification, Order, Product, Seller
+from services import instrumentation, notification_senders
 
 logger = logging.getLogger(__name__)
 
+MAX_ATTEMPTS = 5
+DEFAULT_POLICY = {"delay": 0, "coalesce": False}
+SUBJECTS = {
+    "order_confirmation": "Your order is confirmed",
+    "seller": "Seller update",
+    "inventory_alert": "Low inventory alert",
+    "seller_digest": "Your daily seller digest",
+}
 
-def send_order_confirmation(order_id):
-    time.sleep(0.5)
+_executor = None
+_executor_lock = threading.Lock()
 
-    order = Order.objects.get(order_id=order_id)
-    user = order.user
 
-    logger.info(f"Sending order confirmation to {user.email} for order {order_id}")
+def get_policy(kind):
+    return {**DEFAULT_POLICY, **settings.NOTIFICATION_KINDS.get(kind, {})}
 
-    return {"status": "sent", "recipient": user.email}
 
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=settings.NOTIFICATION_WORKERS,
+                thread_name_prefix="notification-sender",
+            )
+    return _executor
 
-def send_seller_notification(seller_id, message_type, data):
-    time.sleep(0.3)
 
-    seller = Seller.objects.get(seller_id=seller_id)
+@instrumentation.timed
+def send_order_confirmation(order_id):
+    order = Order.objects.select_related("user").get(order_id=order_id)
+    recipient = order.user.email
+
+    enqueue("order_confirmation", recipient, {"order_id": str(order_id)})
+    return {"status": "queued", "recipient": recipient}
 
-    logger.info(f"Sending {message_type} notification to seller {seller.email}")
 
-    return {"status": "sent", "recipient": seller.email}
+@instrumentation.timed
+def send_seller_notification(seller_id, message_type, data):
+    seller = Seller.objects.get(seller_id=seller_id)
+
+    enqueue("seller", seller.email, {"message_type": message_type, "data": data or {}})
+    return {"status": "queued", "recipient": seller.email}
 
 
+@instrumentation.timed
 def send_inventory_alert(product_id, current_stock):
-    time.sleep(0.2)
+    product = Product.objects.select_related("seller").get(product_id=product_id)
+
+    enqueue(
+        "inventory_alert",
+        product.seller.email,
+        {
+            "product_id": str(product_id),
+            "product_name": product.name,
+            "current_stock": current_stock,
+        },
+        coalesce_key=f"inventory_alert:{product_id}",
+    )
+    return {"status": "queued", "recipient": product.seller.email}
+
+
+def enqueue(kind, recipient, payload, coalesce_key=""):
+    """
+    Queue a notification. It becomes sendable after its kind's ``delay`` so
+    that later notifications for the same recipient go out in the same
+    message.
+
+    For kinds with ``coalesce`` set, a notification whose ``coalesce_key``
+    matches one still waiting replaces that one's payload instead of adding
+    a row, so the recipient hears about the subject once, with the latest
+    data.
+    """
+    if kind not in SUBJECTS:
+        raise ValueError(f"Unknown notification kind: {kind}")
+
+    policy = get_policy(kind)
+    now = timezone.now()
+    if coalesce_key and policy["coalesce"]:
+        # Only rows no worker has claimed yet: they haven't been tried and
+        # aren't due. A single UPDATE, so it can't race with a claim.
+        merged = Notification.objects.filter(
+            coalesce_key=coalesce_key,
+            status="pending",
+            attempts=0,
+            available_at__gt=now,
+        ).update(recipient=recipient, payload=payload)
+        if merged:
+            return None
+
+    return Notification.objects.create(
+        kind=kind,
+        recipient=recipient,
+        payload=payload,
+        coalesce_key=coalesce_key,
+        available_at=now + timedelta(seconds=policy["delay"]),
+    )
+
+
+def enqueue_many(kind, notifications, batch_size=1000):
+    """
+    Queue many ``(recipient, payload, coalesce_key)`` notifications of one
+    kind with bulk INSERTs. Unlike enqueue() this never merges into waiting
+    rows, so it's meant for jobs that produce one notification per subject.
+    """
+    if kind not in SUBJECTS:
+        raise ValueError(f"Unknown notification kind: {kind}")
+
+    available_at = timezone.now() + timedelta(seconds=get_policy(kind)["delay"])
+    return Notification.objects.bulk_create(
+        [
+            Notification(
+                kind=kind,
+                recipient=recipient,
+                payload=payload,
+                coalesce_key=coalesce_key,
+                available_at=available_at,
+            )
+            for recipient, payload, coalesce_key in notifications
+        ],
+        batch_size=batch_size,
+    )
+
+
+def render(notifications):
+    """
+    Return ``(subject, body)`` for one message covering ``notifications``.
+    """
+    lines = [_describe(notification) for notification in notifications]
+    if len(lines) == 1:
+        return SUBJECTS[notifications[0].kind], lines[0]
+    return f"{len(lines)} marketplace updates", "\n".join(f"- {line}" for line in lines)
 
-    logger.info(
-        f"Low inventory alert for product {product_id}: {current_stock} remaining"
+
+def _describe(notification):
+    payload = notification.payload
+    if notification.kind == "order_confirmation":
+        return f"Order {payload['order_id']} is confirmed."
+    if notification.kind == "inventory_alert":
+        return (
+            f"{payload['product_name']} is running low: "
+            f"{payload['current_stock']} remaining."
+        )
+    if notification.kind == "seller_digest":
+        return _describe_digest(payload)
+    details = ", ".join(f"{key}: {value}" for key, value in payload["data"].items())
+    return f"{payload['message_type']}" + (f" ({details})" if details else "")
+
+
+def _describe_digest(payload):
+    parts = [
+        f"{payload['orders']} orders, {payload['units']} units sold, "
+        f"${payload['revenue']} revenue"
+    ]
+    if payload["low_stock_count"]:
+        products = ", ".join(
+            f"{item['name']} ({item['available']} left)"
+            for item in payload["low_stock"]
+        )
+        more = payload["low_stock_count"] - len(payload["low_stock"])
+        parts.append(
+            f"{payload['low_stock_count']} products low on stock: {products}"
+            + (f" and {more} more" if more else "")
+        )
+    if payload["reviews"]:
+        parts.append(
+            f"{payload['reviews']} new reviews, "
+            f"averaging {payload['average_rating']} stars"
+        )
+    return f"Your day on {payload['date']}: " + "; ".join(parts) + "."
+
+
+@instrumentation.timed
+def drain(batch_size=500, executor=None, max_attempts=MAX_ATTEMPTS):
+    """
+    Send one batch of due notifications, oldest first.
+
+    The batch is claimed by pushing its ``available_at`` past
+    ``NOTIFICATION_LEASE`` so no other worker picks it up, then sent outside
+    any transaction: one message per recipient, with the messages spread
+    over ``executor`` (the shared pool of ``NOTIFICATION_WORKERS`` threads by
+    default). If the worker dies mid-batch, the rows come due again when the
+    lease runs out. Failed messages are retried with exponential backoff
+    until ``max_attempts`` is reached.
+
+    Returns ``{"notifications": ..., "messages": ..., "failed": ...}``.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", available_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        for notification in batch:
+            notification.attempts += 1
+            notification.available_at = now + timedelta(
+                seconds=settings.NOTIFICATION_LEASE
+            )
+        Notification.objects.bulk_update(batch, ["attempts", "available_at"])
+
+    # Coalesced rows can still meet here if they were queued concurrently;
+    # keep the newest one per key.
+    latest = {}
+    for notification in batch:
+        if notification.coalesce_key and get_policy(notification.kind)["coalesce"]:
+            previous = latest.get(notification.coalesce_key)
+            if previous is not None:
+                previous.status = "coalesced"
+            latest[notification.coalesce_key] = notification
+
+    by_recipient = defaultdict(list)
+    for notification in batch:
+        if notification.status == "pending":
+            by_recipient[notification.recipient].append(notification)
+
+    sender = notification_senders.get_sender()
+    executor = executor or get_executor()
+    submitted = [
+        (group, executor.submit(sender.send, recipient, *render(group)))
+        for recipient, group in by_recipient.items()
+    ]
+
+    failed = 0
+    for group, future in submitted:
+        try:
+            future.result()
+        except Exception as e:
+            logger.exception(f"Sending {len(group)} notifications failed")
+            failed += len(group)
+            for notification in group:
+                notification.last_error = str(e)
+                if notification.attempts >= max_attempts:
+                    notification.status = "failed"
+                else:
+                    notification.available_at = now + timedelta(
+                        seconds=2**notification.attempts
+                    )
+        else:
+            sent_at = timezone.now()
+            for notification in group:
+                notification.status = "sent"
+                notification.sent_at = sent_at
+
+    Notification.objects.bulk_update(
+        batch, ["status", "last_error", "available_at", "sent_at"]
     )
+    return {"notifications": len(batch), "messages": len(submitted), "failed": failed}
 
-    return {"status": "sent"}
+
+def queue_stats(window=60):
+    """
+    Return queue depth, how long the most overdue notification has waited
+    and send rate (notifications per second over the last ``window``
+    seconds), by kind.
+    """
+    now = timezone.now()
+    stats = {
+        kind: {"depth": 0, "lag_seconds": 0.0, "send_rate": 0.0} for kind in SUBJECTS
+    }
+
+    pending = (
+        Notification.objects.filter(status="pending")
+        .values("kind")
+        .annotate(depth=Count("id"), oldest=Min("available_at"))
+    )
+    for row in pending:
+        stats[row["kind"]]["depth"] = row["depth"]
+        stats[row["kind"]]["lag_seconds"] = max(
+            (now - row["oldest"]).total_seconds(), 0.0
+        )
+
+    sent = (
+        Notification.objects.filter(
+            status="sent", sent_at__gte=now - timedelta(seconds=window)
+        )
+        .values("kind")
+        .annotate(count=Count("id"))
+    )
+    for row in sent:
+        stats[row["kind"]]["send_rate"] = row["count"] / window
+
+    return stats
+
+
+def update_metrics():
+    """
+    Refresh the notification gauges from the queue table. Workers run in
+    their own processes, so the numbers come from the database rather than
+    in-memory counters.
+    """
+    stats = queue_stats()
+    instrumentation.NOTIFICATION_QUEUE_DEPTH.set_all(
+        {kind: values["depth"] for kind, values in stats.items()}
+    )
+    instrumentation.NOTIFICATION_QUEUE_LAG.set_all(
+        {kind: values["lag_seconds"] for kind, values in stats.items()}
+    )
+    instrumentation.NOTIFICATION_SEND_RATE.set_all(
+        {kind: values["send_rate"] for kind, values in stats.items()}
+    )
+    return stats
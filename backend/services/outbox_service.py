@@ -0,0 +1,105 @@
+# Standard library imports
+import logging
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Local application imports
+from marketplace.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Side effects that may be deferred through the outbox. Events only store the
+# short name so renaming a function never strands rows already in the table.
+HANDLERS = {
+    "send_order_confirmation": (
+        "services.notification_service.send_order_confirmation"
+    ),
+    "track_event": "services.analytics_service.track_event",
+}
+
+MAX_ATTEMPTS = 5
+
+
+def enqueue(handler, *args, **kwargs):
+    """
+    Record a side effect to run once the surrounding transaction commits.
+
+    Call this inside the same ``transaction.atomic()`` block as the writes the
+    side effect depends on: if the transaction rolls back, so does the event.
+    """
+    if handler not in HANDLERS:
+        raise ValueError(f"Unknown outbox handler: {handler}")
+
+    return OutboxEvent.objects.create(
+        handler=handler, payload={"args": list(args), "kwargs": kwargs}
+    )
+
+
+def enqueue_many(calls):
+    """
+    Like enqueue(), for many ``(handler, args, kwargs)`` calls in one INSERT.
+    """
+    events = []
+    for handler, args, kwargs in calls:
+        if handler not in HANDLERS:
+            raise ValueError(f"Unknown outbox handler: {handler}")
+        events.append(
+            OutboxEvent(handler=handler, payload={"args": list(args), "kwargs": kwargs})
+        )
+
+    return OutboxEvent.objects.bulk_create(events)
+
+
+def dispatch(event):
+    func = import_string(HANDLERS[event.handler])
+    return func(*event.payload.get("args", []), **event.payload.get("kwargs", {}))
+
+
+def drain(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Run one batch of pending outbox events, oldest first.
+
+    The batch is claimed by pushing its ``available_at`` past
+    ``OUTBOX_LEASE`` so no other worker picks it up, and that claim commits
+    before any handler runs; handlers never run while the claim holds the
+    database's write lock. Each event then runs in its own transaction,
+    together with marking it processed, so a failing handler does not undo
+    the others. If the worker dies mid-batch, the events come due again when
+    the lease runs out. Failures are retried with exponential backoff until
+    ``max_attempts`` is reached. Returns the number of events processed.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", available_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        for event in events:
+            event.attempts += 1
+            event.available_at = now + timedelta(seconds=settings.OUTBOX_LEASE)
+        OutboxEvent.objects.bulk_update(events, ["attempts", "available_at"])
+
+    for event in events:
+        try:
+            with transaction.atomic():
+                dispatch(event)
+                event.status = "processed"
+                event.processed_at = timezone.now()
+                event.save(update_fields=["status", "processed_at"])
+        except Exception as e:
+            logger.exception(f"Outbox event {event.pk} ({event.handler}) failed")
+            event.last_error = str(e)
+            if event.attempts >= max_attempts:
+                event.status = "failed"
+            else:
+                event.status = "pending"
+                event.available_at = now + timedelta(seconds=2**event.attempts)
+            event.save(update_fields=["status", "last_error", "available_at"])
+
+    return len(events)
@@ -0,0 +1,345 @@
+# Standard library imports
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+# Django imports
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Local application imports
+from services import pipeline
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+class GatewayError(Exception):
+    pass
+
+
+class OutcomeUnknown(GatewayError):
+    """
+    The charge reached the gateway but no answer came back in time, so it may
+    or may not have gone through.
+    """
+
+
+def approved(transaction_id, auth_code):
+    return {
+        "status": "success",
+        "transaction_id": transaction_id,
+        "gateway_response": {"auth_code": auth_code, "response_code": "00"},
+    }
+
+
+def declined(transaction_id, error_code="DECLINED", response_code="05"):
+    return {
+        "status": "failed",
+        "transaction_id": transaction_id,
+        "gateway_response": {"error_code": error_code, "response_code": response_code},
+    }
+
+
+def unknown(transaction_id):
+    # ISO 8583 response code 68: response received too late
+    return {
+        "status": "unknown",
+        "transaction_id": transaction_id,
+        "gateway_response": {"error_code": "TIMEOUT", "response_code": "68"},
+    }
+
+
+def failed(transaction_id, error):
+    if isinstance(error, OutcomeUnknown):
+        return unknown(transaction_id)
+    return declined(transaction_id, "GATEWAY_ERROR", "96")
+
+
+class PaymentGateway:
+    """
+    Interface for payment gateway clients.
+
+    ``charge`` returns a dict with ``status`` ("success", "failed", or
+    "unknown" when the gateway got the charge but didn't answer in time),
+    ``transaction_id`` and ``gateway_response``. ``transaction_id`` is also
+    the gateway-side idempotency key, so re-sending a charge is safe.
+    """
+
+    def charge(self, transaction_id, amount, payment_method):
+        raise NotImplementedError
+
+    def charge_many(self, charges):
+        """
+        Run many ``(transaction_id, amount, payment_method)`` charges
+        concurrently. Returns results in order; a charge that raised is
+        reported as declined (or unknown, for OutcomeUnknown) rather than
+        failing the batch.
+        """
+        outcomes = pipeline.run_many(lambda args: self.charge(*args), charges)
+        return [
+            result if error is None else failed(args[0], error)
+            for args, (result, error) in zip(charges, outcomes)
+        ]
+
+    def close(self):
+        pass
+
+
+class SimulatedGateway(PaymentGateway):
+    """
+    In-process stand-in that sleeps for ``latency`` seconds per charge and
+    declines large amounts more often.
+    """
+
+    def __init__(self, latency=2.0):
+        self.latency = latency
+
+    def charge(self, transaction_id, amount, payment_method):
+        time.sleep(self.latency)
+
+        if amount > 10000:
+            success_rate = 0.7
+        elif amount > 5000:
+            success_rate = 0.85
+        else:
+            success_rate = 0.95
+
+        if random.random() < success_rate:
+            auth_code = hashlib.md5(str(transaction_id).encode()).hexdigest()[:8]
+            return approved(transaction_id, auth_code)
+        return declined(transaction_id)
+
+
+class HttpGateway(PaymentGateway):
+    """
+    JSON-over-HTTP gateway client built on asyncio.
+
+    Requests run on one background event loop shared by every thread in the
+    process, over a pool of at most ``pool_size`` keep-alive connections, so
+    thousands of in-flight charges cost sockets rather than threads.
+
+    ``timeout`` covers one request from the moment it has a connection, not
+    the time spent queued for one. A charge that times out before it was sent
+    is declined; one that times out after comes back "unknown".
+    """
+
+    def __init__(self, url, pool_size=20, timeout=10.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path.rstrip("/") + "/v1/charges"
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._loop = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def charge(self, transaction_id, amount, payment_method):
+        return self._run(self._charge(transaction_id, amount, payment_method), None)
+
+    def charge_many(self, charges):
+        async def run_all():
+            results = await asyncio.gather(
+                *[self._charge(*args) for args in charges], return_exceptions=True
+            )
+            return [
+                failed(args[0], result) if isinstance(result, Exception) else result
+                for args, result in zip(charges, results)
+            ]
+
+        return self._run(run_all(), None)
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            loop, pool = self._loop, self._pool
+            self._loop = self._pool = None
+
+        asyncio.run_coroutine_threadsafe(pool.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    @property
+    def connections_opened(self):
+        return self._pool.opened if self._pool else 0
+
+    def _run(self, coro, timeout):
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="payment-gateway", daemon=True
+                ).start()
+                self._pool = asyncio.run_coroutine_threadsafe(
+                    self._make_pool(), loop
+                ).result()
+                self._loop = loop
+            return self._loop
+
+    async def _make_pool(self):
+        return ConnectionPool(self.host, self.port, self.pool_size)
+
+    async def _charge(self, transaction_id, amount, payment_method):
+        body = json.dumps(
+            {
+                "transaction_id": str(transaction_id),
+                "amount": f"{Decimal(str(amount)):.2f}",
+                "currency": "USD",
+                "payment_method": payment_method,
+            }
+        ).encode()
+
+        try:
+            status, payload = await self._pool.request(
+                "POST", self.path, body, self.timeout
+            )
+        except OutcomeUnknown:
+            return unknown(transaction_id)
+        if status != 200:
+            raise GatewayError(f"Gateway returned HTTP {status}")
+
+        data = json.loads(payload)
+        if data.get("status") == "approved":
+            return approved(transaction_id, data.get("auth_code"))
+        return declined(
+            transaction_id,
+            data.get("error_code", "DECLINED"),
+            data.get("response_code", "05"),
+        )
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections to one host, for use on a single event
+    loop. Only speaks the subset of HTTP the gateway uses: requests with a
+    body, responses with Content-Length.
+    """
+
+    def __init__(self, host, port, size):
+        self.host = host
+        self.port = port
+        self.opened = 0
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method, path, body, timeout=None):
+        """
+        Send one request and return ``(status, payload)``. ``timeout`` starts
+        once a connection slot is free. Running out of time while connecting
+        raises TimeoutError; running out after the request was written raises
+        OutcomeUnknown, since the server may already have acted on it.
+        """
+        async with self._slots:
+            deadline = asyncio.get_running_loop().time() + (timeout or 0)
+
+            def remaining():
+                if timeout is None:
+                    return None
+                return max(deadline - asyncio.get_running_loop().time(), 0)
+
+            connection = self._idle.pop() if self._idle else None
+            if connection is not None:
+                try:
+                    return await self._exchange(
+                        connection, method, path, body, remaining()
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # The server closed an idle connection; retry on a new one.
+                    pass
+
+            connection = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), remaining()
+            )
+            self.opened += 1
+            return await self._exchange(connection, method, path, body, remaining())
+
+    async def _exchange(self, connection, method, path, body, timeout):
+        if timeout == 0:
+            self._idle.append(connection)
+            raise asyncio.TimeoutError()
+        try:
+            return await asyncio.wait_for(
+                self._send(connection, method, path, body), timeout
+            )
+        except asyncio.TimeoutError:
+            raise OutcomeUnknown("No response from the gateway in time")
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    async def _send(self, connection, method, path, body):
+        reader, writer = connection
+        try:
+            writer.write(
+                (
+                    f"{method} {path} HTTP/1.1\r\n"
+                    f"Host: {self.host}:{self.port}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: keep-alive\r\n\r\n"
+                ).encode()
+                + body
+            )
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("Connection closed by gateway")
+            status = int(status_line.split()[1])
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            payload = await reader.readexactly(int(headers.get("content-length", 0)))
+        except BaseException:
+            writer.close()
+            raise
+
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._idle.append(connection)
+        return status, payload
+
+
+def get_gateway():
+    """
+    Return the process-wide gateway configured by ``PAYMENT_GATEWAY``.
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            config = settings.PAYMENT_GATEWAY
+            _gateway = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+        return _gateway
+
+
+@receiver(setting_changed)
+def reset_gateway(setting=None, **kwargs):
+    global _gateway
+    if setting not in (None, "PAYMENT_GATEWAY"):
+        return
+    with _gateway_lock:
+        gateway, _gateway = _gateway, None
+    if gateway is not None:
+        gateway.close()
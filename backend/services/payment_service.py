@@ -1,45 +1,130 @@
 # Standard library imports
-import hashlib
-import random
 import time
+import uuid
+
+# Django imports
+from django.db import DatabaseError, transaction
+from django.utils import timezone
 
 # Local application imports
 from marketplace.models import Order, Transaction
+from services import instrumentation, payment_gateways
+
+# Gateway outcomes that may have taken the customer's money
+CHARGED = ("success", "unknown")
+
+# Tries at saving a gateway result before giving up. Once a card may have
+# been charged, losing the result is worse than a short wait.
+RECORD_ATTEMPTS = 3
+RECORD_BACKOFF = 0.05
+
+
+class PaymentNotRecorded(Exception):
+    """
+    The gateway answered but its result couldn't be saved, so the customer
+    may have been charged with nothing on record.
+    """
+
+    def __init__(self, result):
+        super().__init__(
+            f"Payment {result['transaction_id']} went to the gateway but could "
+            "not be recorded"
+        )
+        self.result = result
 
 
+@instrumentation.timed
 def process_payment(order_id, amount, payment_method):
-    time.sleep(2)
+    """
+    Charge ``amount`` for the order and save the gateway's answer in its own
+    committed transaction, marking the order "processing" if it may have been
+    charged. Call it outside any transaction so the record survives whatever
+    happens next. Raises PaymentNotRecorded if the answer can't be saved.
+    """
+    result = authorize(amount, payment_method)
 
-    order = Order.objects.get(order_id=order_id)
+    def record():
+        order = Order.objects.get(order_id=order_id)
+        payment = record_payment(order, amount, payment_method, result)
+        if result["status"] in CHARGED:
+            Order.objects.filter(pk=order.pk).update(
+                status="processing", updated_at=timezone.now()
+            )
+        return payment
 
-    transaction = Transaction.objects.create(
-        order=order, amount=amount, payment_method=payment_method, status="processing"
-    )
+    try:
+        payment = save_with_retry(record)
+    except DatabaseError as e:
+        raise PaymentNotRecorded(result) from e
 
-    if amount > 10000:
-        success_rate = 0.7
-    elif amount > 5000:
-        success_rate = 0.85
-    else:
-        success_rate = 0.95
-
-    if random.random() < success_rate:
-        transaction.status = "completed"
-        transaction.gateway_response = {
-            "auth_code": hashlib.md5(
-                str(transaction.transaction_id).encode()
-            ).hexdigest()[:8],
-            "response_code": "00",
-        }
-        transaction.save()
-        return {"status": "success", "transaction_id": str(transaction.transaction_id)}
+    if result["status"] == "success":
+        return {"status": "success", "transaction_id": str(payment.transaction_id)}
+    elif result["status"] == "unknown":
+        return {"status": "unknown", "transaction_id": str(payment.transaction_id)}
     else:
-        transaction.status = "failed"
-        transaction.gateway_response = {"error_code": "DECLINED", "response_code": "05"}
-        transaction.save()
         return {"status": "failed", "error": "Payment declined"}
 
 
+def save_with_retry(write):
+    """
+    Run ``write()`` in a transaction, trying again on a database error (a
+    locked SQLite file, a dropped connection) up to RECORD_ATTEMPTS times.
+    """
+    for attempt in range(1, RECORD_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                return write()
+        except DatabaseError:
+            if attempt == RECORD_ATTEMPTS:
+                raise
+            time.sleep(RECORD_BACKOFF * attempt)
+
+
+@instrumentation.timed
+def authorize(amount, payment_method):
+    """
+    Ask the gateway to charge ``amount``. Does not touch the database, so it
+    is safe to call from worker threads; persist the outcome with
+    record_payment() (or build Transaction rows in bulk from it).
+    """
+    return payment_gateways.get_gateway().charge(uuid.uuid4(), amount, payment_method)
+
+
+@instrumentation.timed
+def authorize_many(charges):
+    """
+    Authorize many ``(amount, payment_method)`` charges concurrently, in the
+    same result format as authorize().
+    """
+    return payment_gateways.get_gateway().charge_many(
+        [(uuid.uuid4(), amount, payment_method) for amount, payment_method in charges]
+    )
+
+
+# Transaction status for each gateway outcome; anything else is "failed"
+TRANSACTION_STATUSES = {"success": "completed", "unknown": "pending"}
+
+
+@instrumentation.timed
+def build_transaction(order, amount, payment_method, result):
+    return Transaction(
+        transaction_id=result["transaction_id"],
+        order=order,
+        amount=amount,
+        payment_method=payment_method,
+        status=TRANSACTION_STATUSES.get(result["status"], "failed"),
+        gateway_response=result["gateway_response"],
+    )
+
+
+@instrumentation.timed
+def record_payment(order, amount, payment_method, result):
+    transaction = build_transaction(order, amount, payment_method, result)
+    transaction.save()
+    return transaction
+
+
+@instrumentation.timed
 def process_refund(transaction_id):
     time.sleep(1)
 
@@ -0,0 +1,134 @@
+# Standard library imports
+import contextvars
+import logging
+import threading
+import time
+from concurrent import futures
+
+# Django imports
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY = {"timeout": 5.0, "fallback": "raise"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class StageFailed(Exception):
+    def __init__(self, stage, reason):
+        super().__init__(f"{stage} stage failed: {reason}")
+        self.stage = stage
+        self.reason = reason
+
+
+class Stage:
+    """
+    A unit of checkout work that can run alongside other stages.
+
+    Stage functions run on worker threads, so they must not touch the
+    database: load whatever they need on the request thread and pass it in.
+    """
+
+    def __init__(self, name, func, *args, **kwargs):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=settings.CHECKOUT_MAX_WORKERS,
+                thread_name_prefix="checkout-stage",
+            )
+    return _executor
+
+
+def get_policy(name):
+    return {**DEFAULT_POLICY, **settings.CHECKOUT_STAGES.get(name, {})}
+
+
+def falls_back(policy, error):
+    """
+    Return True if ``policy`` substitutes its default for ``error``: always
+    for a timeout, and for other errors only when they're one of the dotted
+    exception paths in ``"fallback_on"`` (any error if it isn't set).
+    """
+    if policy["fallback"] != "default":
+        return False
+    if isinstance(error, futures.TimeoutError) or "fallback_on" not in policy:
+        return True
+    return isinstance(
+        error, tuple(import_string(path) for path in policy["fallback_on"])
+    )
+
+
+def run_stages(stages):
+    """
+    Run independent stages concurrently and return ``{name: result}``.
+
+    Each stage gets its own timeout, measured from when the batch started, so
+    wall-clock time is bounded by the slowest stage rather than the sum. When
+    a stage errors or times out its policy decides what happens: ``"raise"``
+    aborts with StageFailed, ``"default"`` substitutes the policy's default
+    (see falls_back for which errors it covers).
+    """
+    executor = get_executor()
+    started = time.monotonic()
+
+    # Copy the caller's context so per-request state (contextvars)
+    # follows the work onto the worker threads.
+    submitted = [
+        (
+            stage,
+            executor.submit(
+                contextvars.copy_context().run, stage.func, *stage.args, **stage.kwargs
+            ),
+        )
+        for stage in stages
+    ]
+
+    results = {}
+    for stage, future in submitted:
+        policy = get_policy(stage.name)
+        remaining = policy["timeout"] - (time.monotonic() - started)
+        try:
+            results[stage.name] = future.result(timeout=max(remaining, 0))
+        except Exception as e:
+            reason = "timed out" if isinstance(e, futures.TimeoutError) else str(e)
+            if not falls_back(policy, e):
+                raise StageFailed(stage.name, reason) from e
+
+            logger.warning(
+                f"Checkout stage {stage.name} {reason}; using fallback value"
+            )
+            results[stage.name] = policy["default"]
+
+    return results
+
+
+def run_many(func, items):
+    """
+    Call ``func(item)`` for every item on the shared pool.
+
+    Returns ``(result, error)`` pairs in input order; an item that raises
+    yields its exception as ``error`` instead of failing the whole batch.
+    """
+    executor = get_executor()
+    submitted = [
+        executor.submit(contextvars.copy_context().run, func, item) for item in items
+    ]
+
+    outcomes = []
+    for future in submitted:
+        try:
+            outcomes.append((future.result(), None))
+        except Exception as e:
+            outcomes.append((None, e))
+    return outcomes
@@ -1,69 +1,323 @@
 # Standard library imports
-from decimal import Decimal
+import uuid
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
 
 # Django imports
+from django.conf import settings
+from django.core import signing
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
 # Local application imports
 from marketplace.models import Product, Promotion
+from services import instrumentation
+from services.cache import LRUCache
 
+_MISSING = object()
+
+CENT = Decimal("0.01")
+
+# Automatic discount off the list price for each subscription tier
+TIER_DISCOUNTS = {"premium": Decimal("0.05"), "business": Decimal("0.10")}
+
+LineQuote = namedtuple(
+    "LineQuote", ["product", "quantity", "unit_price", "discount", "total"]
+)
+CartQuote = namedtuple("CartQuote", ["lines", "subtotal", "discount", "promotion"])
+
+QUOTE_SALT = "marketplace.pricing.quote"
+
+# Promotions by code, including codes that don't exist. Usage counts in here
+# go stale; redeem_promotion() enforces the limit against the database.
+_promotions = LRUCache(
+    maxsize=settings.PROMOTION_CACHE_SIZE, ttl=settings.PROMOTION_CACHE_TTL
+)
+
+
+@receiver([post_save, post_delete], sender=Promotion)
+def invalidate_promotions(**kwargs):
+    # A save may have renamed the code, so drop everything rather than one key
+    _promotions.clear()
+
+
+def get_promotion(code):
+    """
+    Return the usable promotion for ``code``, or None if it doesn't exist, is
+    inactive, is outside its dates or has run out of uses.
+    """
+    if not code:
+        return None
+
+    promo = _promotions.get(code, _MISSING)
+    if promo is _MISSING:
+        promo = Promotion.objects.filter(code=code).first()
+        _promotions.set(code, promo)
+
+    now = timezone.now()
+    if (
+        promo is None
+        or not promo.is_active
+        or not promo.start_date <= now <= promo.end_date
+        or promo.usage_count >= promo.usage_limit
+    ):
+        return None
+    return promo
 
-def calculate_price(product_id, quantity, user_tier, promo_code=None, max_discount_percent=10):
-    product = Product.objects.get(product_id=product_id)
-    
-    # Store original price for discount calculations
-    original_price = product.price
-    unit_price = product.price
-    
-    # Phase 1: Apply tier discount to unit price
-    tier_discount_amount = Decimal("0")
-    if user_tier == "premium":
-        tier_discount_amount = original_price * Decimal("0.05")
-        unit_price = unit_price * Decimal("0.95")
-    elif user_tier == "business":
-        tier_discount_amount = original_price * Decimal("0.10")
-        unit_price = unit_price * Decimal("0.90")
-
-    # Calculate subtotal after tier discount
-    subtotal = unit_price * quantity
-    
-    # Phase 2: Calculate promo discount from ORIGINAL price (not tier-discounted price)
-    promo_discount_amount = Decimal("0")
-    if promo_code:
-        try:
-            promo = Promotion.objects.get(
-                code=promo_code,
-                is_active=True,
-                start_date__lte=timezone.now(),
-                end_date__gte=timezone.now(),
-            )
 
-            if promo.usage_count < promo.usage_limit:
-                if promo.discount_type == "percentage":
-                    # Apply promo discount to original price, not tier-discounted price
-                    promo_discount_amount = (original_price * quantity) * (promo.discount_value / 100)
-                else:
-                    # Fixed discount applies to the entire order (not per unit)
-                    promo_discount_amount = promo.discount_value
-
-                promo.usage_count += 1
-                promo.save()
-        except Promotion.DoesNotExist:
-            pass
-    
-    # Calculate total discount and apply cap
-    total_discount_amount = (tier_discount_amount * quantity) + promo_discount_amount
-    total_before_discount = original_price * quantity
-    total_discount_percent = (total_discount_amount / total_before_discount * 100) if total_before_discount > 0 else 0
-    
-    # Phase 3: Apply maximum discount cap
-    if total_discount_percent > max_discount_percent:
-        total_discount_amount = total_before_discount * (Decimal(str(max_discount_percent)) / 100)
-    
-    final_total = total_before_discount - total_discount_amount
+@instrumentation.timed
+def redeem_promotion(promo):
+    """
+    Count one use of ``promo`` with a conditional UPDATE. Returns False,
+    without counting, if the promotion ran out of uses in the meantime.
+    """
+    redeemed = Promotion.objects.filter(
+        pk=promo.pk, is_active=True, usage_count__lt=F("usage_limit")
+    ).update(usage_count=F("usage_count") + 1)
+    if not redeemed:
+        _promotions.delete(promo.code)
+    return bool(redeemed)
+
+
+@instrumentation.timed
+def return_redemptions(uses):
+    """
+    Give back ``{promotion_pk: uses}`` counted for orders that then failed,
+    in one UPDATE.
+    """
+    if not uses:
+        return 0
+    return Promotion.objects.filter(pk__in=uses).update(
+        usage_count=F("usage_count")
+        - Case(
+            *[When(pk=pk, then=Value(count)) for pk, count in uses.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+@instrumentation.timed
+def calculate_price(
+    product_id,
+    quantity,
+    user_tier,
+    promo_code=None,
+    max_discount_percent=10,
+    product=None,
+    promotion=None,
+):
+    # Callers that already hold the row (e.g. checkout) pass it in, and pass
+    # the promotion they will redeem once for the whole order.
+    if promotion is None:
+        promotion = get_promotion(promo_code)
+    if product is None:
+        product = Product.objects.get(product_id=product_id)
+
+    if promotion is None:
+        promo_discount_amount = Decimal("0")
+    elif promotion.discount_type == "percentage":
+        # Apply promo discount to original price, not tier-discounted price
+        promo_discount_amount = (product.price * quantity) * (promotion.discount_value / 100)
+    else:
+        # Fixed discount applies to the entire order (not per unit)
+        promo_discount_amount = promotion.discount_value
+
+    unit_price, total_discount_amount, final_total = _price_line(
+        product.price, quantity, user_tier, promo_discount_amount, max_discount_percent
+    )
 
     return {
         "unit_price": round(float(unit_price), 2),
         "total": round(float(final_total), 2),
         "discount": round(float(total_discount_amount), 2),
     }
+
+
+@instrumentation.timed
+def price_cart(
+    items,
+    user_tier,
+    promo_code=None,
+    max_discount_percent=10,
+    products=None,
+    promotion=None,
+):
+    """
+    Price a whole cart of ``{"product_id", "quantity"}`` items and return a
+    CartQuote with one LineQuote per item, all amounts in Decimal cents.
+
+    Products are loaded in one query (or taken from ``products``, keyed by
+    product_id) and the promotion is looked up once, so the query count
+    doesn't grow with the number of lines. A fixed-amount promo is spread
+    across the lines in proportion to their value instead of being taken off
+    every line. Each line's discount is capped at ``max_discount_percent``.
+    """
+    lines = []
+    for item in items:
+        product_id = uuid.UUID(str(item["product_id"]))
+        quantity = int(item["quantity"])
+        if quantity <= 0:
+            raise ValueError(f"Invalid quantity for product {product_id}")
+        lines.append((product_id, quantity))
+
+    if products is None:
+        products = {
+            product.product_id: product
+            for product in Product.objects.filter(
+                product_id__in={product_id for product_id, _ in lines}
+            )
+        }
+    if promotion is None:
+        promotion = get_promotion(promo_code)
+
+    priced = []
+    for product_id, quantity in lines:
+        product = products.get(product_id)
+        if product is None:
+            raise ValueError(f"Product {product_id} not found")
+        priced.append((product, quantity))
+
+    cart_value = sum(product.price * quantity for product, quantity in priced)
+
+    quotes = []
+    for product, quantity in priced:
+        line_value = product.price * quantity
+        if promotion is None:
+            promo_discount = Decimal("0")
+        elif promotion.discount_type == "percentage":
+            promo_discount = line_value * (promotion.discount_value / 100)
+        elif cart_value > 0:
+            promo_discount = promotion.discount_value * line_value / cart_value
+        else:
+            promo_discount = Decimal("0")
+
+        unit_price, discount, total = _price_line(
+            product.price, quantity, user_tier, promo_discount, max_discount_percent
+        )
+        quotes.append(
+            LineQuote(
+                product=product,
+                quantity=quantity,
+                unit_price=_cents(unit_price),
+                discount=_cents(discount),
+                total=_cents(total),
+            )
+        )
+
+    return CartQuote(
+        lines=quotes,
+        subtotal=sum((quote.total for quote in quotes), Decimal("0")),
+        discount=sum((quote.discount for quote in quotes), Decimal("0")),
+        promotion=promotion,
+    )
+
+
+@instrumentation.timed
+def sign_quote(quote, user):
+    """
+    Return a signed token carrying ``quote`` for ``user``, which checkout can
+    redeem instead of pricing the cart again.
+    """
+    return signing.dumps(
+        {
+            "user": str(user.user_id),
+            "tier": user.subscription_tier,
+            "promo": _promotion_terms(quote.promotion),
+            "lines": [
+                [
+                    str(line.product.product_id),
+                    line.quantity,
+                    str(line.product.price),
+                    str(line.unit_price),
+                    str(line.discount),
+                    str(line.total),
+                ]
+                for line in quote.lines
+            ],
+        },
+        salt=QUOTE_SALT,
+        compress=True,
+    )
+
+
+@instrumentation.timed
+def load_quote(token, user, items, products, promotion=None):
+    """
+    Return the CartQuote signed into ``token``, or None if the token is bad
+    or older than PRICE_QUOTE_TTL, or if it no longer matches the cart: a
+    different user, tier, promotion, items or list price. ``products`` are
+    the cart's current rows, keyed by product_id.
+    """
+    try:
+        data = signing.loads(token, salt=QUOTE_SALT, max_age=settings.PRICE_QUOTE_TTL)
+    except signing.BadSignature:
+        return None
+
+    if (
+        data["user"] != str(user.user_id)
+        or data["tier"] != user.subscription_tier
+        or data["promo"] != _promotion_terms(promotion)
+        or len(data["lines"]) != len(items)
+    ):
+        return None
+
+    lines = []
+    for item, quoted in zip(items, data["lines"]):
+        product_id, quantity, price, unit_price, discount, total = quoted
+        product = products.get(uuid.UUID(product_id))
+        if (
+            str(item.get("product_id")) != product_id
+            or item.get("quantity") != quantity
+            or product is None
+            or product.price != Decimal(price)
+        ):
+            return None
+        lines.append(
+            LineQuote(
+                product=product,
+                quantity=quantity,
+                unit_price=Decimal(unit_price),
+                discount=Decimal(discount),
+                total=Decimal(total),
+            )
+        )
+
+    return CartQuote(
+        lines=lines,
+        subtotal=sum((line.total for line in lines), Decimal("0")),
+        discount=sum((line.discount for line in lines), Decimal("0")),
+        promotion=promotion,
+    )
+
+
+def _promotion_terms(promotion):
+    if promotion is None:
+        return None
+    return [promotion.code, promotion.discount_type, str(promotion.discount_value)]
+
+
+def _price_line(price, quantity, user_tier, promo_discount, max_discount_percent):
+    """
+    Return the unrounded (unit_price, discount, total) for ``quantity`` units
+    at list ``price``: the tier discount comes off the unit price, the promo
+    discount off the line, and the two together are capped at
+    ``max_discount_percent`` of the list total.
+    """
+    tier_rate = TIER_DISCOUNTS.get(user_tier, Decimal("0"))
+    unit_price = price * (1 - tier_rate)
+
+    total_before_discount = price * quantity
+    discount = price * tier_rate * quantity + promo_discount
+    if total_before_discount > 0 and (
+        discount / total_before_discount * 100 > max_discount_percent
+    ):
+        discount = total_before_discount * (Decimal(str(max_discount_percent)) / 100)
+
+    return unit_price, discount, total_before_discount - discount
+
+
+def _cents(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
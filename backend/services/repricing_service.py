@@ -0,0 +1,186 @@
+# Standard library imports
+import time
+import uuid
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+# Django imports
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# Third-party imports
+import numpy as np
+
+# Local application imports
+from marketplace.models import Product, Seller
+from services import instrumentation
+
+# One repricing step. ``kind`` is "percent" (change the price by ``value``
+# percent) or "min_margin" (raise the price to at least ``value`` percent over
+# cost). A rule applies to every product unless scoped to a category
+# (Category pk) and/or a seller (Seller pk).
+Rule = namedtuple("Rule", ["kind", "value", "category", "seller"])
+
+
+@instrumentation.timed
+def parse_rules(raw_rules):
+    """
+    Validate rules as sent by the API/command, e.g.
+    ``[{"percent": -10, "category": 3}, {"min_margin": 20}]``, and return a
+    list of Rule. Sellers are given by seller_id and resolved here.
+    """
+    if not isinstance(raw_rules, list) or not raw_rules:
+        raise ValueError("rules must be a non-empty list")
+
+    seller_ids = {}
+    for raw in raw_rules:
+        if isinstance(raw, dict) and raw.get("seller") is not None:
+            seller_ids[str(raw["seller"])] = None
+    if seller_ids:
+        try:
+            wanted = [uuid.UUID(seller_id) for seller_id in seller_ids]
+        except ValueError:
+            raise ValueError("seller must be a seller_id")
+        for pk, seller_id in Seller.objects.filter(seller_id__in=wanted).values_list(
+            "pk", "seller_id"
+        ):
+            seller_ids[str(seller_id)] = pk
+
+    rules = []
+    for index, raw in enumerate(raw_rules):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Rule {index} must be an object")
+        kinds = [kind for kind in ("percent", "min_margin") if kind in raw]
+        if len(kinds) != 1:
+            raise ValueError(f"Rule {index} needs exactly one of percent, min_margin")
+        kind = kinds[0]
+
+        try:
+            value = Decimal(str(raw[kind]))
+        except InvalidOperation:
+            raise ValueError(f"Rule {index} has an invalid {kind}")
+        if not value.is_finite() or (kind == "percent" and value <= -100):
+            raise ValueError(f"Rule {index} has an invalid {kind}")
+        if kind == "min_margin" and value < 0:
+            raise ValueError(f"Rule {index} has an invalid {kind}")
+
+        category = raw.get("category")
+        if category is not None and (
+            not isinstance(category, int) or isinstance(category, bool)
+        ):
+            raise ValueError(f"Rule {index} category must be a category id")
+
+        seller = None
+        if raw.get("seller") is not None:
+            seller = seller_ids[str(raw["seller"])]
+            if seller is None:
+                raise ValueError(f"Rule {index} seller {raw['seller']} not found")
+
+        rules.append(Rule(kind, float(value), category, seller))
+    return rules
+
+
+@instrumentation.timed
+def reprice(rules, batch_size=None, dry_run=False):
+    """
+    Apply ``rules`` (from parse_rules()) in order to every product they
+    cover and return a summary with matched/updated row counts and
+    throughput.
+
+    Products are read in primary-key chunks of ``batch_size`` as price, cost,
+    category and seller arrays; the rules run as NumPy operations over the
+    whole chunk, and only rows whose price actually changed are written back
+    with bulk_update(). The job is all-or-nothing. With ``dry_run`` nothing
+    is written.
+    """
+    batch_size = batch_size or settings.REPRICE_BATCH_SIZE
+    # Only load products at least one rule can touch
+    scope = Q()
+    for rule in rules:
+        if rule.category is None and rule.seller is None:
+            scope = Q()
+            break
+        rule_scope = Q()
+        if rule.category is not None:
+            rule_scope &= Q(category_id=rule.category)
+        if rule.seller is not None:
+            rule_scope &= Q(seller_id=rule.seller)
+        scope |= rule_scope
+
+    matched = 0
+    updated = 0
+    started = time.perf_counter()
+    with transaction.atomic():
+        last_pk = 0
+        while True:
+            rows = list(
+                Product.objects.filter(scope, pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "price", "cost", "category_id", "seller_id")[
+                    :batch_size
+                ]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            matched += len(rows)
+
+            pks, prices = _apply(rules, rows)
+            if not dry_run and pks:
+                Product.objects.bulk_update(
+                    [Product(pk=pk, price=price) for pk, price in zip(pks, prices)],
+                    ["price"],
+                )
+                # Same value for every row, so keep it out of the CASE
+                Product.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+            updated += len(pks)
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "matched": matched,
+        "updated": updated,
+        "dry_run": dry_run,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(matched / elapsed) if elapsed else matched,
+    }
+
+
+def _apply(rules, rows):
+    """
+    Run ``rules`` over one chunk of (pk, price, cost, category_id, seller_id)
+    rows and return the pks and new Decimal prices of the rows that changed.
+    """
+    pk, price, cost, category, seller = zip(*rows)
+    price = np.array(price, dtype=np.float64)
+    cost = np.array(cost, dtype=np.float64)
+    category = np.array([-1 if c is None else c for c in category], dtype=np.int64)
+    seller = np.array(seller, dtype=np.int64)
+
+    new_price = price.copy()
+    for rule in rules:
+        mask = np.ones(len(rows), dtype=bool)
+        if rule.category is not None:
+            mask &= category == rule.category
+        if rule.seller is not None:
+            mask &= seller == rule.seller
+
+        if rule.kind == "percent":
+            new_price[mask] *= 1 + rule.value / 100
+        else:
+            # Round the floor up so it's never a fraction of a cent short
+            floor = np.ceil(cost[mask] * (100 + rule.value) - 1e-6) / 100
+            new_price[mask] = np.maximum(new_price[mask], floor)
+
+    # Compare and store in whole cents; never price anything below a cent
+    old_cents = np.rint(price * 100).astype(np.int64)
+    new_cents = np.maximum(np.rint(new_price * 100).astype(np.int64), 1)
+    changed = np.flatnonzero(new_cents != old_cents)
+
+    pks = np.array(pk, dtype=np.int64)[changed].tolist()
+    prices = [Decimal(int(cents)).scaleb(-2) for cents in new_cents[changed]]
+    return pks, prices
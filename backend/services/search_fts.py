@@ -0,0 +1,160 @@
+# Standard library imports
+import html
+
+# Django imports
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connection, transaction
+from django.db.models.expressions import RawSQL
+from django.dispatch import receiver
+
+# Local application imports
+from marketplace.models import Category, Product
+from services import search_index
+
+# Created and kept in step with marketplace_product by migration 0010
+TABLE = "marketplace_product_fts"
+TRIGGERS = [f"{TABLE}_insert", f"{TABLE}_delete", f"{TABLE}_update"]
+
+# bm25() column weights, matching the in-memory index
+NAME_WEIGHT = float(search_index.NAME_WEIGHT)
+DESCRIPTION_WEIGHT = 1.0
+# Words of description around the best match returned as a snippet
+SNIPPET_WORDS = 12
+# snippet() wraps matches in these control characters, which are swapped for
+# <mark> tags once the snippet has been HTML-escaped
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+_available = None
+
+
+def is_available():
+    """
+    Return True when the default database is SQLite and has the FTS5 table.
+    """
+    global _available
+    if _available is None:
+        _available = (
+            connection.vendor == "sqlite"
+            and TABLE in connection.introspection.table_names()
+        )
+    return _available
+
+
+def is_enabled():
+    return settings.SEARCH_BACKEND == "fts5" and is_available()
+
+
+@receiver(setting_changed)
+def reset_on_setting_change(setting=None, **kwargs):
+    global _available
+    if setting in (None, "DATABASES"):
+        _available = None
+
+
+def match_expression(query):
+    """
+    Turn ``query`` into an FTS5 MATCH expression requiring every word, each
+    either exactly or as the start of a longer word. Single characters only
+    match whole words, as in the in-memory index.
+    """
+    terms = []
+    for token in dict.fromkeys(search_index.tokenize(query)):
+        # \w+ tokens never contain quotes, so quoting them is enough to keep
+        # words like AND, OR and NEAR from being read as operators
+        terms.append(f'"{token}"*' if len(token) > 1 else f'"{token}"')
+    return " ".join(terms)
+
+
+def highlight(snippet):
+    escaped = html.escape(snippet)
+    return escaped.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def search(query, limit=100, category=None, min_price=None, max_price=None):
+    """
+    Return up to ``limit`` ``(product pk, snippet)`` pairs for active products
+    matching every word of ``query``, best BM25 score first.
+
+    Snippets are HTML-escaped excerpts of the description with the matched
+    words wrapped in ``<mark>``.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+
+    products = Product._meta.db_table
+    sql = [
+        f"SELECT p.id, snippet({TABLE}, 1, %s, %s, %s, %s)",
+        f"FROM {TABLE} JOIN {products} p ON p.id = {TABLE}.rowid",
+        f"WHERE {TABLE} MATCH %s AND p.is_active",
+    ]
+    params = [MARK_START, MARK_END, "…", SNIPPET_WORDS, expression]
+    if category:
+        sql.append(
+            f"AND p.category_id IN "
+            f"(SELECT id FROM {Category._meta.db_table} WHERE name = %s)"
+        )
+        params.append(category)
+    if min_price is not None:
+        sql.append("AND p.price >= %s")
+        params.append(min_price)
+    if max_price is not None:
+        sql.append("AND p.price <= %s")
+        params.append(max_price)
+    sql.append(f"ORDER BY bm25({TABLE}, %s, %s), p.id LIMIT %s")
+    params.extend([NAME_WEIGHT, DESCRIPTION_WEIGHT, limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(" ".join(sql), params)
+        return [(pk, highlight(snippet)) for pk, snippet in cursor.fetchall()]
+
+
+def matching(query):
+    """
+    Return a subquery selecting the pk of every product matching ``query``,
+    for use as ``pk__in``.
+    """
+    return RawSQL(
+        f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s",
+        [match_expression(query)],
+    )
+
+
+def rebuild():
+    """
+    Re-read every product into the FTS5 table, e.g. after restoring a
+    database copied without it.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+
+
+def check():
+    """
+    Return a list of problems with the FTS5 table, empty if there are none:
+    triggers that are missing (SQLite drops them when Django rebuilds
+    marketplace_product) and whether the index still matches the products.
+    """
+    problems = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+            [Product._meta.db_table],
+        )
+        present = {name for name, in cursor.fetchall()}
+        problems.extend(
+            f"Trigger {name} is missing" for name in TRIGGERS if name not in present
+        )
+
+        # With a rank of 1 the check also compares the index with its
+        # content table, and fails if they differ
+        try:
+            with transaction.atomic():
+                cursor.execute(
+                    f"INSERT INTO {TABLE}({TABLE}, rank) VALUES ('integrity-check', 1)"
+                )
+        except DatabaseError:
+            problems.append("The index doesn't match the products table")
+    return problems
@@ -0,0 +1,387 @@
+# Standard library imports
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+# Django imports
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# Local application imports
+from marketplace.models import Product
+from services.cache import LRUCache
+
+TOKEN_RE = re.compile(r"\w+")
+
+# A word in the product name counts this many times as one in the description
+NAME_WEIGHT = 3
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# A query word that only matches the start of a term ("lap" -> "laptop")
+# scores this fraction of an exact match, and expands to at most this many
+# terms. Single characters only match exactly.
+PREFIX_WEIGHT = 0.5
+MAX_PREFIX_TERMS = 50
+
+INDEXED_FIELDS = [
+    "pk",
+    "name",
+    "description",
+    "is_active",
+    "category_id",
+    "seller_id",
+    "price",
+    "updated_at",
+]
+
+Document = namedtuple(
+    "Document",
+    ["terms", "length", "is_active", "category_id", "seller_id", "price"],
+)
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over product names and descriptions.
+
+    ``postings`` maps each term to ``{product pk: weighted term frequency}``.
+    Each document also keeps the fields search filters on, so a query never
+    touches the database until the caller loads the winning rows. Ranked
+    results are cached until the index next changes.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+        self.lengths = {}
+        self.total_length = 0
+        self.watermark = None
+        self.synced_at = time.monotonic()
+        self._terms = []
+        self._terms_stale = False
+        self._results = LRUCache(maxsize=settings.SEARCH_RESULT_CACHE_SIZE)
+        self._lock = threading.RLock()
+
+    def add(self, pk, name, description, is_active, category_id, seller_id, price):
+        counts = Counter(tokenize(description))
+        for token in tokenize(name):
+            counts[token] += NAME_WEIGHT
+
+        length = sum(counts.values())
+        document = Document(
+            tuple(counts), length, is_active, category_id, seller_id, float(price)
+        )
+
+        with self._lock:
+            # Syncs see unchanged rows again; don't throw the cache away for them
+            if self.documents.get(pk) == document and all(
+                self.postings[term][pk] == count for term, count in counts.items()
+            ):
+                return
+
+            self._discard(pk)
+            for term, count in counts.items():
+                if term not in self.postings:
+                    self.postings[term] = {}
+                    self._terms_stale = True
+                self.postings[term][pk] = count
+            self.documents[pk] = document
+            self.lengths[pk] = length
+            self.total_length += length
+            self._results.clear()
+
+    def add_rows(self, rows):
+        """
+        Index ``Product.objects.values(*INDEXED_FIELDS)`` rows and move the
+        watermark past them.
+        """
+        for row in rows:
+            self.add(
+                row["pk"],
+                row["name"],
+                row["description"],
+                row["is_active"],
+                row["category_id"],
+                row["seller_id"],
+                row["price"],
+            )
+            if self.watermark is None or row["updated_at"] > self.watermark:
+                self.watermark = row["updated_at"]
+
+    def remove(self, pk):
+        with self._lock:
+            self._discard(pk)
+
+    def _discard(self, pk):
+        document = self.documents.pop(pk, None)
+        if document is None:
+            return
+        del self.lengths[pk]
+        for term in document.terms:
+            postings = self.postings[term]
+            del postings[pk]
+            if not postings:
+                del self.postings[term]
+                self._terms_stale = True
+        self.total_length -= document.length
+        self._results.clear()
+
+    def sync(self):
+        """
+        Re-index products changed since the last build or sync, e.g. by
+        other processes or by queryset updates that skip signals.
+        """
+        rows = Product.objects.values(*INDEXED_FIELDS)
+        if self.watermark is not None:
+            rows = rows.filter(updated_at__gte=self.watermark)
+        self.add_rows(rows.iterator(chunk_size=2000))
+        self.synced_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _expand(self, token):
+        """
+        Yield ``(term, weight)`` for the terms a query token matches.
+        """
+        if token in self.postings:
+            yield token, 1.0
+        if len(token) < 2:
+            return
+
+        if self._terms_stale:
+            self._terms = sorted(self.postings)
+            self._terms_stale = False
+        start = bisect.bisect_right(self._terms, token)
+        for term in self._terms[start : start + MAX_PREFIX_TERMS]:
+            if not term.startswith(token):
+                break
+            yield term, PREFIX_WEIGHT
+
+    def search(
+        self,
+        query,
+        limit=100,
+        category_ids=None,
+        min_price=None,
+        max_price=None,
+    ):
+        """
+        Return up to ``limit`` active product pks matching every word of
+        ``query``, best BM25 score first.
+        """
+        tokens = tuple(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        key = (
+            tokens,
+            limit,
+            None if category_ids is None else frozenset(category_ids),
+            min_price,
+            max_price,
+        )
+        with self._lock:
+            results = self._results.get(key)
+            if results is None:
+                results = self._rank(tokens, limit, *key[2:])
+                self._results.set(key, results)
+        return list(results)
+
+    def facets(self, query, category_ids=None, min_price=None, max_price=None):
+        """
+        Count the active products matching ``query`` by category, by seller
+        and by price. Returns three Counters, ``{category_id: n}``,
+        ``{seller_id: n}`` and ``{price: n}``, which are cached alongside
+        ranked results and must not be modified.
+        """
+        categories, sellers, prices = Counter(), Counter(), Counter()
+        tokens = tuple(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return categories, sellers, prices
+
+        key = (
+            "facets",
+            tokens,
+            None if category_ids is None else frozenset(category_ids),
+            min_price,
+            max_price,
+        )
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                return cached
+            for _, negative_pk in self._match(
+                tokens, category_ids, min_price, max_price
+            ):
+                document = self.documents[-negative_pk]
+                categories[document.category_id] += 1
+                sellers[document.seller_id] += 1
+                prices[document.price] += 1
+            self._results.set(key, (categories, sellers, prices))
+        return categories, sellers, prices
+
+    def _rank(self, tokens, limit, category_ids, min_price, max_price):
+        # Called with the lock held
+        return tuple(
+            -negative_pk
+            for _, negative_pk in heapq.nlargest(
+                limit, self._match(tokens, category_ids, min_price, max_price)
+            )
+        )
+
+    def _match(self, tokens, category_ids, min_price, max_price):
+        """
+        Return ``(score, -pk)`` for every active document matching all of
+        ``tokens`` and the filters. Called with the lock held.
+        """
+        if not self.documents:
+            return []
+        count = len(self.documents)
+        average_length = self.total_length / count
+
+        # BM25 length normalisation is norm_base + norm_scale * length
+        norm_base = K1 * (1 - B)
+        norm_scale = K1 * B / average_length
+        lengths = self.lengths
+
+        # Each query word becomes a list of (postings, boost) for the
+        # terms it matches. Words are intersected rarest first, so common
+        # words only need to be looked up for the surviving candidates.
+        matched = []
+        for token in tokens:
+            expansions = []
+            for term, weight in self._expand(token):
+                postings = self.postings[term]
+                idf = math.log(
+                    1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                expansions.append((postings, weight * idf * (K1 + 1)))
+            if not expansions:
+                return []
+            matched.append(expansions)
+        matched.sort(key=lambda expansions: sum(len(p) for p, _ in expansions))
+
+        scores = {}
+        for postings, boost in matched[0]:
+            for pk, frequency in postings.items():
+                score = (
+                    boost
+                    * frequency
+                    / (frequency + norm_base + norm_scale * lengths[pk])
+                )
+                if score > scores.get(pk, 0.0):
+                    scores[pk] = score
+
+        for expansions in matched[1:]:
+            narrowed = {}
+            for pk, total in scores.items():
+                best = 0.0
+                for postings, boost in expansions:
+                    frequency = postings.get(pk)
+                    if frequency is not None:
+                        score = (
+                            boost
+                            * frequency
+                            / (frequency + norm_base + norm_scale * lengths[pk])
+                        )
+                        if score > best:
+                            best = score
+                if best:
+                    narrowed[pk] = total + best
+            scores = narrowed
+            if not scores:
+                return []
+
+        matches = []
+        for pk, score in scores.items():
+            document = self.documents[pk]
+            if not document.is_active:
+                continue
+            if category_ids is not None and document.category_id not in category_ids:
+                continue
+            if min_price is not None and document.price < min_price:
+                continue
+            if max_price is not None and document.price > max_price:
+                continue
+            matches.append((score, -pk))
+        return matches
+
+
+def build_index():
+    index = SearchIndex()
+    index.sync()
+    return index
+
+
+def get_index():
+    """
+    Return the process-wide index, building it on first use and re-indexing
+    recently changed products every ``SEARCH_INDEX_SYNC_INTERVAL`` seconds.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = build_index()
+        elif time.monotonic() - _index.synced_at >= settings.SEARCH_INDEX_SYNC_INTERVAL:
+            _index.sync()
+        return _index
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+@receiver(setting_changed)
+def reset_index_on_setting_change(setting=None, **kwargs):
+    if setting in (None, "SEARCH_INDEX_SYNC_INTERVAL", "SEARCH_RESULT_CACHE_SIZE"):
+        reset_index()
+
+
+@receiver(post_save, sender=Product)
+def index_product(instance, **kwargs):
+    # Indexed once the save commits, so a rolled-back change never shows up
+    fields = (
+        instance.pk,
+        instance.name,
+        instance.description,
+        instance.is_active,
+        instance.category_id,
+        instance.seller_id,
+        instance.price,
+    )
+
+    def add():
+        # Only keep an index up to date once something has built it
+        if _index is not None:
+            _index.add(*fields)
+
+    transaction.on_commit(add)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(instance, **kwargs):
+    pk = instance.pk
+
+    def remove():
+        if _index is not None:
+            _index.remove(pk)
+
+    transaction.on_commit(remove)
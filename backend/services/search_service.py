@@ -1,42 +1,198 @@
 # Standard library imports
-import time
+import bisect
+from collections import Counter
 
 # Django imports
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Case, Count, Value, When
 
 # Local application imports
-from marketplace.models import Product
+from marketplace.models import Category, Product, Seller
+from services import instrumentation, search_fts, search_index
 
+MAX_RESULTS = 100
 
-def search_products(query, category=None, min_price=None, max_price=None):
-    time.sleep(0.1)
-
-    products = Product.objects.filter(is_active=True)
+# Everything a result needs, read in one query with the seller joined in
+RESULT_FIELDS = [
+    "pk",
+    "product_id",
+    "name",
+    "price",
+    "seller__name",
+    "inventory_count",
+]
 
-    if query:
-        products = products.filter(
-            Q(name__icontains=query) | Q(description__icontains=query)
-        )
 
+def _filter_products(category, min_price, max_price):
+    products = Product.objects.filter(is_active=True)
     if category:
         products = products.filter(category__name=category)
-
-    if min_price:
+    if min_price is not None:
         products = products.filter(price__gte=min_price)
-
-    if max_price:
+    if max_price is not None:
         products = products.filter(price__lte=max_price)
+    return products
+
+
+def _category_ids(category):
+    if not category:
+        return None
+    return set(Category.objects.filter(name=category).values_list("pk", flat=True))
+
+
+def _lists_catalogue(query):
+    return not query or not query.strip()
+
+
+@instrumentation.timed
+def search_products(query, category=None, min_price=None, max_price=None):
+    """
+    Return up to 100 active products matching ``query``, best match first.
+
+    Every word of ``query`` must match, either exactly or as the start of a
+    longer word. Matches are ranked by SQLite's FTS5 index, which also
+    supplies a highlighted ``snippet`` of the description, or by the
+    in-memory index (see services/search_index.py) when SEARCH_BACKEND is
+    "memory" or FTS5 isn't available. Without a query, products are listed
+    in catalogue order; a query with no words in it (only punctuation, say)
+    matches nothing.
+    """
+    min_price = float(min_price) if min_price else None
+    max_price = float(max_price) if max_price else None
+    products = _filter_products(category, min_price, max_price)
+
+    snippets = {}
+    rows = products.values(*RESULT_FIELDS)
+    if _lists_catalogue(query):
+        rows = rows[:MAX_RESULTS]
+    else:
+        if search_fts.is_enabled():
+            matches = search_fts.search(
+                query,
+                limit=MAX_RESULTS,
+                category=category,
+                min_price=min_price,
+                max_price=max_price,
+            )
+            ranked = [pk for pk, _ in matches]
+            snippets = dict(matches)
+        else:
+            ranked = search_index.get_index().search(
+                query,
+                limit=MAX_RESULTS,
+                category_ids=_category_ids(category),
+                min_price=min_price,
+                max_price=max_price,
+            )
+        # The in-memory index can trail the database by a few seconds, so the
+        # filters are applied again to the rows it picked.
+        by_pk = {row["pk"]: row for row in rows.filter(pk__in=ranked)}
+        rows = [by_pk[pk] for pk in ranked if pk in by_pk]
+
+    return [
+        {
+            "product_id": str(row["product_id"]),
+            "name": row["name"],
+            "price": float(row["price"]),
+            "seller_name": row["seller__name"],
+            "inventory": row["inventory_count"],
+            "snippet": snippets.get(row["pk"]),
+        }
+        for row in rows
+    ]
+
+
+@instrumentation.timed
+def search_facets(query, category=None, min_price=None, max_price=None):
+    """
+    Count the products ``search_products`` would match, without its result
+    limit, by category, by seller and by price band (SEARCH_PRICE_BANDS).
+
+    Returns ``{"categories": [...], "sellers": [...], "price_bands": [...]}``,
+    each category and seller list holding the SEARCH_FACET_SIZE largest
+    counts. With FTS5, or without a query, this is one grouped query; the
+    in-memory backend counts from its index and then looks up names.
+    """
+    min_price = float(min_price) if min_price else None
+    max_price = float(max_price) if max_price else None
+
+    products = _filter_products(category, min_price, max_price)
+    if not _lists_catalogue(query):
+        if not search_index.tokenize(query):
+            return _format_facets(Counter(), Counter(), Counter())
+        if not search_fts.is_enabled():
+            return _index_facets(query, category, min_price, max_price)
+        products = products.filter(pk__in=search_fts.matching(query))
+
+    bounds = settings.SEARCH_PRICE_BANDS
+    band = Case(
+        *[When(price__lt=bound, then=Value(i)) for i, bound in enumerate(bounds)],
+        default=Value(len(bounds)),
+    )
+    rows = (
+        products.annotate(band=band)
+        .values("category__name", "seller__seller_id", "seller__name", "band")
+        .annotate(count=Count("pk"))
+        .order_by()
+    )
+
+    categories, sellers, bands = Counter(), Counter(), Counter()
+    for row in rows.iterator():
+        if row["category__name"] is not None:
+            categories[row["category__name"]] += row["count"]
+        sellers[(row["seller__seller_id"], row["seller__name"])] += row["count"]
+        bands[row["band"]] += row["count"]
+    return _format_facets(categories, sellers, bands)
+
+
+def _index_facets(query, category, min_price, max_price):
+    by_category, by_seller, by_price = search_index.get_index().facets(
+        query,
+        category_ids=_category_ids(category),
+        min_price=min_price,
+        max_price=max_price,
+    )
+
+    categories = Counter()
+    names = Category.objects.filter(pk__in=by_category).values_list("pk", "name")
+    for pk, name in names:
+        categories[name] += by_category[pk]
+
+    # Only the largest sellers are shown, so only their names are needed
+    top = [pk for pk, _ in by_seller.most_common(settings.SEARCH_FACET_SIZE)]
+    sellers = Counter(
+        {
+            (seller_id, name): by_seller[pk]
+            for pk, seller_id, name in Seller.objects.filter(pk__in=top).values_list(
+                "pk", "seller_id", "name"
+            )
+        }
+    )
+
+    bands = Counter()
+    for price, count in by_price.items():
+        bands[bisect.bisect_right(settings.SEARCH_PRICE_BANDS, price)] += count
+    return _format_facets(categories, sellers, bands)
+
 
-    results = []
-    for product in products[:100]:
-        results.append(
-            {
-                "product_id": str(product.product_id),
-                "name": product.name,
-                "price": float(product.price),
-                "seller_name": product.seller.name,
-                "inventory": product.inventory_count,
-            }
-        )
-
-    return results
+def _format_facets(categories, sellers, bands):
+    size = settings.SEARCH_FACET_SIZE
+    bounds = [0, *settings.SEARCH_PRICE_BANDS, None]
+    return {
+        "categories": [
+            {"name": name, "count": count}
+            for name, count in sorted(
+                categories.items(), key=lambda item: (-item[1], item[0])
+            )[:size]
+        ],
+        "sellers": [
+            {"seller_id": str(seller_id), "name": name, "count": count}
+            for (seller_id, name), count in sorted(
+                sellers.items(), key=lambda item: (-item[1], item[0][1])
+            )[:size]
+        ],
+        "price_bands": [
+            {"min": bounds[band], "max": bounds[band + 1], "count": count}
+            for band, count in sorted(bands.items())
+        ],
+    }
@@ -1,47 +1,212 @@
 # Standard library imports
-import time
-from datetime import timedelta
+import bisect
+import math
+import threading
 
 # Django imports
-from django.utils import timezone
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import DecimalField, F, Sum
+from django.dispatch import receiver
 
 # Local application imports
-from marketplace.models import Order, OrderItem
+from marketplace.models import OrderItem
+from services import carriers, instrumentation
+from services.cache import LRUCache
 
+_rate_table = None
+_rate_table_lock = threading.Lock()
 
-def calculate_shipping(order_id, address):
-    time.sleep(0.2)
+# Carrier tracking results by tracking number. Only successful lookups are
+# cached, so a carrier outage is retried on the next request.
+_tracking = LRUCache(
+    maxsize=settings.TRACKING_CACHE_SIZE, ttl=settings.TRACKING_CACHE_TTL
+)
 
-    order = Order.objects.get(order_id=order_id)
-    items = OrderItem.objects.filter(order=order)
 
-    total_weight = 0
-    for item in items:
-        total_weight += float(item.product.weight_kg) * item.quantity
+class NoRate(ValueError):
+    """
+    The rate table has no rate for a shipment: its zone doesn't offer the
+    service, or it's over the heaviest band.
+    """
 
-    base_rate = 5.0
-    weight_rate = 2.0 * total_weight
 
-    if address.get("country") != "US":
-        international_rate = 15.0
-    else:
-        international_rate = 0
+class RateTableError(ValueError):
+    """
+    ``SHIPPING_RATE_TABLE`` is malformed.
+    """
 
-    express = address.get("express", False)
-    if express:
-        express_rate = 20.0
-    else:
-        express_rate = 0
 
-    return base_rate + weight_rate + international_rate + express_rate
+class RateTable:
+    """
+    Shipping rates by zone, service level and weight band, held in memory so
+    a quote is a dict lookup and a bisect.
 
+    Built from a config shaped like ``SHIPPING_RATE_TABLE``: countries map to
+    zones (anything unlisted is ``default_zone``), and each zone/service pair
+    has weight bands ``[max_kg, base, per_kg]`` in increasing weight order,
+    the last of which may have ``max_kg`` None for "no limit". A malformed
+    config raises RateTableError.
+    """
 
+    def __init__(self, config):
+        try:
+            self.zones = dict(config.get("zones", {}))
+            self.default_zone = config["default_zone"]
+            self.bands = {}
+            for zone, services in config["rates"].items():
+                for service, bands in services.items():
+                    self.bands[(zone, service)] = self._parse_bands(
+                        zone, service, bands
+                    )
+        except RateTableError:
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            raise RateTableError(f"Invalid SHIPPING_RATE_TABLE: {e!r}") from e
+
+    @staticmethod
+    def _parse_bands(zone, service, bands):
+        limits = [math.inf if band[0] is None else float(band[0]) for band in bands]
+        if not limits or limits != sorted(limits):
+            raise RateTableError(
+                f"Weight bands for {zone}/{service} must be in increasing order"
+            )
+        rates = [(float(base), float(per_kg)) for _, base, per_kg in bands]
+        return limits, rates
+
+    def zone_for(self, country):
+        return self.zones.get(country, self.default_zone)
+
+    def quote(self, weight, country, service="standard"):
+        """
+        Return the cost of shipping ``weight`` kg to ``country`` with
+        ``service``. Raises NoRate if there's no rate for it, or ValueError
+        if ``weight`` isn't a weight.
+        """
+        zone = self.zone_for(country)
+        try:
+            limits, rates = self.bands[(zone, service)]
+        except KeyError:
+            raise NoRate(f"No {service} shipping to zone {zone}")
+
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid weight {weight!r}")
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"Invalid weight {weight!r}")
+        index = bisect.bisect_left(limits, weight)
+        if index == len(limits):
+            raise NoRate(f"{weight}kg is over the {service} limit for zone {zone}")
+
+        base, per_kg = rates[index]
+        return round(base + per_kg * weight, 2)
+
+
+def get_rate_table():
+    """
+    Return the process-wide rate table built from ``SHIPPING_RATE_TABLE``.
+    """
+    global _rate_table
+    with _rate_table_lock:
+        if _rate_table is None:
+            _rate_table = RateTable(settings.SHIPPING_RATE_TABLE)
+        return _rate_table
+
+
+@receiver(setting_changed)
+def reset_rate_table(setting=None, **kwargs):
+    global _rate_table
+    if setting in (None, "SHIPPING_RATE_TABLE"):
+        with _rate_table_lock:
+            _rate_table = None
+
+
+@instrumentation.timed
+def calculate_shipping(order_id, address, total_weight=None):
+    """
+    Price shipping for an order. Checkout already knows the cart weight and
+    passes it in; otherwise it's summed in the database in one query.
+    """
+    if total_weight is None:
+        total_weight = (
+            OrderItem.objects.filter(order__order_id=order_id).aggregate(
+                weight=Sum(
+                    F("quantity") * F("product__weight_kg"), output_field=DecimalField()
+                )
+            )["weight"]
+            or 0
+        )
+
+    return quote_shipping(total_weight, address)
+
+
+@instrumentation.timed
+def quote_shipping(total_weight, address):
+    """
+    Price a shipment of ``total_weight`` kg without touching the database.
+    """
+    address = address or {}
+    service = "express" if address.get("express", False) else "standard"
+    return get_rate_table().quote(total_weight, address.get("country"), service)
+
+
+@instrumentation.timed
+def quote_many(shipments):
+    """
+    Price many ``(total_weight, address)`` shipments. Returns one result per
+    shipment, in order: the cost, or the ValueError explaining why there's
+    no rate for it.
+    """
+    table = get_rate_table()
+    results = []
+    for total_weight, address in shipments:
+        address = address or {}
+        service = "express" if address.get("express", False) else "standard"
+        try:
+            results.append(table.quote(total_weight, address.get("country"), service))
+        except ValueError as e:
+            results.append(e)
+    return results
+
+
+def tracking_number(order_id):
+    return f"TRK{str(order_id)[:8].upper()}"
+
+
+@instrumentation.timed
 def get_tracking_info(order_id):
-    time.sleep(0.5)
-
-    return {
-        "tracking_number": f"TRK{str(order_id)[:8].upper()}",
-        "carrier": "StandardShipping",
-        "status": "in_transit",
-        "estimated_delivery": (timezone.now() + timedelta(days=5)).isoformat(),
-    }
+    result = get_tracking_many([order_id])[order_id]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+@instrumentation.timed
+def get_tracking_many(order_ids):
+    """
+    Return ``{order_id: tracking info}`` for many orders. Cached results are
+    served from memory; the rest go to the carrier in one concurrent batch.
+    A lookup that failed maps to its exception instead.
+    """
+    numbers = {order_id: tracking_number(order_id) for order_id in order_ids}
+
+    results = {}
+    missing = []
+    for order_id, number in numbers.items():
+        cached = _tracking.get(number)
+        if cached is None:
+            missing.append(order_id)
+        else:
+            results[order_id] = cached
+
+    if missing:
+        outcomes = carriers.get_carrier().track_many(
+            [numbers[order_id] for order_id in missing]
+        )
+        for order_id, (result, error) in zip(missing, outcomes):
+            if error is None:
+                _tracking.set(numbers[order_id], result)
+            results[order_id] = result if error is None else error
+
+    return results
@@ -0,0 +1,71 @@
+# Standard library imports
+import json
+import random
+import secrets
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests, like a real gateway
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            charge = json.loads(self.rfile.read(length))
+        except ValueError:
+            return self.respond(400, {"error": "invalid JSON"})
+
+        if self.path.rstrip("/").split("/")[-1] != "charges":
+            return self.respond(404, {"error": "not found"})
+
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.8, 1.2))
+
+        if random.random() < server.decline_rate:
+            body = {
+                "status": "declined",
+                "transaction_id": charge.get("transaction_id"),
+                "error_code": "DECLINED",
+                "response_code": "05",
+            }
+        else:
+            body = {
+                "status": "approved",
+                "transaction_id": charge.get("transaction_id"),
+                "auth_code": secrets.token_hex(4),
+                "response_code": "00",
+            }
+        self.respond(200, body)
+
+    def respond(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    """
+    A local payment gateway for load tests. Every charge waits ``latency``
+    seconds (±20%) and is declined with probability ``decline_rate``.
+    """
+
+    daemon_threads = True
+    # Clients open a burst of pooled connections at once; the default backlog
+    # of 5 makes the rest wait for a SYN retry.
+    request_queue_size = 128
+
+    def __init__(self, address, latency=2.0, decline_rate=0.05, verbose=False):
+        super().__init__(address, StubGatewayHandler)
+        self.latency = latency
+        self.decline_rate = decline_rate
+        self.verbose = verbose
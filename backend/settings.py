@@ -22,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "middleware.ServerTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -96,6 +97,171 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 100,
 }
 
+# Checkout stages that run concurrently (see services/pipeline.py). "timeout" is
+# in seconds; "fallback" decides what happens when a stage errors or times out:
+# "raise" fails the checkout, "default" carries on with the "default" value.
+# "fallback_on" limits the default to timeouts and the listed exceptions, so
+# shipping only falls back to a flat rate when there's no matching rate, not
+# when SHIPPING_RATE_TABLE is broken.
+CHECKOUT_MAX_WORKERS = 16
+CHECKOUT_STAGES = {
+    "fraud": {"timeout": 2.0, "fallback": "raise"},
+    "shipping": {
+        "timeout": 2.0,
+        "fallback": "default",
+        "default": 25.0,
+        "fallback_on": ["services.shipping_service.NoRate"],
+    },
+}
+
+# Seconds a checkout may hold stock before the reservation sweeper
+# (`manage.py release_expired_reservations`) gives it back
+INVENTORY_RESERVATION_TTL = 15 * 60
+
+# Upper bound for POST /api/products/<id>/stock/ {"shards": N}. Sharded
+# products keep their stock in N rows so flash-sale checkouts don't queue on
+# one row lock; `manage.py reconcile_stock_shards` copies the totals back.
+INVENTORY_MAX_STOCK_SHARDS = 64
+
+# POST /api/products/stock-import/: largest warehouse feed accepted, and how
+# many products each UPDATE statement sets
+INVENTORY_IMPORT_MAX_ROWS = 200_000
+INVENTORY_IMPORT_BATCH_SIZE = 1000
+
+# Largest number of carts accepted by POST /api/orders/bulk-checkout/
+BULK_CHECKOUT_MAX_ORDERS = 500
+
+# Payment gateway client. BACKEND is a dotted path to a PaymentGateway class
+# and OPTIONS are passed to its constructor. To load-test against real network
+# concurrency, run `manage.py run_stub_gateway` and switch to:
+#   {"BACKEND": "services.payment_gateways.HttpGateway",
+#    "OPTIONS": {"url": "http://127.0.0.1:8765", "pool_size": 50}}
+PAYMENT_GATEWAY = {
+    "BACKEND": "services.payment_gateways.SimulatedGateway",
+    "OPTIONS": {"latency": 2.0},
+}
+
+# Seconds a batch claimed by `manage.py drain_outbox` stays hidden from other
+# workers; events still unfinished when it runs out are run again
+OUTBOX_LEASE = 5 * 60
+
+# Notification queue (see services/notification_service.py). Each kind waits
+# "delay" seconds before it can be sent so that later notifications to the same
+# recipient share one message; "coalesce" kinds merge waiting notifications
+# about the same subject (e.g. repeated low-stock alerts for one product).
+NOTIFICATION_KINDS = {
+    "order_confirmation": {"delay": 0},
+    "seller": {"delay": 30},
+    "inventory_alert": {"delay": 60, "coalesce": True},
+    "seller_digest": {"delay": 0},
+}
+# Threads sending messages in `manage.py send_notifications`, and seconds a
+# claimed batch stays hidden from other workers before it's retried
+NOTIFICATION_WORKERS = 8
+NOTIFICATION_LEASE = 5 * 60
+# Delivery client. BACKEND is a dotted path to a NotificationSender class and
+# OPTIONS are passed to its constructor; use
+# "services.notification_senders.EmailSender" to send through EMAIL_BACKEND.
+NOTIFICATION_SENDER = {
+    "BACKEND": "services.notification_senders.SimulatedSender",
+    "OPTIONS": {"latency": 0.3},
+}
+
+# Seller daily digests (`manage.py send_seller_digests`): products at or below
+# this many available units count as low stock, and each digest lists at most
+# SELLER_DIGEST_LOW_STOCK_ITEMS of them
+SELLER_DIGEST_LOW_STOCK = 5
+SELLER_DIGEST_LOW_STOCK_ITEMS = 10
+
+# Product search backend. "fts5" ranks matches with SQLite's FTS5 extension
+# over a table kept up to date by triggers (migration 0010) and returns
+# highlighted snippets; on other databases, or SQLite builds without FTS5, it
+# falls back to "memory".
+SEARCH_BACKEND = "fts5"
+
+# The "memory" backend keeps an index in each process (see
+# services/search_index.py). Saves in the same process update it at once;
+# changes made elsewhere are picked up every SEARCH_INDEX_SYNC_INTERVAL seconds.
+SEARCH_INDEX_SYNC_INTERVAL = 5
+# Ranked results kept per process; the cache empties whenever the index changes
+SEARCH_RESULT_CACHE_SIZE = 2048
+
+# Search facets (`?facets=1`): upper bounds of each price band but the last,
+# and how many categories and sellers to return counts for
+SEARCH_PRICE_BANDS = [25, 50, 100, 250, 500]
+SEARCH_FACET_SIZE = 20
+
+# Typeahead (`/api/products/autocomplete/?q=`) suggests product names and
+# queries searched at least AUTOCOMPLETE_MIN_SEARCHES times in "search"
+# analytics events of the last AUTOCOMPLETE_QUERY_DAYS days (see
+# services/autocomplete.py). Every AUTOCOMPLETE_SYNC_INTERVAL seconds, new
+# products and searches are picked up and searches that aged out are dropped.
+AUTOCOMPLETE_SUGGESTIONS = 10
+AUTOCOMPLETE_MIN_SEARCHES = 3
+AUTOCOMPLETE_QUERY_DAYS = 30
+AUTOCOMPLETE_SYNC_INTERVAL = 5
+
+# Idempotency-Key support for checkout: how long a key (and its stored
+# response) stays valid, and how many responses to keep in memory for replays
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+# Seconds a request may hold its key before a retry with the same key can
+# take it over, on the assumption that the original request died
+IDEMPOTENCY_LEASE = 5 * 60
+IDEMPOTENCY_CACHE_SIZE = 10_000
+
+# In-process cache of promotions by code. Saves and deletes clear it in the
+# process that made them; other processes see changes within the TTL.
+PROMOTION_CACHE_SIZE = 1024
+PROMOTION_CACHE_TTL = 60
+
+# Shipping rates, loaded into memory once per process. Countries map to
+# zones (unlisted ones use default_zone); each zone and service level has
+# weight bands [max_kg, base, per_kg], lightest first, with max_kg None for
+# no limit. A shipment pays base + per_kg * weight from the first band it fits.
+SHIPPING_RATE_TABLE = {
+    "zones": {"US": "domestic"},
+    "default_zone": "international",
+    "rates": {
+        "domestic": {
+            "standard": [[None, 5.0, 2.0]],
+            "express": [[None, 25.0, 2.0]],
+        },
+        "international": {
+            "standard": [[None, 20.0, 2.0]],
+            "express": [[None, 40.0, 2.0]],
+        },
+    },
+}
+SHIPPING_QUOTE_BATCH_MAX = 10_000
+
+# Carrier client used for tracking lookups. BACKEND is a dotted path to a
+# CarrierClient class and OPTIONS are passed to its constructor.
+SHIPPING_CARRIER = {
+    "BACKEND": "services.carriers.SimulatedCarrier",
+    "OPTIONS": {"latency": 0.5, "batch_size": 30},
+}
+
+# In-process cache of carrier tracking results (TTL in seconds), and the most
+# orders POST /api/orders/tracking/ looks up at once
+TRACKING_CACHE_SIZE = 10_000
+TRACKING_CACHE_TTL = 5 * 60
+TRACKING_MAX_ORDERS = 500
+
+# Limits for POST /api/fraud/score-batch/
+FRAUD_SCORE_BATCH_MAX = 10_000
+FRAUD_RESCORE_MAX_DAYS = 90
+
+# Products read and written per chunk by catalogue repricing
+REPRICE_BATCH_SIZE = 2000
+
+# How long a signed quote from /api/orders/quote/ can be redeemed at checkout
+# without pricing the cart again.
+PRICE_QUOTE_TTL = 10 * 60
+
+# Report per-service timings and query counts to clients in a Server-Timing
+# header. Latency histograms are always served at /api/metrics/.
+SERVER_TIMING_HEADER = True
+
 # CORS settings for React frontend
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -14,9 +14,12 @@ router.register(r"products", views.ProductViewSet, basename="product")
 router.register(r"orders", views.OrderViewSet, basename="order")
 router.register(r"sellers", views.SellerViewSet, basename="seller")
 router.register(r"platform", views.PlatformViewSet, basename="platform")
+router.register(r"fraud", views.FraudViewSet, basename="fraud")
+router.register(r"shipping", views.ShippingViewSet, basename="shipping")
 
 urlpatterns = [
     path("", lambda request: redirect("admin/", permanent=False)),
     path("admin/", admin.site.urls),
+    path("api/metrics/", views.metrics, name="metrics"),
     path("api/", include(router.urls)),
 ]
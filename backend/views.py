@@ -1,5 +1,13 @@
+# Standard library imports
+import uuid
+from collections import Counter
+from datetime import timedelta
+
 # Django imports
+from django.conf import settings
 from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
 
 # Django REST Framework imports
 from rest_framework import status, viewsets
@@ -23,18 +31,145 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"])
     def search(self, request):
         # Local application imports
-        from services import search_service
+        from services import autocomplete, search_service
 
         query = request.query_params.get("q", "")
         category = request.query_params.get("category", None)
         min_price = request.query_params.get("min_price", None)
         max_price = request.query_params.get("max_price", None)
 
-        results = search_service.search_products(
-            query=query, category=category, min_price=min_price, max_price=max_price
+        filters = {
+            "category": category,
+            "min_price": min_price,
+            "max_price": max_price,
+        }
+        try:
+            results = search_service.search_products(query=query, **filters)
+            autocomplete.record_search(
+                query,
+                user_id=request.user.id if request.user.is_authenticated else None,
+            )
+            if request.query_params.get("facets") not in ("1", "true"):
+                return Response(results)
+            facets = search_service.search_facets(query, **filters)
+        except ValueError:
+            return Response(
+                {"error": "min_price and max_price must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({"results": results, "facets": facets})
+
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        # Local application imports
+        from services import autocomplete
+
+        query = request.query_params.get("q", "")
+        return Response({"query": query, "suggestions": autocomplete.suggest(query)})
+
+    @action(detail=False, methods=["post"], url_path="stock-import")
+    def stock_import(self, request):
+        """
+        Set inventory counts from a warehouse feed:
+        {"stock": [{"product_id": ..., "inventory_count": N}, ...]}
+
+        Valid rows are applied in batched UPDATEs; invalid ones are reported
+        back by index.
+        """
+        # Local application imports
+        from services import inventory_service
+
+        rows = request.data.get("stock")
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"error": "stock must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(rows) > settings.INVENTORY_IMPORT_MAX_ROWS:
+            return Response(
+                {
+                    "error": (
+                        f"At most {settings.INVENTORY_IMPORT_MAX_ROWS} rows per feed"
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        levels = {}
+        errors = []
+        for index, row in enumerate(rows):
+            try:
+                product_id = uuid.UUID(str(row["product_id"]))
+                count = int(row["inventory_count"])
+                if count < 0:
+                    raise ValueError("inventory_count can't be negative")
+            except (KeyError, TypeError, ValueError) as e:
+                errors.append({"index": index, "error": f"Invalid row: {e}"})
+                continue
+            levels[product_id] = count
+
+        try:
+            updated = inventory_service.import_stock(levels)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                "received": len(rows),
+                "updated": updated,
+                "unmatched": len(levels) - updated,
+                "errors": errors[:100],
+            }
         )
 
-        return Response(results)
+    @action(detail=False, methods=["post"])
+    def reprice(self, request):
+        """
+        Reprice the catalogue by rules, applied in order:
+        {"rules": [{"percent": -10, "category": 3}, {"min_margin": 20}],
+         "dry_run": false}
+
+        Rules can be scoped with "category" (category id) and/or "seller"
+        (seller_id). Returns matched/updated counts and rows/second.
+        """
+        # Local application imports
+        from services import repricing_service
+
+        try:
+            rules = repricing_service.parse_rules(request.data.get("rules"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            repricing_service.reprice(
+                rules, dry_run=bool(request.data.get("dry_run", False))
+            )
+        )
+
+    @action(detail=True, methods=["get", "post"])
+    def stock(self, request, pk=None):
+        """
+        GET returns live stock summed across the product's stock shards.
+        POST {"shards": N} spreads the stock over N shards (1 merges it back).
+        """
+        # Local application imports
+        from services import inventory_service
+
+        product = self.get_object()
+        if request.method == "POST":
+            try:
+                shards = int(request.data.get("shards", 1))
+                if not 1 <= shards <= settings.INVENTORY_MAX_STOCK_SHARDS:
+                    raise ValueError(
+                        "shards must be between 1 and "
+                        f"{settings.INVENTORY_MAX_STOCK_SHARDS}"
+                    )
+                product = inventory_service.shard_stock(product.product_id, shards)
+            except (TypeError, ValueError) as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(inventory_service.stock_levels(product))
 
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -50,16 +185,120 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         return OrderSerializer
 
+    def _idempotent(self, request, handler):
+        """
+        Run ``handler`` once per Idempotency-Key header. Retries with the same
+        key and payload get the stored response back without re-running it.
+
+        A 503 (or an exception) means nothing was decided, say the database or
+        gateway was unreachable, so the key is released for the client to
+        retry. Every other response is the request's outcome and is stored.
+        """
+        # Local application imports
+        from services import idempotency_service
+
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return handler(request)
+        if len(key) > 255:
+            return Response(
+                {"error": "Idempotency-Key must be at most 255 characters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        req_hash = idempotency_service.request_hash(
+            request.method, request.path, request.data
+        )
+        try:
+            stored = idempotency_service.begin(key, req_hash)
+        except idempotency_service.IdempotencyError as e:
+            return Response({"error": str(e)}, status=e.status_code)
+
+        if stored is not None:
+            return Response(
+                stored.body,
+                status=stored.status,
+                headers={"Idempotent-Replayed": "true"},
+            )
+
+        try:
+            response = handler(request)
+        except Exception:
+            idempotency_service.abandon(key)
+            raise
+
+        if response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            idempotency_service.abandon(key)
+        else:
+            idempotency_service.complete(
+                key, req_hash, response.status_code, response.data
+            )
+        return response
+
+    @action(detail=False, methods=["post"])
+    def quote(self, request):
+        # Django imports
+        from django.core.exceptions import ValidationError
+
+        # Local application imports
+        from marketplace.models import User
+        from services import pricing_service
+
+        items = request.data.get("items") or []
+        if not isinstance(items, list):
+            return Response(
+                {"error": "items must be a list"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            user = User.objects.get(user_id=request.data.get("user_id"))
+            quote = pricing_service.price_cart(
+                items, user.subscription_tier, request.data.get("promo_code")
+            )
+        except User.DoesNotExist:
+            return Response(
+                {"error": "User not found"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except (KeyError, TypeError, ValueError, ValidationError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                "lines": [
+                    {
+                        "product_id": str(line.product.product_id),
+                        "quantity": line.quantity,
+                        "unit_price": float(line.unit_price),
+                        "discount": float(line.discount),
+                        "total": float(line.total),
+                    }
+                    for line in quote.lines
+                ],
+                "subtotal": float(quote.subtotal),
+                "discount": float(quote.discount),
+                "promo_code": quote.promotion.code if quote.promotion else None,
+                "quote_token": pricing_service.sign_quote(quote, user),
+                "expires_in": settings.PRICE_QUOTE_TTL,
+            }
+        )
+
     @action(detail=False, methods=["post"])
     def checkout(self, request):
+        return self._idempotent(request, self._checkout)
+
+    def _checkout(self, request):
+        # Django imports
+        from django.core.exceptions import ObjectDoesNotExist, ValidationError
+
         # Local application imports
         from marketplace.models import Order, OrderItem, Product, User
         from services import (
-            analytics_service,
             fraud_service,
+            instrumentation,
             inventory_service,
-            notification_service,
+            outbox_service,
             payment_service,
+            pipeline,
             pricing_service,
             shipping_service,
         )
@@ -69,6 +308,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         payment_method = request.data.get("payment_method", "card")
         shipping_address = request.data.get("shipping_address")
         promo_code = request.data.get("promo_code", None)
+        quote_token = request.data.get("quote_token")
 
         try:
             with transaction.atomic():
@@ -82,43 +322,108 @@ class OrderViewSet(viewsets.ModelViewSet):
                     shipping_address=shipping_address,
                 )
 
-                subtotal = 0
-                for item in items:
-                    product = Product.objects.select_for_update().get(
-                        product_id=item["product_id"]
+                # Lock every cart product in one query. Ordering by primary key
+                # means concurrent checkouts always take row locks in the same
+                # order and can't deadlock each other.
+                product_ids = {uuid.UUID(str(item["product_id"])) for item in items}
+                with instrumentation.span("checkout.lock_products"):
+                    products = {
+                        product.product_id: product
+                        for product in Product.objects.select_for_update()
+                        .filter(product_id__in=product_ids, stock_shards__lte=1)
+                        .order_by("id")
+                    }
+                    # Sharded products reserve from their stock shards with
+                    # conditional UPDATEs, so they're read without locking
+                    # the product row that every checkout would queue on.
+                    unlocked = product_ids - products.keys()
+                    if unlocked:
+                        products.update(
+                            (product.product_id, product)
+                            for product in Product.objects.filter(
+                                product_id__in=unlocked
+                            )
+                        )
+
+                promotion = pricing_service.get_promotion(promo_code)
+
+                # A token from /api/orders/quote/ is used as-is if it still
+                # matches the cart and its prices; otherwise price it again.
+                quote = None
+                if quote_token:
+                    quote = pricing_service.load_quote(
+                        quote_token, user, items, products, promotion
                     )
-
-                    if not inventory_service.check_availability(
-                        product.product_id, item["quantity"]
-                    ):
-                        raise ValueError(f"Product {product.name} out of stock")
-
-                    price = pricing_service.calculate_price(
-                        product.product_id,
-                        item["quantity"],
+                if quote is None:
+                    quote = pricing_service.price_cart(
+                        items,
                         user.subscription_tier,
                         promo_code,
+                        products=products,
+                        promotion=promotion,
                     )
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(
+                            order=order,
+                            product=line.product,
+                            quantity=line.quantity,
+                            price_at_purchase=line.unit_price,
+                            discount_amount=line.discount,
+                        )
+                        for line in quote.lines
+                    ]
+                )
 
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        quantity=item["quantity"],
-                        price_at_purchase=price["unit_price"],
-                        discount_amount=price.get("discount", 0),
-                    )
+                quantities = Counter()
+                for line in quote.lines:
+                    quantities[line.product.product_id] += line.quantity
 
-                    inventory_service.reserve_inventory(
-                        product.product_id, item["quantity"]
-                    )
+                # Lines are priced in Decimal; shipping and tax are still floats
+                subtotal = float(quote.subtotal)
 
-                    subtotal += price["total"]
+                # One use of the promo per order, counted atomically so that
+                # concurrent checkouts can't take it past its usage limit.
+                if promotion and not pricing_service.redeem_promotion(promotion):
+                    raise ValueError(f"Promo code {promo_code} is no longer available")
 
-                shipping_cost = shipping_service.calculate_shipping(
-                    order.order_id, shipping_address
-                )
+                # Reserve the whole cart in one conditional UPDATE. A product
+                # listed on two lines is checked against their combined total.
+                try:
+                    inventory_service.reserve_many(
+                        quantities, order=order, products=products
+                    )
+                except inventory_service.InsufficientStock as e:
+                    product = products[e.product_id]
+                    raise ValueError(f"Product {product.name} out of stock")
 
                 tax = subtotal * 0.08
+                cart_weight = sum(
+                    float(line.product.weight_kg) * line.quantity
+                    for line in quote.lines
+                )
+
+                # Fraud scoring and shipping quoting don't depend on each other,
+                # so run them side by side. Fraud scores the merchandise total
+                # (subtotal + tax) since shipping isn't known until both finish.
+                with instrumentation.span("checkout.stages"):
+                    stage_results = pipeline.run_stages(
+                        [
+                            pipeline.Stage(
+                                "fraud",
+                                fraud_service.score_transaction,
+                                fraud_service.get_features(user),
+                                subtotal + tax,
+                            ),
+                            pipeline.Stage(
+                                "shipping",
+                                shipping_service.quote_shipping,
+                                cart_weight,
+                                shipping_address,
+                            ),
+                        ]
+                    )
+                shipping_cost = stage_results["shipping"]
                 total = subtotal + shipping_cost + tax
 
                 order.subtotal = subtotal
@@ -127,50 +432,220 @@ class OrderViewSet(viewsets.ModelViewSet):
                 order.total = total
                 order.save()
 
-                fraud_score = fraud_service.check_transaction(
-                    order.order_id, user.user_id, total
-                )
-
-                if fraud_score > 0.8:
+                if stage_results["fraud"] > fraud_service.FRAUD_THRESHOLD:
                     raise ValueError("Transaction flagged as fraudulent")
 
-                payment_result = payment_service.process_payment(
-                    order.order_id, total, payment_method
-                )
-
-                if payment_result["status"] != "success":
-                    raise ValueError(f"Payment failed: {payment_result.get('error')}")
+        except (
+            ObjectDoesNotExist,
+            KeyError,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            # Anything else (a database error, a stage timing out) might
+            # succeed on a retry
+            return Response(
+                {"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        # The pending order and its holds are committed, so the charge goes to
+        # the gateway outside any transaction and its answer is saved in one
+        # of its own. Nothing after this point may roll the charge back.
+        try:
+            payment_result = payment_service.process_payment(
+                order.order_id, total, payment_method
+            )
+        except payment_service.PaymentNotRecorded as e:
+            return self._awaiting_reconciliation(order, e)
+        except Exception as e:
+            # The gateway raised before taking the charge
+            self._cancel_order(order, promotion)
+            return Response(
+                {"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        if payment_result["status"] == "unknown":
+            # The gateway may have charged the card, so the order and its
+            # stock stay on hold ("processing") until it's reconciled
+            return Response(
+                {
+                    "order_id": str(order.order_id),
+                    "status": "processing",
+                    "error": "Payment outcome unknown; the order is on hold",
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+        if payment_result["status"] != "success":
+            self._cancel_order(order, promotion)
+            return Response(
+                {"error": f"Payment failed: {payment_result.get('error')}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
+        try:
+            with transaction.atomic():
                 order.status = "paid"
                 order.save()
 
-                for item in order.items.all():
-                    inventory_service.confirm_reservation(
-                        item.product.product_id, item.quantity
-                    )
-
-                notification_service.send_order_confirmation(order.order_id)
+                inventory_service.confirm_orders([order])
 
-                analytics_service.track_event(
+                # Email and analytics run from the outbox after commit so the
+                # customer (and the row locks above) don't wait on them.
+                outbox_service.enqueue("send_order_confirmation", str(order.order_id))
+                outbox_service.enqueue(
+                    "track_event",
                     "order_completed",
                     user_id=user.id,
                     order_id=str(order.order_id),
                     total=total,
                 )
+        except Exception as e:
+            # The order stays "processing" with its completed Transaction, and
+            # its stock held, until it's reconciled
+            return self._awaiting_reconciliation(order, e)
+
+        return Response(
+            {
+                "order_id": str(order.order_id),
+                "status": "success",
+                "subtotal": float(subtotal),
+                "tax": float(tax),
+                "shipping": float(shipping_cost),
+                "total": float(total),
+            }
+        )
 
-                return Response(
-                    {
-                        "order_id": str(order.order_id),
-                        "status": "success",
-                        "subtotal": float(subtotal),
-                        "tax": float(tax),
-                        "shipping": float(shipping_cost),
-                        "total": float(total),
-                    }
-                )
+    def _cancel_order(self, order, promotion):
+        """
+        Cancel a checkout that wasn't charged: give back its stock and promo.
+        """
+        # Django imports
+        from django.db import DatabaseError
+
+        # Local application imports
+        from services import inventory_service, pricing_service
+
+        try:
+            with transaction.atomic():
+                order.status = "cancelled"
+                order.save(update_fields=["status", "updated_at"])
+                inventory_service.release_orders([order])
+                if promotion:
+                    pricing_service.return_redemptions({promotion.pk: 1})
+        except DatabaseError:
+            # The order stays "pending" and the sweeper gives its stock back
+            # once the holds expire
+            pass
+
+    def _awaiting_reconciliation(self, order, error):
+        # A final answer: the customer may have been charged, so retrying the
+        # request must replay this rather than charge them again
+        return Response(
+            {
+                "order_id": str(order.order_id),
+                "status": "processing",
+                "error": f"Payment taken but the order could not be completed: {error}",
+            },
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
+    @action(detail=False, methods=["post"], url_path="bulk-checkout")
+    def bulk_checkout(self, request):
+        return self._idempotent(request, self._bulk_checkout)
+
+    def _bulk_checkout(self, request):
+        # Local application imports
+        from services import checkout_service
+
+        carts = request.data.get("orders", [])
+        if not isinstance(carts, list) or not carts:
+            return Response(
+                {"error": "orders must be a non-empty list of carts"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(carts) > settings.BULK_CHECKOUT_MAX_ORDERS:
+            return Response(
+                {
+                    "error": (
+                        f"At most {settings.BULK_CHECKOUT_MAX_ORDERS} orders "
+                        "per request"
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            results = checkout_service.bulk_checkout(carts)
+        except checkout_service.FinalizeFailed as e:
+            # Cards were charged, so this is the outcome: retrying under the
+            # same key must not charge them again
+            return Response(
+                {"error": str(e), "order_ids": e.order_ids},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        succeeded = sum(1 for result in results if result["status"] == "success")
+        return Response(
+            {
+                "results": results,
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+            }
+        )
+
+    @action(detail=False, methods=["post"])
+    def tracking(self, request):
+        """
+        Carrier tracking for many orders: {"order_ids": ["<uuid>", ...]}.
+        Each result has either the tracking info or an "error".
+        """
+        # Local application imports
+        from marketplace.models import Order
+        from services import shipping_service
+
+        order_ids = request.data.get("order_ids")
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response(
+                {"error": "order_ids must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(order_ids) > settings.TRACKING_MAX_ORDERS:
+            return Response(
+                {"error": f"At most {settings.TRACKING_MAX_ORDERS} orders per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            order_ids = [uuid.UUID(str(order_id)) for order_id in order_ids]
+        except ValueError:
+            return Response(
+                {"error": "order_ids must be order UUIDs"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        found = set(
+            Order.objects.filter(order_id__in=order_ids).values_list(
+                "order_id", flat=True
+            )
+        )
+        tracked = shipping_service.get_tracking_many(found)
+
+        results = []
+        for order_id in order_ids:
+            result = {"order_id": str(order_id)}
+            if order_id not in found:
+                result["error"] = "Order not found"
+            elif isinstance(tracked[order_id], Exception):
+                result["error"] = "Tracking unavailable"
+            else:
+                result.update(tracked[order_id])
+            results.append(result)
+        return Response({"results": results})
 
 
 class SellerViewSet(viewsets.ModelViewSet):
@@ -274,3 +749,156 @@ class PlatformViewSet(viewsets.ViewSet):
             return Response(state_data)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ShippingViewSet(viewsets.ViewSet):
+    """
+    Shipping quotes from the in-memory rate table.
+    """
+
+    @action(detail=False, methods=["post"])
+    def quotes(self, request):
+        """
+        Quote many shipments at once:
+        {"shipments": [{"weight_kg": 2.5, "address": {"country": "US"}}, ...]}
+        Each result has either a "cost" or an "error".
+        """
+        # Local application imports
+        from services import shipping_service
+
+        shipments = request.data.get("shipments")
+        if not isinstance(shipments, list) or not shipments:
+            return Response(
+                {"error": "shipments must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(shipments) > settings.SHIPPING_QUOTE_BATCH_MAX:
+            return Response(
+                {
+                    "error": (
+                        f"At most {settings.SHIPPING_QUOTE_BATCH_MAX} shipments "
+                        "per request"
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        parsed = []
+        for shipment in shipments:
+            if not isinstance(shipment, dict):
+                shipment = {}
+            address = shipment.get("address")
+            parsed.append(
+                (
+                    shipment.get("weight_kg"),
+                    address if isinstance(address, dict) else {},
+                )
+            )
+
+        return Response(
+            {
+                "quotes": [
+                    {"error": str(result)}
+                    if isinstance(result, ValueError)
+                    else {"cost": result}
+                    for result in shipping_service.quote_many(parsed)
+                ]
+            }
+        )
+
+
+class FraudViewSet(viewsets.ViewSet):
+    """
+    Fraud scoring outside checkout.
+    """
+
+    @action(detail=False, methods=["post"], url_path="score-batch")
+    def score_batch(self, request):
+        """
+        Score a batch of transactions in one pass, either given explicitly:
+        {"transactions": [{"user_id": ..., "amount": 120.5}, ...]}
+        or as every order placed in the last N days: {"days": 30}
+        """
+        # Django imports
+        from django.core.exceptions import ValidationError
+
+        # Local application imports
+        from marketplace.models import User
+        from services import fraud_service
+
+        if "days" in request.data:
+            try:
+                days = int(request.data["days"])
+                if not 1 <= days <= settings.FRAUD_RESCORE_MAX_DAYS:
+                    raise ValueError(
+                        f"days must be between 1 and {settings.FRAUD_RESCORE_MAX_DAYS}"
+                    )
+            except (TypeError, ValueError) as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            summary = fraud_service.rescore_orders(
+                timezone.now() - timedelta(days=days)
+            )
+            summary["flagged"] = summary["flagged"][:1000]
+            return Response(summary)
+
+        transactions = request.data.get("transactions")
+        if not isinstance(transactions, list) or not transactions:
+            return Response(
+                {"error": "transactions must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(transactions) > settings.FRAUD_SCORE_BATCH_MAX:
+            return Response(
+                {
+                    "error": (
+                        f"At most {settings.FRAUD_SCORE_BATCH_MAX} transactions "
+                        "per batch"
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            user_ids = [str(row["user_id"]) for row in transactions]
+            amounts = [float(row["amount"]) for row in transactions]
+            users = {
+                str(user.user_id): user
+                for user in User.objects.filter(user_id__in=set(user_ids))
+            }
+            missing = [user_id for user_id in user_ids if user_id not in users]
+            if missing:
+                raise ValueError(f"User {missing[0]} not found")
+        except (KeyError, TypeError, ValueError, ValidationError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        features = fraud_service.get_features_many(list(users.values()))
+        scores = fraud_service.score_batch(
+            [features[users[user_id].pk] for user_id in user_ids], amounts
+        )
+        return Response(
+            {
+                "results": [
+                    {
+                        "score": round(score, 4),
+                        "flagged": score > fraud_service.FRAUD_THRESHOLD,
+                    }
+                    for score in scores
+                ]
+            }
+        )
+
+
+def metrics(request):
+    """
+    Latency and query-count histograms, and notification queue gauges, in the
+    Prometheus text format.
+    """
+    # Local application imports
+    from services import instrumentation, notification_service
+
+    notification_service.update_metrics()
+    return HttpResponse(
+        instrumentation.render_metrics(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,154 @@
+# Standard library imports
+from datetime import timedelta
+from unittest import mock
+
+# Django imports
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import AnalyticsEvent, Product, Seller
+from services import autocomplete, outbox_service
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        autocomplete.reset_autocomplete()
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.mouse = self.create_product("Wireless Mouse")
+        self.keyboard = self.create_product("Wireless Keyboard")
+        self.pad = self.create_product("Mouse Pad")
+        self.search("wireless charger", 3)
+        self.search("Wireless  MOUSE", 3)
+        self.search("rare query", 1)
+
+    def create_product(self, name):
+        return Product.objects.create(
+            seller=self.seller, name=name, description=name, price=10, cost=1
+        )
+
+    def search(self, query, times):
+        for _ in range(times):
+            AnalyticsEvent.objects.create(
+                event_type="search", metadata={"query": query}
+            )
+
+    def test_suggests_names_and_popular_queries(self):
+        self.assertEqual(
+            autocomplete.suggest("wire"),
+            ["Wireless Mouse", "wireless charger", "Wireless Keyboard"],
+        )
+        # Words after the first match too
+        self.assertEqual(autocomplete.suggest("MO"), ["Wireless Mouse", "Mouse Pad"])
+        self.assertEqual(autocomplete.suggest("wireless mo"), ["Wireless Mouse"])
+        # Queries searched fewer than AUTOCOMPLETE_MIN_SEARCHES times aren't
+        self.assertEqual(autocomplete.suggest("rare"), [])
+        self.assertEqual(autocomplete.suggest("  "), [])
+
+    def test_saves_and_deletes_update_suggestions(self):
+        autocomplete.get_autocomplete()
+
+        self.keyboard.name = "Wired Keyboard"
+        self.keyboard.save()
+        self.pad.is_active = False
+        self.pad.save()
+        self.mouse.delete()
+
+        # The mouse is still searched for, so it's still suggested
+        self.assertEqual(
+            autocomplete.suggest("wire"),
+            ["wireless charger", "Wireless Mouse", "Wired Keyboard"],
+        )
+        self.assertEqual(autocomplete.suggest("mo"), ["Wireless Mouse"])
+        self.assertEqual(autocomplete.suggest("pad"), [])
+
+    def test_sync_picks_up_changes_that_skip_signals(self):
+        suggestions = autocomplete.get_autocomplete()
+        Product.objects.filter(pk=self.keyboard.pk).update(
+            name="Mousetrap", updated_at=timezone.now()
+        )
+        self.search("rare query", 2)
+        self.assertEqual(suggestions.suggest("rare"), [])
+
+        suggestions.sync()
+
+        self.assertEqual(suggestions.suggest("rare"), ["rare query"])
+        self.assertEqual(suggestions.suggest("mouset"), ["Mousetrap"])
+        self.assertEqual(suggestions.suggest("wireless k"), [])
+
+    @override_settings(AUTOCOMPLETE_QUERY_DAYS=30)
+    def test_searches_leave_the_window_as_they_age(self):
+        def age(query, days):
+            AnalyticsEvent.objects.filter(metadata__query=query).update(
+                created_at=timezone.now() - timedelta(days=days)
+            )
+
+        age("wireless charger", 31)
+        age("Wireless  MOUSE", 29)
+        suggestions = autocomplete.get_autocomplete()
+        self.assertEqual(suggestions.suggest("wireless c"), [])
+        self.assertEqual(suggestions.search_counts["wireless mouse"], 3)
+
+        self.search("rare query", 2)
+        suggestions.sync()
+        self.assertEqual(suggestions.suggest("rare"), ["rare query"])
+
+        age("Wireless  MOUSE", 31)
+        suggestions.sync()
+        self.assertNotIn("wireless mouse", suggestions.search_counts)
+        self.assertEqual(suggestions.search_counts["rare query"], 3)
+        # Still suggested as a product name, now behind the keyboard's
+        self.assertEqual(
+            suggestions.suggest("wire"), ["Wireless Keyboard", "Wireless Mouse"]
+        )
+
+    def test_ranked_prefixes_stay_in_step(self):
+        # Keep every prefix ranked ahead of time, then check each against a
+        # fresh ranking after a round of changes
+        with mock.patch.object(autocomplete, "RANKED_RANGE", 0):
+            suggestions = autocomplete.get_autocomplete()
+            self.assertIn("w", suggestions._top)
+
+            self.create_product("Wireless Charger")
+            self.keyboard.name = "Mouse Keyboard"
+            self.keyboard.save()
+            self.mouse.delete()
+            suggestions.add_searches({"wireless charger": -3, "mouse pad": 5})
+
+        self.assertEqual(
+            suggestions.suggest("wire"), ["Wireless Mouse", "Wireless Charger"]
+        )
+        for prefix, top in suggestions._top.items():
+            self.assertEqual(
+                top, suggestions._rank(prefix, *suggestions._range(prefix)), prefix
+            )
+
+    def test_autocomplete_endpoint(self):
+        response = self.client.get("/api/products/autocomplete/", {"q": "wireless k"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data, {"query": "wireless k", "suggestions": ["Wireless Keyboard"]}
+        )
+
+        # Served from memory until the next sync
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/products/autocomplete/", {"q": "m"})
+        self.assertEqual(response.data["suggestions"], ["Wireless Mouse", "Mouse Pad"])
+
+    def test_searches_count_towards_suggestions(self):
+        suggestions = autocomplete.get_autocomplete()
+        for query in ["Ergonomic Chair", "ergonomic  chair", "ERGONOMIC chair"]:
+            response = self.client.get("/api/products/search/", {"q": query})
+            self.assertEqual(response.status_code, 200)
+        outbox_service.drain()
+
+        self.assertEqual(
+            list(
+                AnalyticsEvent.objects.filter(
+                    event_type="search", metadata__query="ergonomic chair"
+                ).values_list("metadata", flat=True)
+            ),
+            [{"query": "ergonomic chair"}] * 3,
+        )
+        suggestions.sync()
+        self.assertEqual(suggestions.suggest("ergo"), ["ergonomic chair"])
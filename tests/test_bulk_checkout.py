@@ -0,0 +1,267 @@
+# Standard library imports
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+# Django imports
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import (
+    Category,
+    Order,
+    OutboxEvent,
+    Product,
+    Promotion,
+    Reservation,
+    Seller,
+    Transaction,
+    User,
+)
+from services import checkout_service, inventory_service, payment_service
+from services.payment_gateways import PaymentGateway, approved, declined, unknown
+
+
+class FakeGateway(PaymentGateway):
+    def charge(self, transaction_id, amount, payment_method):
+        # Decline anything over $400 so tests can pick the outcome
+        if payment_method == "timeout":
+            return unknown(transaction_id)
+        if amount > 400:
+            return declined(transaction_id)
+        return approved(transaction_id, "abc12345")
+
+
+@override_settings(PAYMENT_GATEWAY={"BACKEND": "test_bulk_checkout.FakeGateway"})
+class BulkCheckoutTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.category = Category.objects.create(name="Electronics")
+        self.product = Product.objects.create(
+            seller=self.seller,
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            price=Decimal("100.00"),
+            cost=Decimal("50.00"),
+            inventory_count=5,
+        )
+        self.user = User.objects.create_user(
+            username="buyer", email="buyer@test.com", password="testpass"
+        )
+
+    def cart(self, quantity):
+        return {
+            "user_id": str(self.user.user_id),
+            "items": [
+                {"product_id": str(self.product.product_id), "quantity": quantity}
+            ],
+            "payment_method": "card",
+            "shipping_address": {"country": "US"},
+        }
+
+    def bulk_checkout(self, carts):
+        return self.client.post(
+            "/api/orders/bulk-checkout/",
+            {"orders": carts},
+            content_type="application/json",
+        )
+
+    def test_returns_one_result_per_cart(self):
+        response = self.bulk_checkout([self.cart(1), self.cart(2)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["succeeded"], 2)
+        self.assertEqual(Order.objects.filter(status="paid").count(), 2)
+        self.assertEqual(Transaction.objects.filter(status="completed").count(), 2)
+        self.assertEqual(OutboxEvent.objects.count(), 4)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory_count, 2)
+        self.assertEqual(self.product.reserved_count, 0)
+
+    def test_stock_is_allocated_across_carts_in_order(self):
+        response = self.bulk_checkout([self.cart(3), self.cart(3)])
+
+        results = response.data["results"]
+        self.assertEqual(results[0]["status"], "success")
+        self.assertEqual(results[1]["status"], "failed")
+        self.assertIn("out of stock", results[1]["error"])
+
+    def test_declined_payment_releases_stock(self):
+        response = self.bulk_checkout([self.cart(1), self.cart(4)])
+
+        results = response.data["results"]
+        self.assertEqual(results[0]["status"], "success")
+        self.assertEqual(results[1]["status"], "failed")
+        self.assertEqual(results[1]["error"], "Payment declined")
+        self.assertEqual(
+            Order.objects.get(order_id=results[1]["order_id"]).status, "cancelled"
+        )
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory_count, 4)
+        self.assertEqual(self.product.reserved_count, 0)
+
+    def test_declined_payment_returns_promo_use(self):
+        promo = Promotion.objects.create(
+            code="BULK5",
+            seller=self.seller,
+            discount_type="fixed",
+            discount_value=Decimal("5.00"),
+            min_purchase_amount=Decimal("0"),
+            usage_limit=10,
+            usage_count=0,
+            start_date=timezone.now() - timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=30),
+            is_active=True,
+        )
+        carts = [self.cart(1), self.cart(4)]
+        for cart in carts:
+            cart["promo_code"] = "BULK5"
+
+        response = self.bulk_checkout(carts)
+
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["success", "failed"])
+        promo.refresh_from_db()
+        self.assertEqual(promo.usage_count, 1)
+
+    def test_invalid_carts_fail_individually(self):
+        bad_product = self.cart(1)
+        bad_product["items"][0]["product_id"] = "not-a-uuid"
+
+        response = self.bulk_checkout([bad_product, {"items": []}, self.cart(1)])
+
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["failed", "failed", "success"])
+
+    def test_rejects_empty_request(self):
+        response = self.bulk_checkout([])
+        self.assertEqual(response.status_code, 400)
+
+    def test_charges_survive_a_failed_finalize(self):
+        with mock.patch.object(
+            checkout_service.outbox_service,
+            "enqueue_many",
+            side_effect=DatabaseError("disk I/O error"),
+        ):
+            with self.assertRaises(checkout_service.FinalizeFailed) as ctx:
+                checkout_service.bulk_checkout([self.cart(1), self.cart(4)])
+
+        # The gateway's answers were saved before finalizing began
+        self.assertEqual(
+            sorted(Transaction.objects.values_list("status", flat=True)),
+            ["completed", "failed"],
+        )
+        paid = Transaction.objects.get(status="completed").order
+        self.assertEqual(paid.status, "processing")
+        self.assertEqual(ctx.exception.order_ids, [str(paid.order_id)])
+
+        # The sweeper gives back the declined order's stock but not the
+        # charged one's
+        later = timezone.now() + timedelta(days=1)
+        self.assertEqual(inventory_service.release_expired(now=later), 1)
+        self.assertEqual(Reservation.objects.get(order=paid, status="held").quantity, 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_count, 1)
+
+    def test_failed_finalize_is_not_charged_again(self):
+        def post():
+            return self.client.post(
+                "/api/orders/bulk-checkout/",
+                {"orders": [self.cart(1)]},
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="bulk-1",
+            )
+
+        with mock.patch.object(
+            checkout_service.outbox_service,
+            "enqueue_many",
+            side_effect=DatabaseError("disk I/O error"),
+        ):
+            first = post()
+        second = post()
+
+        self.assertEqual(first.status_code, 500)
+        self.assertEqual(len(first.data["order_ids"]), 1)
+        self.assertEqual(second.status_code, 500)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_payment_record_is_retried(self):
+        bulk_create = Transaction.objects.bulk_create
+        errors = [DatabaseError("database is locked")]
+
+        def flaky_bulk_create(*args, **kwargs):
+            if errors:
+                raise errors.pop()
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(
+            Transaction.objects, "bulk_create", side_effect=flaky_bulk_create
+        ):
+            response = self.bulk_checkout([self.cart(1)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["succeeded"], 1)
+        self.assertEqual(Transaction.objects.filter(status="completed").count(), 1)
+
+    @mock.patch.object(payment_service, "RECORD_BACKOFF", 0)
+    def test_unrecorded_payments_are_not_charged_again(self):
+        def post():
+            return self.client.post(
+                "/api/orders/bulk-checkout/",
+                {"orders": [self.cart(1)]},
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="bulk-3",
+            )
+
+        with mock.patch.object(
+            payment_service, "authorize_many", wraps=payment_service.authorize_many
+        ) as authorize_many:
+            with mock.patch.object(
+                Transaction.objects,
+                "bulk_create",
+                side_effect=DatabaseError("database is locked"),
+            ):
+                first = post()
+            second = post()
+
+        self.assertEqual(first.status_code, 500)
+        self.assertEqual(len(first.data["order_ids"]), 1)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(authorize_many.call_count, 1)
+
+    def test_transient_errors_can_be_retried(self):
+        with mock.patch.object(
+            checkout_service.pipeline,
+            "run_many",
+            side_effect=DatabaseError("database is locked"),
+        ):
+            response = self.client.post(
+                "/api/orders/bulk-checkout/",
+                {"orders": [self.cart(1)]},
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="bulk-2",
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_unknown_payment_holds_the_order(self):
+        cart = self.cart(1)
+        cart["payment_method"] = "timeout"
+
+        response = self.bulk_checkout([cart])
+
+        result = response.data["results"][0]
+        self.assertEqual(result["status"], "processing")
+        self.assertEqual(Order.objects.get().status, "processing")
+        self.assertEqual(Transaction.objects.get().status, "pending")
+
+        later = timezone.now() + timedelta(days=1)
+        self.assertEqual(inventory_service.release_expired(now=later), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_count, 1)
@@ -1,5 +1,10 @@
+# Standard library imports
+from unittest import mock
+
 # Django imports
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
@@ -307,3 +312,72 @@ class CheckoutTests(TestCase):
         # $100 - $5 = $95 subtotal
         order = response.data
         self.assertEqual(order["subtotal"], 95.00)
+
+    def _count_product_selects(self, items):
+        with mock.patch(
+            "services.payment_service.process_payment",
+            return_value={"status": "success", "transaction_id": "txn"},
+        ), CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                "/api/orders/checkout/",
+                {
+                    "user_id": str(self.user.user_id),
+                    "items": items,
+                    "payment_method": "card",
+                    "shipping_address": {"country": "US"},
+                },
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        return sum(
+            1
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and 'FROM "marketplace_product"' in query["sql"]
+        )
+
+    def test_checkout_product_queries_do_not_grow_with_cart(self):
+        """Cart products are fetched (and locked) in a single query"""
+        extra_products = [
+            Product.objects.create(
+                seller=self.seller,
+                name=f"Bulk Product {i}",
+                description="Query count test product",
+                category=self.category,
+                price=Decimal("10.00"),
+                cost=Decimal("5.00"),
+                inventory_count=10,
+            )
+            for i in range(4)
+        ]
+
+        single = self._count_product_selects(
+            [{"product_id": str(self.product.product_id), "quantity": 1}]
+        )
+        many = self._count_product_selects(
+            [{"product_id": str(p.product_id), "quantity": 1} for p in extra_products]
+            + [{"product_id": str(self.product.product_id), "quantity": 1}]
+        )
+
+        self.assertEqual(single, 1)
+        self.assertEqual(many, 1)
+
+    def test_checkout_same_product_on_two_lines(self):
+        """Both lines of a repeated product count against its stock"""
+        response = self.client.post(
+            "/api/orders/checkout/",
+            {
+                "user_id": str(self.user.user_id),
+                "items": [
+                    {"product_id": str(self.product.product_id), "quantity": 6},
+                    {"product_id": str(self.product.product_id), "quantity": 6},
+                ],
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("out of stock", response.data["error"].lower())
@@ -0,0 +1,164 @@
+# Standard library imports
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+# Django imports
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Category, FraudFeatures, Order, Product, Seller, User
+from services import fraud_service
+from services.payment_gateways import approved
+
+
+class FraudFeaturesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="buyer", email="buyer@test.com", password="testpass"
+        )
+
+    def create_order(self, status="pending", age=timedelta(0)):
+        # Written in bulk, so FraudFeatures only changes when a test says so
+        (order,) = Order.objects.bulk_create(
+            [
+                Order(
+                    user=self.user,
+                    status=status,
+                    subtotal=10,
+                    total=10,
+                    shipping_address={},
+                )
+            ]
+        )
+        if age:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - age)
+            order.refresh_from_db()
+        return order
+
+    def test_missing_row_is_built_from_order_history(self):
+        self.create_order("paid", age=timedelta(days=3))
+        self.create_order("shipped", age=timedelta(hours=5))
+        self.create_order("cancelled", age=timedelta(minutes=10))
+
+        features = fraud_service.get_features(self.user)
+
+        self.assertEqual(features["previous_orders"], 2)
+        self.assertEqual(features["recent_orders"], 1)
+        self.assertEqual(features["daily_orders"], 2)
+        self.assertTrue(features["new_account"])
+        self.assertTrue(FraudFeatures.objects.filter(pk=self.user.pk).exists())
+
+    def test_features_are_one_query_regardless_of_history(self):
+        for _ in range(20):
+            self.create_order("paid")
+        fraud_service.rebuild_features([self.user])
+
+        with self.assertNumQueries(1):
+            features = fraud_service.get_features(self.user)
+        self.assertEqual(features["previous_orders"], 20)
+
+    def test_counters_follow_placed_and_paid_orders(self):
+        fraud_service.get_features(self.user)
+
+        old = self.create_order(age=timedelta(hours=3))
+        fraud_service.record_orders_placed([old])
+        orders = [self.create_order(), self.create_order()]
+        fraud_service.record_orders_placed(orders)
+        fraud_service.record_orders_paid(orders[:1])
+
+        features = fraud_service.get_features(self.user)
+        self.assertEqual(features["recent_orders"], 2)
+        self.assertEqual(features["daily_orders"], 3)
+        self.assertEqual(features["previous_orders"], 1)
+
+        # The same orders seen a day later have aged out of both windows
+        later = fraud_service.get_features_many(
+            [self.user], now=timezone.now() + timedelta(days=1, minutes=10)
+        )[self.user.pk]
+        self.assertEqual(later["recent_orders"], 0)
+        self.assertEqual(later["daily_orders"], 0)
+        self.assertEqual(later["previous_orders"], 1)
+
+    def test_rebuild_command_repairs_drift(self):
+        self.create_order("paid")
+        fraud_service.get_features(self.user)
+        FraudFeatures.objects.filter(pk=self.user.pk).update(
+            paid_orders=7, order_buckets={}
+        )
+
+        out = StringIO()
+        call_command("rebuild_fraud_features", stdout=out)
+
+        self.assertIn("Rebuilt fraud features for 1 users", out.getvalue())
+        features = fraud_service.get_features(self.user)
+        self.assertEqual(features["previous_orders"], 1)
+        self.assertEqual(features["recent_orders"], 1)
+
+    def test_saved_orders_update_features(self):
+        fraud_service.get_features(self.user)
+
+        order = Order.objects.create(
+            user=self.user, subtotal=10, total=10, shipping_address={}
+        )
+        Order.objects.create(
+            user=self.user, status="paid", subtotal=10, total=10, shipping_address={}
+        )
+        features = fraud_service.get_features(self.user)
+        self.assertEqual(features["recent_orders"], 2)
+        self.assertEqual(features["previous_orders"], 1)
+
+        # Through the order API, as the admin would save it
+        response = self.client.patch(
+            f"/api/orders/{order.pk}/",
+            {"status": "shipped"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(fraud_service.get_features(self.user)["previous_orders"], 2)
+
+        order = Order.objects.get(pk=order.pk)
+        order.status = "delivered"
+        order.save()
+        order.status = "cancelled"
+        order.save(update_fields=["status", "updated_at"])
+        features = fraud_service.get_features(self.user)
+        self.assertEqual(features["previous_orders"], 1)
+        self.assertEqual(features["recent_orders"], 2)
+
+    @mock.patch(
+        "services.payment_gateways.SimulatedGateway.charge",
+        side_effect=lambda transaction_id, amount, method: approved(
+            transaction_id, "abc12345"
+        ),
+    )
+    def test_checkout_updates_features(self, _charge):
+        seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        product = Product.objects.create(
+            seller=seller,
+            name="Test Product",
+            description="Test Description",
+            category=Category.objects.create(name="Electronics"),
+            price=100.00,
+            cost=50.00,
+            inventory_count=10,
+        )
+        fraud_service.get_features(self.user)
+
+        response = self.client.post(
+            "/api/orders/checkout/",
+            {
+                "user_id": str(self.user.user_id),
+                "items": [{"product_id": str(product.product_id), "quantity": 1}],
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        features = fraud_service.get_features(self.user)
+        self.assertEqual(features["previous_orders"], 1)
+        self.assertEqual(features["recent_orders"], 1)
@@ -0,0 +1,167 @@
+# Standard library imports
+import itertools
+from datetime import timedelta
+from io import StringIO
+
+# Django imports
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Order, Seller, User
+from services import fraud_service
+
+
+def hand_coded_score(features, amount):
+    # The if-statements fraud scoring used before the rule engine
+    risk_score = 0.1
+    if amount > 5000:
+        risk_score += 0.3
+    if features["previous_orders"] == 0 and amount > 1000:
+        risk_score += 0.4
+    if features["new_account"]:
+        risk_score += 0.3
+    if features["recent_orders"] > 3:
+        risk_score += 0.5
+    return min(risk_score, 1.0)
+
+
+class FraudScoringTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="buyer", email="buyer@test.com", password="testpass"
+        )
+
+    def test_batch_matches_hand_coded_rules(self):
+        cases = [
+            (
+                {
+                    "previous_orders": previous,
+                    "recent_orders": recent,
+                    "daily_orders": recent,
+                    "new_account": new,
+                },
+                amount,
+            )
+            for previous, recent, new, amount in itertools.product(
+                [0, 1, 10], [0, 3, 4], [False, True], [10, 1000, 1000.01, 6000]
+            )
+        ]
+
+        scores = fraud_service.score_batch(
+            [features for features, _ in cases], [amount for _, amount in cases]
+        )
+
+        self.assertEqual(
+            scores, [hand_coded_score(features, amount) for features, amount in cases]
+        )
+
+    def test_score_batch_endpoint(self):
+        response = self.client.post(
+            "/api/fraud/score-batch/",
+            {
+                "transactions": [
+                    {"user_id": str(self.user.user_id), "amount": 50},
+                    {"user_id": str(self.user.user_id), "amount": 2000},
+                ]
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["results"],
+            [{"score": 0.4, "flagged": False}, {"score": 0.8, "flagged": False}],
+        )
+
+        response = self.client.post(
+            "/api/fraud/score-batch/",
+            {"transactions": [{"user_id": "nobody", "amount": 5}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rescore_recent_orders(self):
+        old = Order.objects.create(
+            user=self.user,
+            status="cancelled",
+            subtotal=9000,
+            total=0,
+            shipping_address={},
+        )
+        Order.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=40)
+        )
+        risky = Order.objects.create(
+            user=self.user,
+            status="pending",
+            subtotal=9000,
+            total=0,
+            shipping_address={},
+        )
+        Order.objects.create(
+            user=self.user, status="pending", subtotal=20, total=0, shipping_address={}
+        )
+
+        response = self.client.post(
+            "/api/fraud/score-batch/", {"days": 30}, content_type="application/json"
+        )
+
+        self.assertEqual(response.data["scored"], 2)
+        self.assertEqual(response.data["flagged"], [str(risky.order_id)])
+
+        out = StringIO()
+        call_command("rescore_orders", "--days", "60", stdout=out)
+        self.assertIn("Scored 3 orders", out.getvalue())
+
+    def test_rescore_uses_features_from_when_each_order_was_placed(self):
+        now = timezone.now()
+        User.objects.filter(pk=self.user.pk).update(created_at=now - timedelta(days=10))
+        self.user.refresh_from_db()
+
+        def place(amount, placed_at, status="paid"):
+            # Past orders, written in bulk so they aren't counted as placed now
+            (order,) = Order.objects.bulk_create(
+                [
+                    Order(
+                        user=self.user,
+                        status=status,
+                        subtotal=amount,
+                        total=amount,
+                        shipping_address={},
+                    )
+                ]
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=placed_at)
+            return order
+
+        first = place(6000, now - timedelta(days=10, minutes=-30))
+        for days in (5, 4, 3):
+            place(20, now - timedelta(days=days))
+        # Today the buyer has three paid orders and an old account, which on
+        # their own wouldn't flag a $6000 order
+        self.assertEqual(
+            fraud_service.score_transaction(
+                fraud_service.get_features(self.user), 6000
+            ),
+            0.4,
+        )
+
+        with self.assertNumQueries(4):
+            summary = fraud_service.rescore_orders(now - timedelta(days=30))
+
+        self.assertEqual(summary["scored"], 4)
+        self.assertEqual(summary["flagged"], [str(first.order_id)])
+
+    def test_check_seller_uses_seller_rules(self):
+        seller = Seller.objects.create(name="Seller", email="seller@test.com")
+        self.assertAlmostEqual(fraud_service.check_seller(seller.seller_id), 0.3)
+
+        Seller.objects.filter(pk=seller.pk).update(
+            created_at=timezone.now() - timedelta(days=365),
+            rating=1.5,
+            total_sales=50,
+            is_active=False,
+        )
+        self.assertAlmostEqual(fraud_service.check_seller(seller.seller_id), 0.9)
@@ -0,0 +1,159 @@
+# Standard library imports
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+# Django imports
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Category, IdempotencyKey, Order, Product, Seller, User
+from services import idempotency_service, payment_gateways, payment_service
+
+# Kept before the class-level patch below replaces it
+process_payment = payment_service.process_payment
+
+
+@mock.patch(
+    "services.payment_service.process_payment",
+    return_value={"status": "success", "transaction_id": "txn"},
+)
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        idempotency_service._responses.clear()
+
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.category = Category.objects.create(name="Electronics")
+        self.product = Product.objects.create(
+            seller=self.seller,
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            price=100.00,
+            cost=50.00,
+            inventory_count=10,
+        )
+        self.user = User.objects.create_user(
+            username="testuser", email="test@test.com", password="testpass"
+        )
+
+    def checkout(self, key, quantity=1):
+        return self.client.post(
+            "/api/orders/checkout/",
+            {
+                "user_id": str(self.user.user_id),
+                "items": [
+                    {"product_id": str(self.product.product_id), "quantity": quantity}
+                ],
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+            },
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_original_response(self, payment):
+        first = self.checkout("retry-1")
+        second = self.checkout("retry-1")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(payment.call_count, 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_replay_survives_losing_the_memory_cache(self, payment):
+        first = self.checkout("retry-2")
+        idempotency_service._responses.clear()
+
+        with self.assertNumQueries(1):
+            second = self.checkout("retry-2")
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(payment.call_count, 1)
+
+    def test_key_reused_with_different_payload(self, payment):
+        self.checkout("retry-3", quantity=1)
+        response = self.checkout("retry-3", quantity=2)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self, payment):
+        self.checkout("")
+        self.checkout("")
+
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_transient_errors_are_not_stored(self, payment):
+        payment.side_effect = OperationalError("database is locked")
+        first = self.checkout("retry-4")
+        self.assertEqual(first.status_code, 503)
+        self.assertFalse(IdempotencyKey.objects.filter(key="retry-4").exists())
+
+        payment.side_effect = None
+        second = self.checkout("retry-4")
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", second)
+        self.assertEqual(Order.objects.filter(status="paid").count(), 1)
+
+    def test_rejected_requests_are_stored(self, payment):
+        first = self.checkout("retry-5", quantity=50)
+        second = self.checkout("retry-5", quantity=50)
+
+        self.assertEqual(first.status_code, 400)
+        self.assertIn("out of stock", first.data["error"])
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+
+    @override_settings(IDEMPOTENCY_LEASE=60)
+    def test_stale_requests_are_taken_over(self, payment):
+        req_hash = idempotency_service.request_hash("POST", "/", {})
+        IdempotencyKey.objects.create(key="retry-6", request_hash=req_hash)
+
+        with self.assertRaises(idempotency_service.RequestInProgress):
+            idempotency_service.begin("retry-6", req_hash)
+
+        IdempotencyKey.objects.filter(key="retry-6").update(
+            created_at=timezone.now() - timedelta(seconds=61)
+        )
+        with self.assertRaises(idempotency_service.KeyReused):
+            idempotency_service.begin("retry-6", "other")
+        self.assertIsNone(idempotency_service.begin("retry-6", req_hash))
+        # The new lease holds off the next retry
+        with self.assertRaises(idempotency_service.RequestInProgress):
+            idempotency_service.begin("retry-6", req_hash)
+
+    def test_unknown_payment_is_held_not_retried(self, payment):
+        # Go through the real process_payment, which puts the order on hold
+        payment.side_effect = process_payment
+        with mock.patch(
+            "services.payment_service.authorize",
+            return_value=payment_gateways.unknown(uuid.uuid4()),
+        ):
+            first = self.checkout("retry-7")
+            second = self.checkout("retry-7")
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.data["status"], "processing")
+        self.assertEqual(Order.objects.get().status, "processing")
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(payment.call_count, 1)
+
+    def test_failure_after_charge_is_not_retried(self, payment):
+        with mock.patch(
+            "services.inventory_service.confirm_orders",
+            side_effect=OperationalError("database is locked"),
+        ):
+            first = self.checkout("retry-8")
+            second = self.checkout("retry-8")
+
+        self.assertEqual(first.status_code, 500)
+        self.assertEqual(first.data["status"], "processing")
+        self.assertEqual(second.status_code, 500)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(payment.call_count, 1)
+        self.assertFalse(Order.objects.filter(status="paid").exists())
@@ -0,0 +1,114 @@
+# Standard library imports
+from unittest import mock
+
+# Django imports
+from django.test import SimpleTestCase, TestCase
+
+# Local application imports
+from marketplace.models import Category, Product, Seller, User
+from services import instrumentation
+from services.payment_gateways import approved
+
+
+class HistogramTests(SimpleTestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = instrumentation.Histogram("test_seconds", "Test.", "span", (1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe("work", value)
+
+        lines = histogram.render().splitlines()
+
+        self.assertIn('test_seconds_bucket{span="work",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{span="work",le="5"} 3', lines)
+        self.assertIn('test_seconds_bucket{span="work",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_sum{span="work"} 14.5', lines)
+        self.assertIn('test_seconds_count{span="work"} 4', lines)
+
+    def test_server_timing_merges_repeated_spans(self):
+        header = instrumentation.server_timing(
+            [("pricing", 0.002, 1), ("pricing", 0.003, 0), ("fraud", 0.3, 0)], 0.5
+        )
+
+        self.assertEqual(
+            header,
+            'pricing;dur=5.0;desc="calls=2 queries=1", '
+            'fraud;dur=300.0;desc="calls=1 queries=0", '
+            "total;dur=500.0",
+        )
+
+
+class SpanTests(TestCase):
+    def test_span_counts_queries_and_nests(self):
+        with instrumentation.collect() as spans:
+            with instrumentation.span("outer"):
+                User.objects.count()
+                with instrumentation.span("inner"):
+                    User.objects.count()
+
+        self.assertEqual(
+            [(name, queries) for name, _, queries in spans],
+            [("inner", 1), ("outer", 2)],
+        )
+
+
+class CheckoutTimingTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.product = Product.objects.create(
+            seller=seller,
+            name="Test Product",
+            description="Test Description",
+            category=Category.objects.create(name="Electronics"),
+            price=100.00,
+            cost=50.00,
+            inventory_count=10,
+        )
+        self.user = User.objects.create_user(
+            username="testuser", email="test@test.com", password="testpass"
+        )
+
+    @mock.patch(
+        "services.payment_gateways.SimulatedGateway.charge",
+        side_effect=lambda transaction_id, amount, method: approved(
+            transaction_id, "abc12345"
+        ),
+    )
+    def test_checkout_reports_service_timings(self, _charge):
+        response = self.client.post(
+            "/api/orders/checkout/",
+            {
+                "user_id": str(self.user.user_id),
+                "items": [{"product_id": str(self.product.product_id), "quantity": 1}],
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        timing = response["Server-Timing"]
+        for name in (
+            "checkout.lock_products",
+            "pricing_service.price_cart",
+            "inventory_service.reserve_many",
+            "fraud_service.score_transaction",
+            "shipping_service.quote_shipping",
+            "payment_service.process_payment",
+            "total",
+        ):
+            self.assertIn(f"{name};dur=", timing)
+
+        metrics = self.client.get("/api/metrics/")
+        self.assertEqual(metrics.status_code, 200)
+        self.assertTrue(metrics["Content-Type"].startswith("text/plain"))
+        body = metrics.content.decode()
+        self.assertIn("# TYPE marketplace_span_duration_seconds histogram", body)
+        self.assertIn(
+            "marketplace_span_duration_seconds_count"
+            '{span="fraud_service.score_transaction"}',
+            body,
+        )
+        self.assertIn(
+            'marketplace_http_request_duration_seconds_bucket{view="order-checkout"',
+            body,
+        )
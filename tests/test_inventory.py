@@ -1,8 +1,26 @@
+# Standard library imports
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
 # Django imports
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 # Local application imports
-from marketplace.models import Category, Product, Seller
+from marketplace.models import (
+    Category,
+    Order,
+    Product,
+    Reservation,
+    Seller,
+    StockShard,
+    User,
+)
 from services import inventory_service
 
 
@@ -49,3 +67,317 @@ class InventoryTests(TestCase):
 
         self.assertEqual(self.product.inventory_count, initial_inventory - 2)
         self.assertEqual(self.product.reserved_count, initial_reserved - 2)
+
+    def make_order(self):
+        user, _ = User.objects.get_or_create(
+            username="buyer", defaults={"email": "buyer@test.com"}
+        )
+        return Order.objects.create(user=user, subtotal=0, total=0, shipping_address={})
+
+    def test_reservations_are_recorded_in_ledger(self):
+        order = self.make_order()
+        inventory_service.reserve_inventory(self.product.product_id, 3, order=order)
+
+        reservation = Reservation.objects.get(order=order)
+        self.assertEqual(reservation.quantity, 3)
+        self.assertEqual(reservation.status, "held")
+        self.assertGreater(reservation.expires_at, timezone.now())
+
+        inventory_service.confirm_orders([order])
+        reservation.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(reservation.status, "confirmed")
+        self.assertEqual(self.product.inventory_count, 7)
+        self.assertEqual(self.product.reserved_count, 0)
+
+    def test_release_orders_returns_stock(self):
+        order = self.make_order()
+        inventory_service.hold_many([(order, {self.product.product_id: 4})])
+
+        inventory_service.release_orders([order])
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory_count, 10)
+        self.assertEqual(self.product.available_count, 10)
+
+    def test_sweeper_releases_expired_holds(self):
+        stale, fresh = self.make_order(), self.make_order()
+        inventory_service.hold_many([(stale, {self.product.product_id: 2})], ttl=-1)
+        inventory_service.hold_many([(fresh, {self.product.product_id: 3})])
+
+        call_command("release_expired_reservations", stdout=StringIO())
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_count, 3)
+        self.assertEqual(Reservation.objects.get(order=stale).status, "expired")
+        self.assertEqual(Reservation.objects.get(order=fresh).status, "held")
+
+    def test_confirming_an_expired_hold_still_sells_the_stock(self):
+        order = self.make_order()
+        inventory_service.hold_many([(order, {self.product.product_id: 2})], ttl=-1)
+        inventory_service.release_expired()
+
+        inventory_service.confirm_orders([order])
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory_count, 8)
+        self.assertEqual(self.product.reserved_count, 0)
+
+    def test_sweeper_works_in_batches(self):
+        order = self.make_order()
+        inventory_service.hold_many(
+            [(order, {self.product.product_id: 1}) for _ in range(5)],
+            ttl=-1,
+        )
+
+        self.assertEqual(
+            inventory_service.release_expired(
+                batch_size=2, now=timezone.now() + timedelta(seconds=1)
+            ),
+            2,
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_count, 3)
+
+
+class BulkInventoryTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        category = Category.objects.create(name="Electronics")
+        self.products = [
+            Product.objects.create(
+                seller=seller,
+                name=f"Product {i}",
+                description="Test Description",
+                category=category,
+                price=10.00,
+                cost=5.00,
+                inventory_count=5,
+            )
+            for i in range(3)
+        ]
+
+    def counts(self):
+        return [
+            (p.inventory_count, p.reserved_count)
+            for p in Product.objects.order_by("id")
+        ]
+
+    def test_reserve_many_uses_one_update(self):
+        quantities = {p.product_id: 2 for p in self.products}
+
+        # One UPDATE and one INSERT; the rest are savepoints
+        with self.assertNumQueries(6):
+            inventory_service.reserve_many(
+                quantities, products={p.product_id: p for p in self.products}
+            )
+
+        self.assertEqual(self.counts(), [(5, 2)] * 3)
+
+    def test_reserve_many_fails_atomically(self):
+        first, second, third = self.products
+        with self.assertRaises(inventory_service.InsufficientStock) as raised:
+            inventory_service.reserve_many(
+                {first.product_id: 1, second.product_id: 6, third.product_id: 1}
+            )
+
+        self.assertEqual(raised.exception.product_id, second.product_id)
+        self.assertEqual(self.counts(), [(5, 0)] * 3)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_confirm_and_release_many(self):
+        first, second, _ = self.products
+        inventory_service.reserve_many({first.product_id: 2, second.product_id: 3})
+
+        inventory_service.confirm_many({first.product_id: 2})
+        inventory_service.release_many({second.product_id: 3})
+
+        self.assertEqual(self.counts(), [(3, 0), (5, 0), (5, 0)])
+
+    @override_settings(INVENTORY_IMPORT_BATCH_SIZE=2)
+    def test_stock_import(self):
+        sharded = inventory_service.shard_stock(self.products[2].product_id, 2)
+        feed = [
+            {"product_id": str(self.products[0].product_id), "inventory_count": 40},
+            {"product_id": str(self.products[1].product_id), "inventory_count": 0},
+            {"product_id": str(sharded.product_id), "inventory_count": 9},
+            {"product_id": "not-a-uuid", "inventory_count": 1},
+            {"product_id": str(uuid.uuid4()), "inventory_count": 1},
+        ]
+
+        response = self.client.post(
+            "/api/products/stock-import/",
+            {"stock": feed},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["received"], 5)
+        self.assertEqual(response.data["updated"], 3)
+        self.assertEqual(response.data["unmatched"], 1)
+        self.assertEqual([e["index"] for e in response.data["errors"]], [3])
+        self.assertEqual([c for c, _ in self.counts()[:2]], [40, 0])
+        self.assertEqual(
+            inventory_service.shard_totals([sharded.product_id]),
+            {sharded.product_id: (9, 0)},
+        )
+
+    def test_stock_import_groups_shared_counts(self):
+        extra = Product.objects.bulk_create(
+            Product(
+                seller=self.products[0].seller,
+                name=f"Bulk {i}",
+                description="Test Description",
+                price=10.00,
+                cost=5.00,
+            )
+            for i in range(inventory_service.IMPORT_MIN_GROUP)
+        )
+        levels = {p.product_id: 7 for p in extra}
+        levels[self.products[0].product_id] = 1
+
+        # sharded lookup, one IN-list UPDATE, one CASE UPDATE, plus savepoint
+        with self.assertNumQueries(5):
+            updated = inventory_service.import_stock(levels)
+
+        self.assertEqual(updated, len(levels))
+        self.assertEqual(Product.objects.filter(inventory_count=7).count(), len(extra))
+
+
+class StockShardTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.product = Product.objects.create(
+            seller=seller,
+            name="Flash Sale Product",
+            description="Test Description",
+            category=Category.objects.create(name="Electronics"),
+            price=100.00,
+            cost=50.00,
+            inventory_count=10,
+        )
+        self.user = User.objects.create_user(
+            username="buyer", email="buyer@test.com", password="testpass"
+        )
+        self.product = inventory_service.shard_stock(self.product.product_id, 4)
+
+    def make_order(self):
+        return Order.objects.create(
+            user=self.user, subtotal=0, total=0, shipping_address={}
+        )
+
+    def shard_counts(self):
+        return list(
+            StockShard.objects.filter(product=self.product)
+            .order_by("slot")
+            .values_list("inventory_count", "reserved_count")
+        )
+
+    def test_shard_stock_splits_inventory(self):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_shards, 4)
+        self.assertEqual(self.shard_counts(), [(3, 0), (3, 0), (2, 0), (2, 0)])
+
+    def test_hold_takes_from_one_slot_without_touching_product_row(self):
+        order = self.make_order()
+        inventory_service.reserve_inventory(self.product.product_id, 2, order=order)
+
+        reservation = Reservation.objects.get(order=order)
+        self.assertIsNotNone(reservation.slot)
+        self.assertEqual(
+            inventory_service.shard_totals([self.product.product_id]),
+            {self.product.product_id: (10, 2)},
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_count, 0)
+
+        inventory_service.confirm_orders([order])
+        self.assertEqual(
+            inventory_service.shard_totals([self.product.product_id]),
+            {self.product.product_id: (8, 0)},
+        )
+
+    def test_settling_a_hold_only_updates_its_shard(self):
+        order = self.make_order()
+        inventory_service.reserve_inventory(self.product.product_id, 2, order=order)
+
+        with CaptureQueriesContext(connection) as ctx:
+            inventory_service.release_orders([order])
+
+        (update,) = [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith('UPDATE "marketplace_stockshard"')
+        ]
+        where = update.rsplit(" WHERE ", 1)[1]
+        self.assertIn('"slot" =', where)
+        self.assertEqual([reserved for _, reserved in self.shard_counts()], [0] * 4)
+
+    def test_hold_larger_than_any_slot_gathers_from_several(self):
+        order = self.make_order()
+        inventory_service.hold_many([(order, {self.product.product_id: 9})])
+
+        self.assertEqual(
+            sum(r.quantity for r in Reservation.objects.filter(order=order)), 9
+        )
+        self.assertEqual(inventory_service.stock_levels(self.product)["available"], 1)
+
+    def test_hold_beyond_stock_fails_atomically(self):
+        with self.assertRaises(inventory_service.InsufficientStock):
+            inventory_service.hold_many(
+                [(self.make_order(), {self.product.product_id: 11})]
+            )
+
+        self.assertFalse(Reservation.objects.exists())
+        self.assertEqual([reserved for _, reserved in self.shard_counts()], [0] * 4)
+
+    def test_reconcile_and_unshard_restore_product_counters(self):
+        order = self.make_order()
+        inventory_service.hold_many([(order, {self.product.product_id: 3})])
+
+        inventory_service.reconcile_shards()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_count, 3)
+
+        inventory_service.shard_stock(self.product.product_id, 1)
+        inventory_service.release_orders([order])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_shards, 1)
+        self.assertFalse(StockShard.objects.exists())
+        self.assertEqual(
+            (self.product.inventory_count, self.product.reserved_count), (10, 0)
+        )
+
+    @mock.patch(
+        "services.payment_service.process_payment",
+        return_value={"status": "success", "transaction_id": "txn"},
+    )
+    def test_checkout_sells_from_shards(self, _payment):
+        response = self.client.post(
+            "/api/orders/checkout/",
+            {
+                "user_id": str(self.user.user_id),
+                "items": [{"product_id": str(self.product.product_id), "quantity": 3}],
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            inventory_service.shard_totals([self.product.product_id]),
+            {self.product.product_id: (7, 0)},
+        )
+
+    def test_stock_endpoint(self):
+        response = self.client.get(f"/api/products/{self.product.pk}/stock/")
+        self.assertEqual(response.data["available"], 10)
+        self.assertEqual(len(response.data["shards"]), 4)
+
+        response = self.client.post(
+            f"/api/products/{self.product.pk}/stock/",
+            {"shards": 0},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,155 @@
+# Standard library imports
+from concurrent import futures
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+# Django imports
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Category, Notification, Product, Seller
+from services import notification_service
+
+
+class InlineExecutor(futures.Executor):
+    # Runs sends on the calling thread, which can see the test's transaction
+    def submit(self, fn, *args, **kwargs):
+        future = futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def make_due():
+    Notification.objects.filter(status="pending").update(
+        available_at=timezone.now() - timedelta(seconds=1)
+    )
+
+
+@override_settings(
+    NOTIFICATION_SENDER={
+        "BACKEND": "services.notification_senders.SimulatedSender",
+        "OPTIONS": {"latency": 0},
+    }
+)
+class NotificationQueueTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.product = Product.objects.create(
+            seller=self.seller,
+            name="Test Product",
+            description="Test Description",
+            category=Category.objects.create(name="Electronics"),
+            price=100.00,
+            cost=50.00,
+            inventory_count=10,
+        )
+
+    @mock.patch("services.notification_senders.SimulatedSender.send")
+    def test_seller_notifications_are_batched_per_recipient(self, send):
+        for i in range(200):
+            notification_service.send_seller_notification(
+                self.seller.seller_id, "new_sale", {"order": i}
+            )
+
+        # Seller notifications wait for others to join them
+        self.assertEqual(notification_service.drain()["notifications"], 0)
+
+        make_due()
+        summary = notification_service.drain()
+
+        self.assertEqual(summary, {"notifications": 200, "messages": 1, "failed": 0})
+        send.assert_called_once()
+        recipient, subject, body = send.call_args.args
+        self.assertEqual(recipient, "seller@test.com")
+        self.assertEqual(subject, "200 marketplace updates")
+        self.assertEqual(len(body.splitlines()), 200)
+        self.assertEqual(Notification.objects.filter(status="sent").count(), 200)
+
+    @mock.patch("services.notification_senders.SimulatedSender.send")
+    def test_inventory_alerts_are_coalesced(self, send):
+        for stock in (4, 3, 1):
+            notification_service.send_inventory_alert(self.product.product_id, stock)
+
+        self.assertEqual(Notification.objects.count(), 1)
+
+        make_due()
+        notification_service.drain()
+
+        send.assert_called_once_with(
+            "seller@test.com",
+            "Low inventory alert",
+            "Test Product is running low: 1 remaining.",
+        )
+
+        # Once the alert has gone out, the next one starts a new window
+        notification_service.send_inventory_alert(self.product.product_id, 0)
+        self.assertEqual(Notification.objects.filter(status="pending").count(), 1)
+
+    @mock.patch(
+        "services.notification_senders.SimulatedSender.send",
+        side_effect=ConnectionError("smtp down"),
+    )
+    def test_failed_sends_are_retried_then_marked_failed(self, _send):
+        notification = notification_service.enqueue(
+            "seller", "seller@test.com", {"message_type": "payout", "data": {}}
+        )
+        make_due()
+
+        summary = notification_service.drain(max_attempts=2)
+        self.assertEqual(summary["failed"], 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, "pending")
+        self.assertEqual(notification.last_error, "smtp down")
+        self.assertGreater(notification.available_at, timezone.now())
+
+        make_due()
+        notification_service.drain(max_attempts=2)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, "failed")
+        self.assertEqual(notification.attempts, 2)
+
+    def test_claimed_batch_is_hidden_from_other_workers(self):
+        notification_service.enqueue(
+            "seller", "seller@test.com", {"message_type": "payout", "data": {}}
+        )
+        make_due()
+
+        def send_while_another_worker_drains(*args):
+            other = notification_service.drain(executor=InlineExecutor())
+            self.assertEqual(other["notifications"], 0)
+
+        with mock.patch(
+            "services.notification_senders.SimulatedSender.send",
+            side_effect=send_while_another_worker_drains,
+        ) as send:
+            notification_service.drain(executor=InlineExecutor())
+
+        send.assert_called_once()
+        self.assertEqual(Notification.objects.get().status, "sent")
+
+    def test_metrics_report_queue_depth_and_send_rate(self):
+        notification_service.enqueue(
+            "seller", "seller@test.com", {"message_type": "payout", "data": {}}
+        )
+        notification_service.enqueue(
+            "seller", "other@test.com", {"message_type": "payout", "data": {}}
+        )
+        make_due()
+        call_command("send_notifications", "--workers", "2", stdout=StringIO())
+        notification_service.send_inventory_alert(self.product.product_id, 2)
+
+        body = self.client.get("/api/metrics/").content.decode()
+
+        self.assertIn('marketplace_notification_queue_depth{kind="seller"} 0', body)
+        self.assertIn(
+            'marketplace_notification_queue_depth{kind="inventory_alert"} 1', body
+        )
+        self.assertIn(
+            'marketplace_notification_send_rate{kind="seller"} 0.0333333', body
+        )
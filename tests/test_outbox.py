@@ -0,0 +1,125 @@
+# Standard library imports
+from unittest import mock
+
+# Django imports
+from django.test import TestCase
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import (
+    AnalyticsEvent,
+    Category,
+    OutboxEvent,
+    Product,
+    Seller,
+    User,
+)
+from services import outbox_service
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.category = Category.objects.create(name="Electronics")
+        self.product = Product.objects.create(
+            seller=self.seller,
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            price=100.00,
+            cost=50.00,
+            inventory_count=10,
+        )
+        self.user = User.objects.create_user(
+            username="testuser", email="test@test.com", password="testpass"
+        )
+
+    @mock.patch("services.notification_service.send_order_confirmation")
+    @mock.patch(
+        "services.payment_service.process_payment",
+        return_value={"status": "success", "transaction_id": "txn"},
+    )
+    def test_checkout_defers_side_effects_to_outbox(self, _payment, send_confirmation):
+        response = self.client.post(
+            "/api/orders/checkout/",
+            {
+                "user_id": str(self.user.user_id),
+                "items": [{"product_id": str(self.product.product_id), "quantity": 1}],
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        send_confirmation.assert_not_called()
+        self.assertFalse(AnalyticsEvent.objects.exists())
+        self.assertEqual(
+            set(OutboxEvent.objects.values_list("handler", flat=True)),
+            {"send_order_confirmation", "track_event"},
+        )
+
+        self.assertEqual(outbox_service.drain(), 2)
+        send_confirmation.assert_called_once_with(response.data["order_id"])
+        self.assertTrue(
+            AnalyticsEvent.objects.filter(event_type="order_completed").exists()
+        )
+        self.assertFalse(OutboxEvent.objects.filter(status="pending").exists())
+
+    def test_failed_checkout_leaves_no_outbox_events(self):
+        response = self.client.post(
+            "/api/orders/checkout/",
+            {
+                "user_id": str(self.user.user_id),
+                "items": [
+                    {"product_id": str(self.product.product_id), "quantity": 100}
+                ],
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @mock.patch(
+        "services.notification_service.send_order_confirmation",
+        side_effect=RuntimeError("smtp down"),
+    )
+    def test_failed_handler_is_retried_then_marked_failed(self, _send):
+        event = outbox_service.enqueue("send_order_confirmation", "abc")
+
+        outbox_service.drain(max_attempts=2)
+        event.refresh_from_db()
+        self.assertEqual(event.status, "pending")
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.last_error, "smtp down")
+
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=event.created_at)
+        outbox_service.drain(max_attempts=2)
+        event.refresh_from_db()
+        self.assertEqual(event.status, "failed")
+
+    def test_claimed_events_are_hidden_while_they_run(self):
+        event = outbox_service.enqueue("send_order_confirmation", "abc")
+        seen = []
+
+        def send(order_id):
+            # The claim has been saved, so another worker finds nothing
+            claimed = OutboxEvent.objects.get(pk=event.pk)
+            seen.append((claimed.attempts, claimed.available_at > timezone.now()))
+            seen.append(outbox_service.drain())
+
+        with mock.patch(
+            "services.notification_service.send_order_confirmation", side_effect=send
+        ):
+            self.assertEqual(outbox_service.drain(), 1)
+
+        self.assertEqual(seen, [(1, True), 0])
+        event.refresh_from_db()
+        self.assertEqual(event.status, "processed")
+
+    def test_unknown_handler_is_rejected(self):
+        with self.assertRaises(ValueError):
+            outbox_service.enqueue("drop_database")
@@ -0,0 +1,86 @@
+# Standard library imports
+import threading
+import time
+import uuid
+
+# Django imports
+from django.test import SimpleTestCase
+
+# Local application imports
+from services.payment_gateways import HttpGateway
+from services.stub_gateway import StubGatewayServer
+
+
+class HttpGatewayTests(SimpleTestCase):
+    def start_gateway(self, latency=0, decline_rate=0, pool_size=4, timeout=10.0):
+        server = StubGatewayServer(
+            ("127.0.0.1", 0), latency=latency, decline_rate=decline_rate
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        gateway = HttpGateway(
+            f"http://127.0.0.1:{server.server_address[1]}",
+            pool_size=pool_size,
+            timeout=timeout,
+        )
+        self.addCleanup(gateway.close)
+        return gateway
+
+    def test_charge_is_approved(self):
+        gateway = self.start_gateway()
+        transaction_id = uuid.uuid4()
+
+        result = gateway.charge(transaction_id, 25.5, "card")
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["transaction_id"], transaction_id)
+        self.assertTrue(result["gateway_response"]["auth_code"])
+
+    def test_charge_is_declined(self):
+        gateway = self.start_gateway(decline_rate=1)
+
+        result = gateway.charge(uuid.uuid4(), 25.5, "card")
+
+        self.assertEqual(result["status"], "failed")
+        self.assertEqual(result["gateway_response"]["response_code"], "05")
+
+    def test_charge_many_reuses_pooled_connections(self):
+        gateway = self.start_gateway(pool_size=4)
+        charges = [(uuid.uuid4(), 10, "card") for _ in range(40)]
+
+        results = gateway.charge_many(charges)
+
+        self.assertEqual([r["status"] for r in results], ["success"] * 40)
+        self.assertEqual(
+            [r["transaction_id"] for r in results], [c[0] for c in charges]
+        )
+        self.assertLessEqual(gateway.connections_opened, 4)
+
+    def test_charge_many_runs_concurrently(self):
+        gateway = self.start_gateway(latency=0.2, pool_size=10)
+
+        started = time.perf_counter()
+        gateway.charge_many([(uuid.uuid4(), 10, "card") for _ in range(10)])
+
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_timeout_does_not_count_time_queued_for_a_connection(self):
+        # Five rounds of 0.1s through two connections take about 0.5s, well
+        # past the timeout, but no single request comes near it
+        gateway = self.start_gateway(latency=0.1, pool_size=2, timeout=0.3)
+
+        results = gateway.charge_many([(uuid.uuid4(), 10, "card") for _ in range(10)])
+
+        self.assertEqual([r["status"] for r in results], ["success"] * 10)
+
+    def test_timeout_after_sending_is_unknown(self):
+        gateway = self.start_gateway(latency=0.5, timeout=0.1)
+
+        result = gateway.charge(uuid.uuid4(), 10, "card")
+        self.assertEqual(result["status"], "unknown")
+        self.assertEqual(result["gateway_response"]["response_code"], "68")
+
+        results = gateway.charge_many([(uuid.uuid4(), 10, "card") for _ in range(3)])
+        self.assertEqual([r["status"] for r in results], ["unknown"] * 3)
@@ -0,0 +1,71 @@
+# Standard library imports
+import time
+
+# Django imports
+from django.test import SimpleTestCase, override_settings
+
+# Local application imports
+from services import pipeline
+
+
+def slow(value, delay):
+    time.sleep(delay)
+    return value
+
+
+def broken():
+    raise RuntimeError("carrier unreachable")
+
+
+def unsupported():
+    raise NotImplementedError("no rate")
+
+
+@override_settings(
+    CHECKOUT_STAGES={
+        "fraud": {"timeout": 1.0, "fallback": "raise"},
+        "shipping": {"timeout": 0.1, "fallback": "default", "default": 25.0},
+    }
+)
+class PipelineTests(SimpleTestCase):
+    def test_stages_run_concurrently(self):
+        started = time.monotonic()
+        results = pipeline.run_stages(
+            [
+                pipeline.Stage("fraud", slow, 0.2, 0.3),
+                pipeline.Stage("other", slow, "ok", 0.3),
+            ]
+        )
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(results, {"fraud": 0.2, "other": "ok"})
+        self.assertLess(elapsed, 0.5)
+
+    def test_timeout_uses_default_fallback(self):
+        results = pipeline.run_stages([pipeline.Stage("shipping", slow, 9.99, 0.5)])
+        self.assertEqual(results["shipping"], 25.0)
+
+    def test_error_uses_default_fallback(self):
+        results = pipeline.run_stages([pipeline.Stage("shipping", broken)])
+        self.assertEqual(results["shipping"], 25.0)
+
+    def test_fallback_can_be_limited_to_some_errors(self):
+        policy = {
+            "timeout": 0.1,
+            "fallback": "default",
+            "default": 25.0,
+            "fallback_on": ["builtins.NotImplementedError"],
+        }
+        with self.settings(CHECKOUT_STAGES={"shipping": policy}):
+            results = pipeline.run_stages([pipeline.Stage("shipping", unsupported)])
+            self.assertEqual(results["shipping"], 25.0)
+            results = pipeline.run_stages([pipeline.Stage("shipping", slow, 9.99, 0.5)])
+            self.assertEqual(results["shipping"], 25.0)
+
+            with self.assertRaises(pipeline.StageFailed):
+                pipeline.run_stages([pipeline.Stage("shipping", broken)])
+
+    def test_raise_fallback_fails_the_batch(self):
+        with self.assertRaises(pipeline.StageFailed) as ctx:
+            pipeline.run_stages([pipeline.Stage("fraud", broken)])
+        self.assertEqual(ctx.exception.stage, "fraud")
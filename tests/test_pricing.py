@@ -0,0 +1,190 @@
+# Standard library imports
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+# Django imports
+from django.test import TestCase
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Category, Product, Promotion, Seller, User
+from services import pricing_service
+from services.payment_gateways import approved
+from services.pricing_service import calculate_price, price_cart
+
+
+class PriceCartTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        category = Category.objects.create(name="Electronics")
+        self.products = [
+            Product.objects.create(
+                seller=self.seller,
+                name=f"Product {i}",
+                description="Test Description",
+                category=category,
+                price=price,
+                cost=Decimal("1.00"),
+                inventory_count=10,
+            )
+            for i, price in enumerate(
+                [Decimal("100.00"), Decimal("19.99"), Decimal("0.35")]
+            )
+        ]
+
+    def create_promo(self, code, discount_type, value):
+        return Promotion.objects.create(
+            code=code,
+            seller=self.seller,
+            discount_type=discount_type,
+            discount_value=value,
+            min_purchase_amount=Decimal("0"),
+            usage_limit=100,
+            usage_count=0,
+            start_date=timezone.now() - timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=30),
+            is_active=True,
+        )
+
+    def items(self, *quantities):
+        return [
+            {"product_id": str(product.product_id), "quantity": quantity}
+            for product, quantity in zip(self.products, quantities)
+        ]
+
+    def test_lines_match_single_product_pricing(self):
+        self.create_promo("SAVE5", "percentage", Decimal("5.00"))
+
+        for tier in ("free", "premium", "business"):
+            quote = price_cart(self.items(1, 3, 7), tier, "SAVE5")
+            for line in quote.lines:
+                price = calculate_price(
+                    line.product.product_id, line.quantity, tier, "SAVE5"
+                )
+                self.assertEqual(float(line.unit_price), price["unit_price"])
+                self.assertEqual(float(line.total), price["total"])
+
+    def test_amounts_are_decimal_cents(self):
+        quote = price_cart(self.items(1, 3, 7), "premium")
+
+        self.assertEqual(
+            [line.total for line in quote.lines],
+            [Decimal("95.00"), Decimal("56.97"), Decimal("2.33")],
+        )
+        self.assertEqual(quote.subtotal, Decimal("154.30"))
+        self.assertEqual(quote.discount, Decimal("8.12"))
+
+    def test_fixed_promo_is_spread_across_the_cart(self):
+        self.create_promo("TENOFF", "fixed", Decimal("10.00"))
+        items = [
+            {"product_id": str(self.products[0].product_id), "quantity": 1},
+            {"product_id": str(self.products[0].product_id), "quantity": 1},
+        ]
+
+        quote = price_cart(items, "free", "TENOFF")
+
+        self.assertEqual(quote.discount, Decimal("10.00"))
+        self.assertEqual(quote.subtotal, Decimal("190.00"))
+
+    def test_query_count_does_not_grow_with_lines(self):
+        items = self.items(1, 1, 1) * 200
+
+        with self.assertNumQueries(1):
+            quote = price_cart(items, "business")
+
+        self.assertEqual(len(quote.lines), 600)
+
+    def test_unknown_product(self):
+        items = self.items(1)
+        items[0]["product_id"] = "00000000-0000-0000-0000-000000000000"
+
+        with self.assertRaisesRegex(ValueError, "not found"):
+            price_cart(items, "free")
+
+
+@mock.patch(
+    "services.payment_gateways.SimulatedGateway.charge",
+    side_effect=lambda transaction_id, amount, method: approved(
+        transaction_id, "abc12345"
+    ),
+)
+class QuoteTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.product = Product.objects.create(
+            seller=seller,
+            name="Test Product",
+            description="Test Description",
+            category=Category.objects.create(name="Electronics"),
+            price=Decimal("100.00"),
+            cost=Decimal("50.00"),
+            inventory_count=10,
+        )
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@test.com",
+            password="testpass",
+            subscription_tier="premium",
+        )
+        self.items = [{"product_id": str(self.product.product_id), "quantity": 2}]
+
+    def quote(self):
+        return self.client.post(
+            "/api/orders/quote/",
+            {"user_id": str(self.user.user_id), "items": self.items},
+            content_type="application/json",
+        )
+
+    def checkout(self, token):
+        return self.client.post(
+            "/api/orders/checkout/",
+            {
+                "user_id": str(self.user.user_id),
+                "items": self.items,
+                "payment_method": "card",
+                "shipping_address": {"country": "US"},
+                "quote_token": token,
+            },
+            content_type="application/json",
+        )
+
+    def test_quote_prices_cart(self, _charge):
+        response = self.quote()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["subtotal"], 190.0)
+        self.assertEqual(response.data["lines"][0]["unit_price"], 95.0)
+        self.assertTrue(response.data["quote_token"])
+
+    def test_checkout_reuses_valid_quote(self, _charge):
+        token = self.quote().data["quote_token"]
+
+        with mock.patch("services.pricing_service.price_cart") as price_cart:
+            response = self.checkout(token)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["subtotal"], 190.0)
+        price_cart.assert_not_called()
+
+    def test_checkout_reprices_when_price_changed(self, _charge):
+        token = self.quote().data["quote_token"]
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal("50.00"))
+
+        response = self.checkout(token)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["subtotal"], 95.0)
+
+    def test_checkout_reprices_expired_or_tampered_quote(self, _charge):
+        token = self.quote().data["quote_token"]
+
+        with mock.patch(
+            "services.pricing_service.price_cart",
+            wraps=pricing_service.price_cart,
+        ) as price_cart:
+            self.checkout(token[:-2] + "xx")
+            with self.settings(PRICE_QUOTE_TTL=-1):
+                self.checkout(token)
+
+        self.assertEqual(price_cart.call_count, 2)
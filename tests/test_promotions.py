@@ -0,0 +1,105 @@
+# Standard library imports
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+# Django imports
+from django.test import TestCase
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Category, Product, Promotion, Seller, User
+from services import pricing_service
+from services.payment_gateways import approved
+
+
+class PromotionTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.category = Category.objects.create(name="Electronics")
+        self.product = Product.objects.create(
+            seller=self.seller,
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            price=Decimal("100.00"),
+            cost=Decimal("50.00"),
+            inventory_count=10,
+        )
+        self.user = User.objects.create_user(
+            username="testuser", email="test@test.com", password="testpass"
+        )
+        self.promo = Promotion.objects.create(
+            code="LIMITED",
+            seller=self.seller,
+            discount_type="percentage",
+            discount_value=Decimal("10.00"),
+            min_purchase_amount=Decimal("0"),
+            usage_limit=2,
+            usage_count=0,
+            start_date=timezone.now() - timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=30),
+            is_active=True,
+        )
+
+    def checkout(self, items):
+        with mock.patch(
+            "services.payment_gateways.SimulatedGateway.charge",
+            side_effect=lambda transaction_id, amount, method: approved(
+                transaction_id, "abc12345"
+            ),
+        ):
+            return self.client.post(
+                "/api/orders/checkout/",
+                {
+                    "user_id": str(self.user.user_id),
+                    "items": items,
+                    "payment_method": "card",
+                    "shipping_address": {},
+                    "promo_code": "LIMITED",
+                },
+                content_type="application/json",
+            )
+
+    def test_lookup_is_cached_until_promotion_saved(self):
+        pricing_service.get_promotion("LIMITED")
+        pricing_service.get_promotion("NOPE")
+        with self.assertNumQueries(0):
+            self.assertEqual(pricing_service.get_promotion("LIMITED"), self.promo)
+            self.assertIsNone(pricing_service.get_promotion("NOPE"))
+
+        self.promo.is_active = False
+        self.promo.save()
+        self.assertIsNone(pricing_service.get_promotion("LIMITED"))
+
+    def test_redeem_stops_at_usage_limit(self):
+        self.assertTrue(pricing_service.redeem_promotion(self.promo))
+        self.assertTrue(pricing_service.redeem_promotion(self.promo))
+        self.assertFalse(pricing_service.redeem_promotion(self.promo))
+
+        self.promo.refresh_from_db()
+        self.assertEqual(self.promo.usage_count, 2)
+
+    def test_checkout_counts_one_use_per_order(self):
+        line = {"product_id": str(self.product.product_id), "quantity": 1}
+        response = self.checkout([line, line, line])
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.promo.refresh_from_db()
+        self.assertEqual(self.promo.usage_count, 1)
+
+    def test_checkout_rejects_promo_used_up_elsewhere(self):
+        pricing_service.get_promotion("LIMITED")
+        # Another process redeems the last uses; this process's cache still
+        # thinks the code is available.
+        Promotion.objects.filter(pk=self.promo.pk).update(usage_count=2)
+
+        response = self.checkout(
+            [{"product_id": str(self.product.product_id), "quantity": 1}]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("no longer available", response.json()["error"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_count, 0)
+        self.assertIsNone(pricing_service.get_promotion("LIMITED"))
@@ -0,0 +1,114 @@
+# Standard library imports
+from decimal import Decimal
+from io import StringIO
+
+# Django imports
+from django.core.management import call_command
+from django.test import TestCase
+
+# Local application imports
+from marketplace.models import Category, Product, Seller
+from services import repricing_service
+
+
+class RepricingTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Seller", email="seller@test.com")
+        self.other_seller = Seller.objects.create(name="Other", email="other@test.com")
+        self.electronics = Category.objects.create(name="Electronics")
+        self.books = Category.objects.create(name="Books")
+
+        self.phone = self.create_product("Phone", self.electronics, "200.00", "120.00")
+        self.cable = self.create_product("Cable", self.electronics, "9.99", "9.00")
+        self.novel = self.create_product("Novel", self.books, "15.00", "5.00")
+        self.atlas = self.create_product(
+            "Atlas", self.books, "40.00", "10.00", seller=self.other_seller
+        )
+
+    def create_product(self, name, category, price, cost, seller=None):
+        return Product.objects.create(
+            seller=seller or self.seller,
+            name=name,
+            description=name,
+            category=category,
+            price=Decimal(price),
+            cost=Decimal(cost),
+            inventory_count=10,
+        )
+
+    def prices(self):
+        return {
+            product.name: product.price for product in Product.objects.order_by("name")
+        }
+
+    def reprice(self, rules, **kwargs):
+        return repricing_service.reprice(repricing_service.parse_rules(rules), **kwargs)
+
+    def test_category_percent_then_margin_floor(self):
+        summary = self.reprice(
+            [{"percent": -15, "category": self.electronics.pk}, {"min_margin": 20}]
+        )
+
+        self.assertEqual(
+            self.prices(),
+            {
+                "Atlas": Decimal("40.00"),
+                "Cable": Decimal("10.80"),
+                "Novel": Decimal("15.00"),
+                "Phone": Decimal("170.00"),
+            },
+        )
+        self.assertEqual(summary["matched"], 4)
+        self.assertEqual(summary["updated"], 2)
+
+    def test_seller_scope_and_small_batches(self):
+        summary = self.reprice(
+            [{"percent": 12.5, "seller": str(self.seller.seller_id)}], batch_size=1
+        )
+
+        self.assertEqual(summary["matched"], 3)
+        prices = self.prices()
+        self.assertEqual(prices["Phone"], Decimal("225.00"))
+        self.assertEqual(prices["Cable"], Decimal("11.24"))
+        self.assertEqual(prices["Atlas"], Decimal("40.00"))
+
+    def test_dry_run_writes_nothing(self):
+        before = self.prices()
+
+        summary = self.reprice([{"percent": 50}], dry_run=True)
+
+        self.assertEqual(summary["updated"], 4)
+        self.assertEqual(self.prices(), before)
+
+    def test_invalid_rules(self):
+        for rules in (
+            [],
+            [{"percent": -100}],
+            [{"percent": 5, "min_margin": 5}],
+            [{"percent": 5, "seller": "00000000-0000-0000-0000-000000000000"}],
+            [{"min_margin": "lots"}],
+        ):
+            with self.assertRaises(ValueError):
+                repricing_service.parse_rules(rules)
+
+    def test_api_and_command(self):
+        response = self.client.post(
+            "/api/products/reprice/",
+            {"rules": [{"percent": 10, "category": self.books.pk}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual(self.prices()["Novel"], Decimal("16.50"))
+
+        response = self.client.post(
+            "/api/products/reprice/",
+            {"rules": "cheaper"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+        out = StringIO()
+        call_command("reprice_catalog", '[{"min_margin": 50}]', stdout=out)
+        self.assertIn("Updated 1 of 4 products", out.getvalue())
+        self.assertEqual(self.prices()["Cable"], Decimal("13.50"))
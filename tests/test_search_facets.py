@@ -0,0 +1,110 @@
+# Django imports
+from django.test import TestCase, override_settings
+
+# Local application imports
+from marketplace.models import Category, Product, Seller
+from services import search_index, search_service
+
+
+@override_settings(SEARCH_BACKEND="fts5")
+class SearchFacetTests(TestCase):
+    # The FTS5 backend counts everything in one grouped query, filters and all
+    facet_queries = 1
+    category_filter_queries = 0
+
+    def setUp(self):
+        search_index.reset_index()
+        self.acme = Seller.objects.create(name="Acme", email="acme@test.com")
+        self.zenith = Seller.objects.create(name="Zenith", email="zenith@test.com")
+        electronics = Category.objects.create(name="Electronics")
+        office = Category.objects.create(name="Office")
+
+        for seller, name, price, category in [
+            (self.acme, "Laptop Pro", 1299.99, electronics),
+            (self.acme, "Laptop Air", 899.00, electronics),
+            (self.acme, "Laptop Sleeve", 39.99, office),
+            (self.zenith, "Laptop Stand", 49.99, office),
+            (self.zenith, "Budget Laptop", 20.00, None),
+            (self.zenith, "Wireless Mouse", 29.99, electronics),
+        ]:
+            Product.objects.create(
+                seller=seller,
+                name=name,
+                description=name,
+                category=category,
+                price=price,
+                cost=1,
+            )
+
+    def facets(self, query, **filters):
+        search_index.get_index()
+        queries = self.facet_queries
+        if filters.get("category"):
+            queries += self.category_filter_queries
+        with self.assertNumQueries(queries):
+            return search_service.search_facets(query, **filters)
+
+    def test_counts_every_match(self):
+        facets = self.facets("lap")
+
+        self.assertEqual(
+            facets["categories"],
+            [{"name": "Electronics", "count": 2}, {"name": "Office", "count": 2}],
+        )
+        self.assertEqual(
+            facets["sellers"],
+            [
+                {"seller_id": str(self.acme.seller_id), "name": "Acme", "count": 3},
+                {"seller_id": str(self.zenith.seller_id), "name": "Zenith", "count": 2},
+            ],
+        )
+        self.assertEqual(
+            facets["price_bands"],
+            [
+                {"min": 0, "max": 25, "count": 1},
+                {"min": 25, "max": 50, "count": 2},
+                {"min": 500, "max": None, "count": 2},
+            ],
+        )
+
+    def test_filters_apply_to_counts(self):
+        facets = self.facets("laptop", category="Office", max_price="45")
+
+        self.assertEqual(facets["categories"], [{"name": "Office", "count": 1}])
+        self.assertEqual([s["name"] for s in facets["sellers"]], ["Acme"])
+        self.assertEqual(facets["price_bands"], [{"min": 25, "max": 50, "count": 1}])
+
+    @override_settings(SEARCH_FACET_SIZE=1)
+    def test_facet_size(self):
+        facets = self.facets("laptop")
+        self.assertEqual(facets["categories"], [{"name": "Electronics", "count": 2}])
+        self.assertEqual([s["name"] for s in facets["sellers"]], ["Acme"])
+
+    def test_query_without_words_counts_nothing(self):
+        facets = search_service.search_facets("?!")
+        self.assertEqual(facets, {"categories": [], "sellers": [], "price_bands": []})
+
+    def test_search_endpoint(self):
+        response = self.client.get("/api/products/search/", {"q": "laptop"})
+        self.assertEqual(len(response.data), 5)
+
+        response = self.client.get(
+            "/api/products/search/", {"q": "laptop", "facets": "1"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertEqual(response.data["facets"]["sellers"][0]["count"], 3)
+
+        # Without a query the whole catalogue is counted
+        response = self.client.get("/api/products/search/", {"facets": "true"})
+        self.assertEqual(
+            sum(band["count"] for band in response.data["facets"]["price_bands"]), 6
+        )
+
+
+@override_settings(SEARCH_BACKEND="memory")
+class IndexSearchFacetTests(SearchFacetTests):
+    # Counted from the index, then one query each for category and seller
+    # names, plus one to look up a category filter
+    facet_queries = 2
+    category_filter_queries = 1
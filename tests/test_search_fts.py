@@ -0,0 +1,155 @@
+# Standard library imports
+from io import StringIO
+from unittest import mock
+
+# Django imports
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+# Local application imports
+from marketplace.models import Category, Product, Seller
+from services import search_fts, search_service
+
+
+@override_settings(SEARCH_BACKEND="fts5")
+class SearchFTSTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.electronics = Category.objects.create(name="Electronics")
+        self.office = Category.objects.create(name="Office")
+
+        self.laptop = self.create_product(
+            "Laptop Pro", "Fast laptop for work", 1299.99, self.electronics
+        )
+        self.sleeve = self.create_product(
+            "Sleeve",
+            "Padded sleeve that fits any laptop & <tablet>",
+            39.99,
+            self.office,
+        )
+        self.mouse = self.create_product(
+            "Wireless Mouse", "Ergonomic wireless mouse", 29.99, self.electronics
+        )
+
+    def create_product(self, name, description, price, category):
+        return Product.objects.create(
+            seller=self.seller,
+            name=name,
+            description=description,
+            category=category,
+            price=price,
+            cost=1,
+        )
+
+    def names(self, query, **filters):
+        return [
+            result["name"]
+            for result in search_service.search_products(query, **filters)
+        ]
+
+    def test_fts5_is_used_on_sqlite(self):
+        self.assertEqual(connection.vendor, "sqlite")
+        self.assertTrue(search_fts.is_enabled())
+
+    def test_results_are_ranked(self):
+        # A match in the name outranks one in the description
+        self.assertEqual(self.names("laptop"), ["Laptop Pro", "Sleeve"])
+        self.assertEqual(self.names("LAPTOP work"), ["Laptop Pro"])
+        self.assertEqual(self.names("laptop mouse"), [])
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.names("lap"), ["Laptop Pro", "Sleeve"])
+        self.assertEqual(self.names("wire mou"), ["Wireless Mouse"])
+        self.assertEqual(self.names("l"), [])
+        # Query syntax is never passed through
+        self.assertEqual(self.names('laptop OR "mouse'), [])
+
+    def test_query_without_words_finds_nothing(self):
+        self.assertEqual(self.names("?!"), [])
+        self.assertEqual(self.names(" * "), [])
+        # A blank query still lists the catalogue
+        self.assertEqual(len(self.names("  ")), 3)
+
+    def test_filters(self):
+        self.assertEqual(self.names("laptop", category="Office"), ["Sleeve"])
+        self.assertEqual(self.names("laptop", max_price="100"), ["Sleeve"])
+        self.assertEqual(self.names("laptop", min_price="100"), ["Laptop Pro"])
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        results = search_service.search_products("lap")
+        self.assertEqual(results[0]["snippet"], "Fast <mark>laptop</mark> for work")
+        self.assertEqual(
+            results[1]["snippet"],
+            "Padded sleeve that fits any <mark>laptop</mark> &amp; &lt;tablet&gt;",
+        )
+
+    def test_triggers_follow_every_write(self):
+        Product.objects.filter(pk=self.mouse.pk).update(name="Laptop Mouse")
+        self.sleeve.description = "Padded sleeve for tablets"
+        self.sleeve.save()
+        self.laptop.delete()
+
+        self.assertEqual(self.names("laptop"), ["Laptop Mouse"])
+        self.assertEqual(self.names("tablets"), ["Sleeve"])
+
+        Product.objects.filter(pk=self.mouse.pk).update(is_active=False)
+        self.assertEqual(self.names("laptop"), [])
+
+    def test_query_count_does_not_grow_with_results(self):
+        for i in range(30):
+            seller = Seller.objects.create(
+                name=f"Seller {i}", email=f"seller{i}@test.com"
+            )
+            Product.objects.create(
+                seller=seller,
+                name=f"Laptop {i}",
+                description="Spare laptop",
+                category=self.electronics,
+                price=500,
+                cost=1,
+            )
+
+        # One FTS5 query and one for the rows with their sellers
+        with self.assertNumQueries(2):
+            results = search_service.search_products("laptop")
+        self.assertEqual(len(results), 32)
+        self.assertEqual(
+            {result["seller_name"] for result in results if result["name"] == "Sleeve"},
+            {"Test Seller"},
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(search_service.search_products("")), 33)
+
+    def test_falls_back_to_the_memory_index(self):
+        with mock.patch.object(search_fts, "is_available", return_value=False):
+            results = search_service.search_products("lap")
+        self.assertEqual([r["name"] for r in results], ["Laptop Pro", "Sleeve"])
+        self.assertIsNone(results[0]["snippet"])
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Rebuilt the FTS5 index", out.getvalue())
+        self.assertIn("matches the products table", out.getvalue())
+        self.assertEqual(self.names("wireless"), ["Wireless Mouse"])
+
+    def test_rebuild_command_reports_missing_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {search_fts.TABLE}_update")
+        Product.objects.filter(pk=self.mouse.pk).update(name="Trackball")
+        self.assertEqual(
+            search_fts.check(),
+            [
+                f"Trigger {search_fts.TABLE}_update is missing",
+                "The index doesn't match the products table",
+            ],
+        )
+
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "_update is missing"):
+            call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Before rebuilding: The index doesn't match", out.getvalue())
+        # The rebuild itself still went through
+        self.assertEqual(self.names("trackball"), ["Trackball"])
@@ -0,0 +1,132 @@
+# Standard library imports
+from io import StringIO
+from unittest import mock
+
+# Django imports
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import Category, Product, Seller
+from services import search_fts, search_index, search_service
+
+
+@override_settings(SEARCH_BACKEND="memory")
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        search_index.reset_index()
+        self.seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        self.electronics = Category.objects.create(name="Electronics")
+        self.office = Category.objects.create(name="Office")
+
+        self.laptop = self.create_product(
+            "Laptop Pro", "Fast laptop for work", 1299.99, self.electronics
+        )
+        self.sleeve = self.create_product(
+            "Sleeve", "Padded sleeve that fits any laptop", 39.99, self.office
+        )
+        self.mouse = self.create_product(
+            "Wireless Mouse", "Ergonomic wireless mouse", 29.99, self.electronics
+        )
+
+    def create_product(self, name, description, price, category):
+        return Product.objects.create(
+            seller=self.seller,
+            name=name,
+            description=description,
+            category=category,
+            price=price,
+            cost=1,
+        )
+
+    def names(self, query, **filters):
+        return [
+            result["name"]
+            for result in search_service.search_products(query, **filters)
+        ]
+
+    def test_results_are_ranked(self):
+        # A match in the name outranks one in the description
+        self.assertEqual(self.names("laptop"), ["Laptop Pro", "Sleeve"])
+        self.assertEqual(self.names("LAPTOP work"), ["Laptop Pro"])
+        self.assertEqual(self.names("laptop mouse"), [])
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.names("lap"), ["Laptop Pro", "Sleeve"])
+        self.assertEqual(self.names("wire mou"), ["Wireless Mouse"])
+        # Single letters only match whole words
+        self.assertEqual(self.names("l"), [])
+
+    def test_query_without_words_finds_nothing(self):
+        self.assertEqual(self.names("?!"), [])
+        self.assertEqual(self.names(" * "), [])
+        # A blank query still lists the catalogue
+        self.assertEqual(len(self.names("  ")), 3)
+
+    def test_filters(self):
+        self.assertEqual(self.names("laptop", category="Office"), ["Sleeve"])
+        self.assertEqual(self.names("laptop", max_price="100"), ["Sleeve"])
+        self.assertEqual(self.names("laptop", min_price="100"), ["Laptop Pro"])
+
+    def test_saves_and_deletes_update_the_index(self):
+        self.assertEqual(self.names("laptop"), ["Laptop Pro", "Sleeve"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sleeve.description = "Padded sleeve for tablets"
+            self.sleeve.save()
+            self.mouse.name = "Laptop Mouse"
+            self.mouse.save()
+            self.laptop.delete()
+
+        self.assertEqual(self.names("laptop"), ["Laptop Mouse"])
+        self.assertEqual(self.names("tablets"), ["Sleeve"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mouse.is_active = False
+            self.mouse.save()
+        self.assertEqual(self.names("laptop"), [])
+
+    def test_rolled_back_saves_are_not_indexed(self):
+        self.assertEqual(self.names("mouse"), ["Wireless Mouse"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.mouse.name = "Trackball"
+                    self.mouse.save()
+                    raise RuntimeError("rolled back")
+            except RuntimeError:
+                pass
+
+        self.assertEqual(self.names("trackball"), [])
+        self.assertEqual(self.names("mouse"), ["Wireless Mouse"])
+
+    def test_sync_picks_up_changes_that_skip_signals(self):
+        index = search_index.get_index()
+        Product.objects.filter(pk=self.mouse.pk).update(
+            name="Trackball", updated_at=timezone.now()
+        )
+        self.assertEqual(index.search("trackball"), [])
+
+        index.sync()
+
+        self.assertEqual(index.search("trackball"), [self.mouse.pk])
+        self.assertEqual(index.search("mouse"), [self.mouse.pk])
+        self.assertEqual(index.search("wireless"), [self.mouse.pk])
+
+    def test_searches_do_not_scan_the_products_table(self):
+        search_index.get_index()
+
+        # Only the winning rows are read, with their sellers joined in
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.names("laptop")), 2)
+
+    def test_rebuild_command_leaves_the_memory_index_to_servers(self):
+        index = search_index.get_index()
+        out = StringIO()
+        with mock.patch.object(search_fts, "is_available", return_value=False):
+            call_command("rebuild_search_index", stdout=out)
+        self.assertIn("This database has no FTS5 index", out.getvalue())
+        self.assertIs(search_index.get_index(), index)
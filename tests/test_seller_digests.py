@@ -0,0 +1,192 @@
+# Standard library imports
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+# Django imports
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+# Local application imports
+from marketplace.models import (
+    Category,
+    Notification,
+    Order,
+    OrderItem,
+    Product,
+    Promotion,
+    Review,
+    Seller,
+    User,
+)
+from services import digest_service, notification_service, pricing_service
+
+DAY = date(2026, 3, 2)
+
+
+class SellerDigestTests(TestCase):
+    def setUp(self):
+        self.busy = Seller.objects.create(name="Busy", email="busy@test.com")
+        self.quiet = Seller.objects.create(name="Quiet", email="quiet@test.com")
+        Seller.objects.create(name="Idle", email="idle@test.com")
+        category = Category.objects.create(name="Electronics")
+        self.buyer = User.objects.create_user(
+            username="buyer", password="testpass", subscription_tier="premium"
+        )
+        promo = Promotion.objects.create(
+            code="SAVE150",
+            seller=self.busy,
+            discount_type="fixed",
+            discount_value=Decimal("1.50"),
+            min_purchase_amount=Decimal("0"),
+            start_date=timezone.now() - timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=1),
+        )
+
+        self.widget = self.create_product(self.busy, "Widget", 100, category)
+        self.gadget = self.create_product(self.busy, "Gadget", 3, category)
+        self.gizmo = self.create_product(self.quiet, "Gizmo", 0, category)
+
+        # Premium tier takes 5% off every line and the promo $1.50 off the
+        # first order, so the busy seller is charged $18 + $9 + $9.50
+        start, _ = digest_service.day_bounds(DAY)
+        paid = self.create_order(
+            "paid",
+            start + timedelta(hours=2),
+            [(self.widget, 2), (self.gadget, 1)],
+            promo,
+        )
+        self.sold = [
+            paid,
+            self.create_order(
+                "shipped", start + timedelta(hours=20), [(self.widget, 1)]
+            ),
+        ]
+        self.create_order("cancelled", start + timedelta(hours=3), [(self.widget, 10)])
+        self.create_order("paid", start - timedelta(minutes=1), [(self.widget, 10)])
+
+        for rating, product, seller in [
+            (5, self.widget, None),
+            (4, None, self.busy),
+            (2, self.gizmo, None),
+        ]:
+            review = Review.objects.create(
+                user=self.buyer,
+                product=product,
+                seller=seller,
+                order=paid,
+                rating=rating,
+                comment="Review",
+            )
+            Review.objects.filter(pk=review.pk).update(
+                created_at=start + timedelta(hours=5)
+            )
+
+    def create_product(self, seller, name, stock, category):
+        return Product.objects.create(
+            seller=seller,
+            name=name,
+            description=name,
+            category=category,
+            price=Decimal("10.00"),
+            cost=Decimal("4.00"),
+            inventory_count=stock,
+        )
+
+    def create_order(self, status, created_at, items, promotion=None):
+        # Priced the way checkout prices a cart
+        quote = pricing_service.price_cart(
+            [
+                {"product_id": product.product_id, "quantity": quantity}
+                for product, quantity in items
+            ],
+            self.buyer.subscription_tier,
+            promotion=promotion,
+        )
+        order = Order.objects.create(
+            user=self.buyer,
+            status=status,
+            subtotal=quote.subtotal,
+            total=quote.subtotal,
+            shipping_address={},
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product=line.product,
+                quantity=line.quantity,
+                price_at_purchase=line.unit_price,
+                discount_amount=line.discount,
+            )
+            for line in quote.lines
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        return order
+
+    def test_digests_are_built_with_one_query_per_table(self):
+        with self.assertNumQueries(3):
+            digests = digest_service.build_seller_digests(
+                *digest_service.day_bounds(DAY)
+            )
+
+        self.assertEqual(set(digests), {self.busy.pk, self.quiet.pk})
+        busy = digests[self.busy.pk]
+        self.assertEqual(busy["orders"], 2)
+        self.assertEqual(busy["units"], 4)
+        self.assertEqual(busy["revenue"], "36.50")
+        self.assertEqual(
+            Decimal(busy["revenue"]), sum(order.subtotal for order in self.sold)
+        )
+        self.assertEqual(
+            busy["low_stock"],
+            [
+                {
+                    "product_id": str(self.gadget.product_id),
+                    "name": "Gadget",
+                    "available": 3,
+                }
+            ],
+        )
+        self.assertEqual(busy["reviews"], 2)
+        self.assertEqual(busy["average_rating"], 4.5)
+
+        quiet = digests[self.quiet.pk]
+        self.assertEqual(quiet["orders"], 0)
+        self.assertEqual(quiet["low_stock_count"], 1)
+        self.assertEqual(quiet["reviews"], 1)
+
+    def test_zero_value_orders_count_no_revenue(self):
+        freebie = self.create_product(self.quiet, "Freebie", 50, self.gizmo.category)
+        Product.objects.filter(pk=freebie.pk).update(price=Decimal("0.00"))
+        freebie.refresh_from_db()
+        start, end = digest_service.day_bounds(DAY)
+        self.create_order("paid", start + timedelta(hours=4), [(freebie, 2)])
+
+        digests = digest_service.build_seller_digests(start, end)
+
+        quiet = digests[self.quiet.pk]
+        self.assertEqual(quiet["orders"], 1)
+        self.assertEqual(quiet["units"], 2)
+        self.assertEqual(quiet["revenue"], "0.00")
+        self.assertEqual(digests[self.busy.pk]["revenue"], "36.50")
+
+    def test_command_queues_each_digest_once(self):
+        out = StringIO()
+        call_command("send_seller_digests", "--date", DAY.isoformat(), stdout=out)
+        self.assertIn("Queued 2 seller digests for 2026-03-02", out.getvalue())
+
+        call_command("send_seller_digests", "--date", DAY.isoformat(), stdout=out)
+        self.assertIn("Queued 0 seller digests", out.getvalue())
+        self.assertIn("(2 already queued)", out.getvalue())
+
+        notification = Notification.objects.get(recipient="busy@test.com")
+        self.assertEqual(notification.kind, "seller_digest")
+        subject, body = notification_service.render([notification])
+        self.assertEqual(subject, "Your daily seller digest")
+        self.assertEqual(
+            body,
+            "Your day on 2026-03-02: 2 orders, 4 units sold, $36.50 revenue; "
+            "1 products low on stock: Gadget (3 left); "
+            "2 new reviews, averaging 4.5 stars.",
+        )
@@ -0,0 +1,223 @@
+# Standard library imports
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+# Django imports
+from django.test import TestCase, override_settings
+
+# Local application imports
+from marketplace.models import Category, Order, OrderItem, Product, Seller, User
+from services import carriers, pipeline, shipping_service
+
+BANDED_RATES = {
+    "zones": {"US": "domestic", "CA": "north_america"},
+    "default_zone": "international",
+    "rates": {
+        "domestic": {"standard": [[1, 4.0, 0.0], [10, 6.0, 1.0], [30, 10.0, 1.5]]},
+        "north_america": {"standard": [[None, 12.0, 2.0]]},
+    },
+}
+
+
+class RateTableTests(TestCase):
+    def test_default_table_matches_flat_formula(self):
+        for weight in (0, 0.25, 1, 12.5, 140):
+            for address in ({"country": "US"}, {"country": "FR"}, {}):
+                for express in (False, True):
+                    expected = (
+                        5.0
+                        + 2.0 * weight
+                        + (15.0 if address.get("country") != "US" else 0)
+                        + (20.0 if express else 0)
+                    )
+                    quote = shipping_service.quote_shipping(
+                        weight, {**address, "express": express}
+                    )
+                    self.assertAlmostEqual(quote, expected)
+
+    @override_settings(SHIPPING_RATE_TABLE=BANDED_RATES)
+    def test_weight_bands_and_zones(self):
+        table = shipping_service.get_rate_table()
+
+        self.assertEqual(table.quote(0.5, "US"), 4.0)
+        self.assertEqual(table.quote(1, "US"), 4.0)
+        self.assertEqual(table.quote(1.5, "US"), 7.5)
+        self.assertEqual(table.quote(20, "US"), 40.0)
+        self.assertEqual(table.quote(100, "CA"), 212.0)
+
+        with self.assertRaisesRegex(ValueError, "over the standard limit"):
+            table.quote(31, "US")
+        with self.assertRaisesRegex(ValueError, "No express shipping"):
+            table.quote(1, "US", "express")
+        with self.assertRaisesRegex(ValueError, "No standard shipping"):
+            table.quote(1, "JP")
+
+    def test_invalid_bands_are_rejected(self):
+        config = {
+            "default_zone": "domestic",
+            "rates": {"domestic": {"standard": [[10, 1.0, 1.0], [5, 1.0, 1.0]]}},
+        }
+        with self.assertRaises(shipping_service.RateTableError):
+            shipping_service.RateTable(config)
+
+        config["rates"]["domestic"]["standard"] = [[None, "five", 1.0]]
+        with self.assertRaises(shipping_service.RateTableError):
+            shipping_service.RateTable(config)
+
+    def quote_in_checkout(self, weight, country):
+        stage = pipeline.Stage(
+            "shipping", shipping_service.quote_shipping, weight, {"country": country}
+        )
+        return pipeline.run_stages([stage])["shipping"]
+
+    @override_settings(SHIPPING_RATE_TABLE=BANDED_RATES)
+    def test_checkout_falls_back_only_when_there_is_no_rate(self):
+        self.assertEqual(self.quote_in_checkout(1.5, "US"), 7.5)
+        self.assertEqual(self.quote_in_checkout(31, "US"), 25.0)
+        self.assertEqual(self.quote_in_checkout(1, "JP"), 25.0)
+        with self.assertRaises(pipeline.StageFailed):
+            self.quote_in_checkout(-1, "US")
+
+    @override_settings(
+        SHIPPING_RATE_TABLE={
+            "default_zone": "domestic",
+            "rates": {"domestic": {"standard": [[None, "five", 1.0]]}},
+        }
+    )
+    def test_broken_table_is_not_hidden_by_the_fallback(self):
+        with self.assertRaises(pipeline.StageFailed) as ctx:
+            self.quote_in_checkout(1, "US")
+        self.assertIsInstance(ctx.exception.__cause__, shipping_service.RateTableError)
+
+
+class ShippingQuoteTests(TestCase):
+    def test_calculate_shipping_sums_weight_in_one_query(self):
+        seller = Seller.objects.create(name="Test Seller", email="seller@test.com")
+        category = Category.objects.create(name="Electronics")
+        user = User.objects.create_user(username="buyer", password="testpass")
+        order = Order.objects.create(
+            user=user, status="pending", subtotal=0, total=0, shipping_address={}
+        )
+        for weight, quantity in ((Decimal("1.5"), 2), (Decimal("0.25"), 4)):
+            product = Product.objects.create(
+                seller=seller,
+                name="Product",
+                description="Product",
+                category=category,
+                price=10,
+                cost=5,
+                weight_kg=weight,
+            )
+            OrderItem.objects.create(
+                order=order, product=product, quantity=quantity, price_at_purchase=10
+            )
+
+        with self.assertNumQueries(1):
+            cost = shipping_service.calculate_shipping(
+                order.order_id, {"country": "US"}
+            )
+
+        self.assertEqual(cost, 13.0)
+        with self.assertNumQueries(0):
+            shipping_service.calculate_shipping(
+                order.order_id, {"country": "US"}, total_weight=4
+            )
+
+    def test_bulk_quotes_endpoint(self):
+        response = self.client.post(
+            "/api/shipping/quotes/",
+            {
+                "shipments": [
+                    {"weight_kg": 2, "address": {"country": "US"}},
+                    {"weight_kg": 1, "address": {"country": "DE", "express": True}},
+                    {"weight_kg": "heavy"},
+                ]
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        quotes = response.data["quotes"]
+        self.assertEqual(quotes[0], {"cost": 9.0})
+        self.assertEqual(quotes[1], {"cost": 42.0})
+        self.assertIn("Invalid weight", quotes[2]["error"])
+
+        response = self.client.post(
+            "/api/shipping/quotes/", {"shipments": []}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    SHIPPING_CARRIER={
+        "BACKEND": "services.carriers.SimulatedCarrier",
+        "OPTIONS": {"latency": 0, "batch_size": 3},
+    }
+)
+class TrackingTests(TestCase):
+    def setUp(self):
+        shipping_service._tracking.clear()
+        user = User.objects.create_user(username="buyer", password="testpass")
+        self.orders = [
+            Order.objects.create(
+                user=user, status="shipped", subtotal=0, total=0, shipping_address={}
+            )
+            for _ in range(7)
+        ]
+        self.carrier = carriers.get_carrier()
+
+    def test_lookups_are_batched_and_cached(self):
+        order_ids = [order.order_id for order in self.orders]
+
+        with mock.patch.object(
+            self.carrier, "_lookup", wraps=self.carrier._lookup
+        ) as lookup:
+            first = shipping_service.get_tracking_many(order_ids)
+            self.assertEqual(lookup.call_count, 3)
+
+            second = shipping_service.get_tracking_many(order_ids)
+            self.assertEqual(lookup.call_count, 3)
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first[order_ids[0]]["tracking_number"],
+            f"TRK{str(order_ids[0])[:8].upper()}",
+        )
+
+    def test_failed_lookups_are_not_cached(self):
+        order_id = self.orders[0].order_id
+
+        with mock.patch.object(
+            self.carrier, "_lookup", side_effect=ConnectionError("carrier down")
+        ):
+            result = shipping_service.get_tracking_many([order_id])[order_id]
+        self.assertIsInstance(result, ConnectionError)
+
+        info = shipping_service.get_tracking_info(order_id)
+        self.assertEqual(info["status"], "in_transit")
+
+    def test_tracking_endpoint(self):
+        missing = uuid.uuid4()
+        order_ids = [str(self.orders[1].order_id), str(missing)]
+
+        response = self.client.post(
+            "/api/orders/tracking/",
+            {"order_ids": order_ids},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        found, not_found = response.data["results"]
+        self.assertEqual(found["order_id"], order_ids[0])
+        self.assertEqual(found["carrier"], "StandardShipping")
+        self.assertEqual(
+            not_found, {"order_id": str(missing), "error": "Order not found"}
+        )
+
+        response = self.client.post(
+            "/api/orders/tracking/",
+            {"order_ids": ["not-a-uuid"]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)